@@ -0,0 +1,99 @@
+"""
+Benchmark: classifying mail before downloading it.
+
+Serves a mailbox mixing ``benchmarks.corpus`` applications with
+non-applications (newsletters, order confirmations with an invoice, replies)
+from ``IMAPStandIn``. Both scrape fetch paths run over every UNSEEN message,
+as before classification, and over the ``select_applications`` selection
+(SEARCH prefilter plus a ``HEADER.FIELDS`` pass) only:
+
+- headers: ``fetch_headers_many`` then ``fetch_attachments``, as the webapp does;
+- full: ``fetch_many`` of whole messages, as the CLI and ``core`` do.
+
+Each line reports the messages downloaded, the bytes the server sent, the
+commands it received and the time taken.
+
+Usage (from the project root):
+    python -m benchmarks.bench_classify --messages 200 --noise 0.6 --latency-ms 5
+"""
+import argparse
+import random
+import time
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr
+
+from benchmarks.bench_network import commands_so_far
+from benchmarks.corpus import generate
+from src.internship_scraper.classify import select_applications
+from src.internship_scraper.imap_server import IMAPStandIn
+
+SUBJECTS = ["Weekly newsletter", "Your order has shipped", "Re: Internship Application – PY – question",
+            "Webinar invitation", "Your Internship Application was received"]
+
+
+def noise_message(index, rng):
+    """A non-application: text and HTML alternatives, half of them with a PDF attached."""
+    msg = MIMEMultipart("mixed", boundary=f"==noise-{index}==")
+    msg["Subject"] = rng.choice(SUBJECTS)
+    msg["From"] = formataddr(("Newsletter", f"news{index}@example.org"))
+    text = "Lorem ipsum dolor sit amet. " * rng.randint(50, 500)
+    body = MIMEMultipart("alternative", boundary=f"==noise-{index}-alt==")
+    body.attach(MIMEText(text, "plain"))
+    body.attach(MIMEText(f"<p>{text}</p>", "html"))
+    msg.attach(body)
+    if rng.random() < 0.5:
+        attachment = MIMEApplication(rng.randbytes(rng.randint(50_000, 400_000)), "pdf")
+        attachment.add_header("Content-Disposition", "attachment", filename="invoice.pdf")
+        msg.attach(attachment)
+    return msg.as_bytes()
+
+
+def mailbox(count, noise, seed=0):
+    rng = random.Random(seed)
+    applications = generate(count)
+    return [noise_message(index, rng) if rng.random() < noise else next(applications) for index in range(count)]
+
+
+def run(label, server, full, classify):
+    client = server.client()
+    client.connect()
+    before_commands, before_bytes = commands_so_far(server), server.stats["bytes_sent"]
+    started = time.perf_counter()
+    uids = client.search("UNSEEN")
+    selection = select_applications(client, uids) if classify else None
+    downloaded = 0
+    fetch = client.fetch_many if full else client.fetch_headers_many
+    messages = fetch(selection.uids if selection else uids)
+    for msg in selection.filter(messages) if selection else messages:
+        if not full:
+            client.fetch_attachments(msg)
+        downloaded += 1
+    elapsed = time.perf_counter() - started
+    sent = server.stats["bytes_sent"] - before_bytes
+    print(f"{label:<12} {downloaded:>6}/{len(uids):<6} {sent / 1024 / 1024:>9.1f} MB {commands_so_far(server) - before_commands:>8} "
+          f"{elapsed:>8.2f}s")
+    if selection:
+        print(f"{'':<12} skipped: {selection.counts}")
+    client.logout()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SEARCH/header classification before fetching")
+    parser.add_argument('--messages', type=int, default=200, help='Messages in the served mailbox')
+    parser.add_argument('--noise', type=float, default=0.6, help='Share of non-application messages')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='Server-side delay per command')
+    args = parser.parse_args()
+
+    with IMAPStandIn(mailbox(args.messages, args.noise), latency=args.latency_ms / 1000.0) as server:
+        print(f"{args.messages} messages, {args.noise:.0%} non-applications, {args.latency_ms:.1f} ms/command")
+        print(f"{'path':<12} {'fetched/unseen':>13} {'sent':>12} {'commands':>8} {'time':>9}")
+        for full in (False, True):
+            kind = "full" if full else "headers"
+            run(f"{kind}, all", server, full, classify=False)
+            run(f"{kind}, apps", server, full, classify=True)
+
+
+if __name__ == "__main__":
+    main()
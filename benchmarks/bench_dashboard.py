@@ -0,0 +1,84 @@
+"""
+Benchmark: dashboard query latency versus number of candidates.
+
+Compares the previous dashboard query (every candidate, newest first) with
+keyset pages from ``services.fetch_candidates``: the first page, a page 90%
+deep into the history, and a filtered page. OFFSET pagination at the same
+depth is shown for contrast. Keyset pages should stay flat as the table grows.
+
+Usage (from the project root):
+    python -m benchmarks.bench_dashboard --sizes 10000 50000 100000
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.bench_ingest import make_app
+from src.webapp.db import db
+from src.webapp.models import Candidate
+from src.webapp.services import PAGE_SIZE, encode_cursor, fetch_candidates
+
+INTERNSHIPS = ["Python Developer", "Web Developer", "Graphic Designer", "Machine Learning Intern"]
+
+
+def populate(count, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    rows = []
+    for i in range(count):
+        rows.append({
+            "name": f"Candidate {i}",
+            "email": f"candidate{i}@example.com",
+            "internship": rng.choice(INTERNSHIPS),
+            "read": rng.random() < 0.5,
+            "notes": "Name: Candidate\n" * 20,
+            "applied_on": start + timedelta(minutes=i, seconds=rng.randint(0, 59)),
+        })
+        if len(rows) == 5000:
+            db.session.execute(db.insert(Candidate), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(Candidate), rows)
+    db.session.commit()
+
+
+def measure(run, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.expire_all()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashboard queries")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000], help='Candidate counts to try')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per query (median is reported)')
+    args = parser.parse_args()
+
+    print(f"{'candidates':>10}  {'all rows':>10}  {'first page':>10}  {'keyset 90%':>10}  {'offset 90%':>10}  {'filtered':>10}   (ms)")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            app, _ = make_app(workdir, f"dashboard{size}")
+            with app.app_context():
+                populate(size)
+                depth = int(size * 0.9)
+                boundary = (Candidate.query.order_by(Candidate.applied_on.desc(), Candidate.id.desc())
+                            .offset(depth - 1).first())
+                cursor = encode_cursor(boundary)
+                all_rows = measure(lambda: Candidate.query.order_by(Candidate.applied_on.desc()).all(), args.repeat)
+                first = measure(lambda: fetch_candidates(), args.repeat)
+                deep = measure(lambda: fetch_candidates(cursor=cursor), args.repeat)
+                offset = measure(lambda: Candidate.query.order_by(Candidate.applied_on.desc(), Candidate.id.desc())
+                                 .offset(depth).limit(PAGE_SIZE).all(), args.repeat)
+                filtered = measure(lambda: fetch_candidates(internship="Web Developer", reviewed=False), args.repeat)
+            print(f"{size:>10}  {all_rows:>10.1f}  {first:>10.2f}  {deep:>10.2f}  {offset:>10.2f}  {filtered:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
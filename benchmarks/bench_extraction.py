@@ -0,0 +1,134 @@
+"""
+Benchmark: compiled single-pass ``CandidateExtractor`` vs the per-field ``re.search`` helpers.
+
+``legacy_parse_candidate`` / ``legacy_subject`` are the helpers previously
+duplicated in core.py, internship_scraper.py and webapp/scraper.py, kept here
+verbatim as the baseline. Both are run over the same synthetic corpus and
+their results are checked for equality before timings are reported.
+
+Usage (from the project root):
+    python -m benchmarks.bench_extraction --bodies 100000
+"""
+import argparse
+import random
+import re
+import time
+
+from src.internship_scraper.extraction import CandidateExtractor
+
+
+def legacy_extract_email(sender):
+    match = re.search(r'<(.+?)>', sender)
+    return match.group(1) if match else sender
+
+
+def legacy_extract_name(sender):
+    match = re.match(r'(.*?)<', sender)
+    return match.group(1).strip() if match else sender.split('@')[0]
+
+
+def legacy_parse_candidate(body: str, sender: str):
+    name_match = re.search(r"Name[:\s]+(.+)", body, re.IGNORECASE)
+    phone_match = re.search(r"Phone[:\s]+([+\d\s\-()]+)", body, re.IGNORECASE)
+    linkedin_match = re.search(r"LinkedIn[:\s]+(https?://[\w\.-/]+|linkedin.com/in/[\w\-]+)", body, re.IGNORECASE)
+    github_match = re.search(r"GitHub[:\s]+(https?://[\w\.-/]+|github.com/[\w\-]+)", body, re.IGNORECASE)
+    internship_match = re.search(r"Internship[:\s]+([\w\s]+)", body, re.IGNORECASE)
+    code_match = re.search(r"Internship Code[:\s]+(\w+)", body, re.IGNORECASE)
+
+    email_addr = legacy_extract_email(sender)
+    name = name_match.group(1).strip() if name_match else legacy_extract_name(sender)
+    linkedin = linkedin_match.group(1).strip() if linkedin_match else None
+    github = github_match.group(1).strip() if github_match else None
+    phone = phone_match.group(1).strip() if phone_match else None
+    internship = internship_match.group(1).strip() if internship_match else (code_match.group(1).strip() if code_match else None)
+
+    return {
+        "name": name,
+        "email": email_addr,
+        "phone": phone,
+        "linkedin": linkedin,
+        "github": github,
+        "internship": internship,
+        "notes": body
+    }
+
+
+def legacy_extract(subject, body, sender, code_map):
+    candidate_data = legacy_parse_candidate(body, sender)
+    subject_match = re.match(r"Internship Application\s*[–-]\s*(\w+)\s*[–-]\s*(.+)", subject)
+    if subject_match:
+        code = subject_match.group(1)
+        candidate_data["name"] = subject_match.group(2).strip()
+        candidate_data["internship"] = code_map.get(code, code)
+    else:
+        code_match = re.search(r"Internship Application\s*[–-]\s*(\w+)", subject)
+        if code_match:
+            code = code_match.group(1)
+            candidate_data["internship"] = code_map.get(code, code)
+    return candidate_data
+
+
+FILLER = (
+    "I am writing to apply for the position advertised on your careers page. "
+    "During my studies I worked on several projects involving data pipelines, "
+    "web development and automated testing, and I would be glad to bring that "
+    "experience to your team.\n"
+)
+
+
+def build_corpus(count, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        lines = ["Hello,", "", FILLER * rng.randint(1, 6)]
+        fields = [
+            f"Name: Candidate {i}",
+            f"Phone: +216 {rng.randint(10, 99)} {rng.randint(100, 999)} {rng.randint(100, 999)}",
+            f"LinkedIn: https://linkedin.com/in/candidate-{i}",
+            f"GitHub: https://github.com/candidate{i}",
+            f"Internship Code: {rng.choice(['PY', 'JS', 'DS', 'ML'])}",
+        ]
+        # Not every applicant fills every field, and order varies
+        fields = [field for field in fields if rng.random() > 0.15]
+        rng.shuffle(fields)
+        lines.extend(fields)
+        lines.extend(["", "Best regards,", f"Candidate {i}"])
+        body = "\n".join(lines)
+        sender = f"Candidate {i} <candidate{i}@example.com>"
+        if rng.random() < 0.7:
+            subject = f"Internship Application – {rng.choice(['PY', 'JS'])} – Candidate {i}"
+        else:
+            subject = f"Application for the internship ({i})"
+        corpus.append((subject, body, sender))
+    return corpus
+
+
+def timed(label, corpus, extract):
+    started = time.perf_counter()
+    results = [extract(subject, body, sender) for subject, body, sender in corpus]
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {len(corpus):>7} bodies  {elapsed:8.3f}s  {len(corpus) / elapsed:10.0f} bodies/s")
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark candidate extraction")
+    parser.add_argument('--bodies', type=int, default=100000, help='Synthetic email bodies to parse')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus random seed')
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.bodies, args.seed)
+    code_map = {"PY": "Python Developer", "JS": "Frontend Developer"}
+    extractor = CandidateExtractor()
+    print(f"{args.bodies} bodies, avg {sum(len(body) for _, body, _ in corpus) // len(corpus)} chars")
+    legacy, legacy_time = timed("per-field re.search", corpus,
+                                lambda subject, body, sender: legacy_extract(subject, body, sender, code_map))
+    compiled, compiled_time = timed("CandidateExtractor", corpus,
+                                    lambda subject, body, sender: extractor.extract(subject, body, sender, code_map))
+    mismatches = sum(1 for old, new in zip(legacy, compiled) if old != new)
+    print(f"mismatches: {mismatches}")
+    print(f"speedup: {legacy_time / compiled_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: per-message FETCH loop vs batched UID FETCH (``IMAPClient.fetch_many``).
+
+Runs against an in-process IMAP stand-in that answers imaplib-shaped UID
+responses and sleeps for a fixed round-trip latency on every command.
+
+Usage (from the project root):
+    python -m benchmarks.bench_fetch_many --messages 500 --latency-ms 20
+"""
+import argparse
+import time
+from email.message import EmailMessage as MIMEMessage
+
+from src.internship_scraper.imap import IMAPClient
+
+
+def build_mailbox(count):
+    messages = {}
+    for uid in range(1, count + 1):
+        msg = MIMEMessage()
+        msg["Subject"] = f"Internship Application – PY – Candidate {uid}"
+        msg["From"] = f"Candidate {uid} <candidate{uid}@example.com>"
+        msg.set_content(f"Name: Candidate {uid}\nPhone: +216 00 000 {uid:03d}\n")
+        msg.add_attachment(b"%PDF-1.4" + b"0" * 2048, maintype="application", subtype="pdf", filename=f"cv{uid}.pdf")
+        messages[uid] = msg.as_bytes()
+    return messages
+
+
+class LatencyIMAP:
+    """imaplib.IMAP4 stand-in: every command costs one simulated round trip."""
+    def __init__(self, messages, latency):
+        self.messages = messages
+        self.latency = latency
+        self.round_trips = 0
+
+    def uid(self, command, *args):
+        self.round_trips += 1
+        time.sleep(self.latency)
+        if command == "SEARCH":
+            return "OK", [b" ".join(str(uid).encode() for uid in sorted(self.messages))]
+        if command == "FETCH":
+            data = []
+            for uid in self._expand(args[0]):
+                raw = self.messages.get(uid)
+                if raw is not None:
+                    data.append((f"{uid} (UID {uid} RFC822 {{{len(raw)}}}".encode(), raw))
+                    data.append(b")")
+            return "OK", data
+        return "OK", [None]
+
+    def logout(self):
+        return "BYE", [b"stand-in closing"]
+
+    @staticmethod
+    def _expand(sequence_set):
+        if isinstance(sequence_set, bytes):
+            sequence_set = sequence_set.decode()
+        for item in sequence_set.split(","):
+            start, _, end = item.partition(":")
+            yield from range(int(start), int(end or start) + 1)
+
+
+def run(label, messages, latency, fetch):
+    client = IMAPClient("imap.invalid", "bench", "bench")
+    client.connection = LatencyIMAP(messages, latency)
+    uids = client.search("ALL")
+    started = time.perf_counter()
+    count = sum(1 for _ in fetch(client, uids))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {count:>6} msgs  {elapsed:8.3f}s  {count / elapsed:10.1f} msg/s  {client.connection.round_trips - 1:>6} round trips")
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched UID FETCH against a per-id loop")
+    parser.add_argument('--messages', type=int, default=500, help='Messages in the simulated mailbox')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Simulated round-trip latency per command')
+    parser.add_argument('--batch-size', type=int, default=200, help='UIDs per batched FETCH')
+    args = parser.parse_args()
+
+    messages = build_mailbox(args.messages)
+    latency = args.latency_ms / 1000.0
+    print(f"{args.messages} messages, {args.latency_ms:.1f} ms latency, batch size {args.batch_size}")
+    per_id = run("per-id fetch_email", messages, latency,
+                 lambda client, uids: (client.fetch_email(uid) for uid in uids))
+    batched = run("fetch_many", messages, latency,
+                  lambda client, uids: client.fetch_many(uids, batch_size=args.batch_size))
+    print(f"speedup: {batched / per_id:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
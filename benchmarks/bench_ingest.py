@@ -0,0 +1,135 @@
+"""
+Benchmark: per-message candidate saves vs batched single-transaction ingestion.
+
+``legacy_save_candidate`` is the previous ``webapp/scraper.save_candidate``
+(one app context, one duplicate SELECT and two commits per message). It is
+compared with ``new_candidates`` + ``save_candidates`` committing once per
+batch. Each run gets a fresh file-backed SQLite database, so commit fsyncs
+are part of the numbers. 10% of the synthetic candidates are duplicates.
+
+Usage (from the project root):
+    python -m benchmarks.bench_ingest --candidates 10000 --batch-size 200
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from cryptography.fernet import Fernet
+
+os.environ.setdefault("FERNET_KEY", Fernet.generate_key().decode())
+
+from flask import Flask  # noqa: E402
+from datetime import datetime, timezone  # noqa: E402
+
+from src.internship_scraper.imap import Attachment as MailAttachment  # noqa: E402
+from src.internship_scraper.storage import AttachmentStore, store_attachments  # noqa: E402
+from src.webapp.db import db  # noqa: E402
+from src.webapp.models import Candidate, Attachment  # noqa: E402
+from src.webapp.scraper import new_candidates, save_candidates  # noqa: E402
+
+
+def legacy_save_candidate(app, candidate_data, attachments, store):
+    with app.app_context():
+        existing = Candidate.query.filter_by(email=candidate_data["email"]).first()
+        if existing:
+            return existing, []
+        candidate = Candidate(
+            name=candidate_data["name"],
+            email=candidate_data["email"],
+            phone=candidate_data.get("phone"),
+            linkedin=candidate_data.get("linkedin"),
+            internship=candidate_data.get("internship"),
+            notes=candidate_data.get("notes"),
+            applied_on=datetime.now(timezone.utc)
+        )
+        db.session.add(candidate)
+        db.session.commit()
+
+        saved_attachments = []
+        for blob in store_attachments(attachments, store):
+            att_row = Attachment(
+                candidate_id=candidate.id,
+                filename=blob.filename,
+                file_type=blob.content_type,
+                path=blob.relpath,
+                sha256=blob.sha256,
+                size=blob.size,
+                uploaded_on=datetime.now(timezone.utc)
+            )
+            db.session.add(att_row)
+            saved_attachments.append(att_row)
+        db.session.commit()
+        return candidate, saved_attachments
+
+
+def build_candidates(count):
+    candidates = []
+    for i in range(count):
+        # Every tenth applicant writes twice
+        n = i - 1 if i % 10 == 9 else i
+        data = {
+            "name": f"Candidate {n}",
+            "email": f"candidate{n}@example.com",
+            "phone": f"+216 00 {n:06d}",
+            "linkedin": f"https://linkedin.com/in/candidate-{n}",
+            "internship": "Python Developer",
+            "notes": f"Name: Candidate {n}\nPhone: +216 00 {n:06d}\n" * 5,
+        }
+        attachments = [MailAttachment(f"cv{n}.pdf", b"%PDF-1.4 " + str(n).encode() * 64, content_type="application/pdf")]
+        candidates.append((data, attachments))
+    return candidates
+
+
+def make_app(workdir, label):
+    app = Flask(f"bench_{label}")
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, label + '.db')}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app, AttachmentStore(os.path.join(workdir, label + "-attachments"))
+
+
+def run_legacy(app, store, candidates, batch_size):
+    for data, attachments in candidates:
+        legacy_save_candidate(app, data, attachments, store)
+
+
+def run_bulk(app, store, candidates, batch_size):
+    with app.app_context():
+        for start in range(0, len(candidates), batch_size):
+            # new_candidates only looks at the candidate_data half of its (msg, candidate_data) pairs
+            batch = [(attachments, data) for data, attachments in candidates[start:start + batch_size]]
+            fresh = new_candidates(batch)
+            save_candidates([(data, attachments) for attachments, data in fresh], store)
+            db.session.commit()
+
+
+def timed(label, run, workdir, candidates, batch_size):
+    app, store = make_app(workdir, label)
+    started = time.perf_counter()
+    run(app, store, candidates, batch_size)
+    elapsed = time.perf_counter() - started
+    with app.app_context():
+        stored = (db.session.query(Candidate).count(), db.session.query(Attachment).count())
+    print(f"{label:<8} {len(candidates):>7} candidates  {elapsed:8.3f}s  {len(candidates) / elapsed:10.0f} /s  "
+          f"stored {stored[0]} candidates, {stored[1]} attachments")
+    return elapsed, stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark candidate ingestion")
+    parser.add_argument('--candidates', type=int, default=10000, help='Synthetic candidates to ingest')
+    parser.add_argument('--batch-size', type=int, default=200, help='Candidates per transaction for bulk ingestion')
+    args = parser.parse_args()
+
+    candidates = build_candidates(args.candidates)
+    with tempfile.TemporaryDirectory() as workdir:
+        legacy, legacy_stored = timed("legacy", run_legacy, workdir, candidates, args.batch_size)
+        bulk, bulk_stored = timed("bulk", run_bulk, workdir, candidates, args.batch_size)
+    assert legacy_stored == bulk_stored
+    print(f"speedup: {legacy / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: header-only filtering of fetched messages.
+
+A batch of raw messages (from ``benchmarks.corpus``) is already in memory, as
+after a ``UID FETCH``. Each is turned into an ``EmailMessage`` and kept only
+when its subject and sender say it is an application. Nothing reads the body
+or the attachments. Compares:
+
+- eager: the previous ``parse_email``. It builds a ``__dict__`` object from a
+  full MIME parse with every body and attachment payload decoded up front.
+- lazy: the current ``parse_email``. It wraps a memoryview and decodes only
+  the header block when ``subject``/``sender`` are read.
+
+Each mode runs in its own process. The report covers time, bytes allocated
+during filtering (tracemalloc peak), the process's peak RSS growth and the
+per-object size.
+
+Usage (from the project root):
+    python -m benchmarks.bench_messages --messages 300
+"""
+import argparse
+import email
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.corpus import generate
+from src.internship_scraper.imap import IMAPClient, parse_email
+
+MB = 1024 * 1024
+
+
+class LegacyAttachment:
+    def __init__(self, filename, data, content_type=None):
+        self.filename = filename
+        self.data = data
+        self.content_type = content_type
+
+
+class LegacyEmailMessage:
+    def __init__(self, subject, sender, body, attachments, uid=None):
+        self.subject = subject
+        self.sender = sender
+        self.body = body
+        self.attachments = attachments
+        self.uid = uid
+
+
+def legacy_parse_email(raw, uid=None):
+    """parse_email before lazy decoding: everything decoded at once."""
+    msg = email.message_from_bytes(raw)
+    subject = IMAPClient._safe_decode(msg.get("Subject"))
+    sender = IMAPClient._safe_decode(msg.get("From"))
+    body = ""
+    attachments = []
+    if msg.is_multipart():
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            content_disp = part.get("Content-Disposition")
+            if content_type == "text/plain" and (not content_disp or "attachment" not in content_disp.lower()):
+                payload = part.get_payload(decode=True)
+                if payload:
+                    body = payload.decode(errors="ignore")
+            if content_disp and "attachment" in content_disp.lower():
+                attachments.append(LegacyAttachment(part.get_filename(), part.get_payload(decode=True), content_type))
+    else:
+        payload = msg.get_payload(decode=True)
+        if payload:
+            body = payload.decode(errors="ignore")
+    return LegacyEmailMessage(subject, sender, body, attachments, uid=uid)
+
+
+def rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+def run_mode(mode, count):
+    parse = legacy_parse_email if mode == "eager" else parse_email
+    raws = list(generate(count))
+    rss_before = rss_mb()
+    tracemalloc.start()
+    started = time.perf_counter()
+    kept = [msg for msg in (parse(raw, uid=str(i).encode()) for i, raw in enumerate(raws))
+            if msg.subject.startswith("Internship Application") and "@" in msg.sender]
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    obj = kept[0]
+    # Instance plus its __dict__ when it has one
+    size = sys.getsizeof(obj) + (sys.getsizeof(obj.__dict__) if hasattr(obj, "__dict__") else 0)
+    return {"mode": mode, "seconds": seconds, "kept": len(kept), "traced_peak_mb": peak / MB,
+            "rss_growth_mb": rss_mb() - rss_before, "object_bytes": size,
+            "raw_mb": sum(len(raw) for raw in raws) / MB}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark header-only filtering with eager vs lazy messages")
+    parser.add_argument('--messages', type=int, default=300, help='Messages in the batch')
+    parser.add_argument('--mode', choices=["eager", "lazy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.messages)))
+        return
+    results = []
+    for mode in ("eager", "lazy"):
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_messages", "--messages", str(args.messages),
+                              "--mode", mode], capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(out))
+    print(f"{args.messages} messages, {results[0]['raw_mb']:.1f} MB raw, {results[0]['kept']} kept by subject/sender")
+    print(f"{'mode':<6} {'time s':>8} {'msg/s':>9} {'allocated MB':>13} {'RSS growth MB':>14} {'object bytes':>13}")
+    for r in results:
+        print(f"{r['mode']:<6} {r['seconds']:>8.3f} {r['kept'] / r['seconds']:>9.0f} {r['traced_peak_mb']:>13.1f} "
+              f"{r['rss_growth_mb']:>14.1f} {r['object_bytes']:>13}")
+
+
+if __name__ == "__main__":
+    main()
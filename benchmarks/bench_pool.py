@@ -0,0 +1,63 @@
+"""
+Benchmark: IMAPConnectionPool throughput versus number of sessions.
+
+Every session gets its own latency-injected IMAP stand-in, so the numbers show
+how fetch throughput scales with parallel sessions up to the cap.
+
+Usage (from the project root):
+    python -m benchmarks.bench_pool --messages 2000 --latency-ms 20 --connections 1 2 4 8
+"""
+import argparse
+import time
+
+from benchmarks.bench_fetch_many import LatencyIMAP, build_mailbox
+from src.internship_scraper.imap import IMAPClient
+from src.internship_scraper.pool import IMAPConnectionPool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel IMAP sessions")
+    parser.add_argument('--messages', type=int, default=2000, help='Messages in the simulated mailbox')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Simulated round-trip latency per command')
+    parser.add_argument('--per-message-ms', type=float, default=1.0, help='Simulated transfer time per message in a FETCH')
+    parser.add_argument('--batch-size', type=int, default=50, help='UIDs per batched FETCH')
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 2, 4, 8], help='Pool sizes to try')
+    args = parser.parse_args()
+
+    messages = build_mailbox(args.messages)
+
+    class StandInClient(IMAPClient):
+        def connect(self):
+            self.connection = SlowTransferIMAP(messages, args.latency_ms / 1000.0, args.per_message_ms / 1000.0)
+
+    print(f"{args.messages} messages, {args.latency_ms:.1f} ms latency, "
+          f"{args.per_message_ms:.1f} ms/message transfer, batch size {args.batch_size}")
+    baseline = None
+    for size in args.connections:
+        pool = IMAPConnectionPool("imap.invalid", "bench", "bench", size=size, max_connections=size,
+                                  client_factory=StandInClient)
+        pool.connect()
+        uids = pool.search("ALL")
+        started = time.perf_counter()
+        count = sum(1 for _ in pool.fetch_many(uids, batch_size=args.batch_size))
+        rate = count / (time.perf_counter() - started)
+        baseline = baseline or rate
+        print(f"{size:>3} sessions  {rate:10.1f} msg/s  {rate / baseline:5.2f}x  ({len(pool.clients)} opened)")
+        pool.logout()
+
+
+class SlowTransferIMAP(LatencyIMAP):
+    """Adds per-message transfer time to FETCH so a session is busy for the whole batch."""
+    def __init__(self, messages, latency, per_message):
+        super().__init__(messages, latency)
+        self.per_message = per_message
+
+    def uid(self, command, *args):
+        status, data = super().uid(command, *args)
+        if command == "FETCH":
+            time.sleep(self.per_message * sum(1 for part in data if isinstance(part, tuple)))
+        return status, data
+
+
+if __name__ == "__main__":
+    main()
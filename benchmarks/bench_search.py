@@ -0,0 +1,86 @@
+"""
+Benchmark: full-text search over candidate email bodies.
+
+Compares a ``LIKE '%term%'`` scan of ``candidates.notes`` (what a search
+without an index has to do) with ``services.search_candidates`` on the FTS5
+index, for a rare term, a common term, a two-word query and a prefix. Bodies
+are synthetic, a few hundred words each. Also reports how long the one-off
+``rebuild_search_index`` backfill takes for the whole table.
+
+Usage (from the project root):
+    python -m benchmarks.bench_search --candidates 100000
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from benchmarks.bench_dashboard import measure
+from benchmarks.bench_ingest import make_app
+from src.webapp.db import db
+from src.webapp.models import Candidate
+from src.webapp.services import rebuild_search_index, search_candidates
+
+SKILLS = ["python", "django", "flask", "react", "kubernetes", "terraform", "pandas", "pytorch", "figma", "docker",
+          "postgresql", "typescript", "rust", "golang", "tensorflow", "photoshop", "linux", "graphql", "redis", "spark"]
+FILLER = ("hello dear hiring team I am writing to apply for the internship position at your company my studies "
+          "include computer science and I have worked on several projects during university please find attached "
+          "my resume and portfolio I look forward to hearing from you best regards").split()
+
+
+def body(rng):
+    words = [rng.choice(FILLER) for _ in range(rng.randint(150, 400))]
+    for skill in rng.sample(SKILLS, 4):
+        words.insert(rng.randrange(len(words)), skill)
+    if rng.random() < 0.001:
+        words.insert(rng.randrange(len(words)), "haskell")
+    return " ".join(words)
+
+
+def populate(count, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        rows.append({"name": f"Candidate {i}", "email": f"candidate{i}@example.com",
+                     "internship": "Python Developer", "notes": body(rng)})
+        if len(rows) == 5000:
+            db.session.execute(db.insert(Candidate), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(Candidate), rows)
+    db.session.commit()
+
+
+def like_scan(*terms):
+    query = Candidate.query
+    for term in terms:
+        query = query.filter(Candidate.notes.like(f"%{term}%"))
+    return query.limit(50).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark candidate full-text search")
+    parser.add_argument('--candidates', type=int, default=100000, help='Synthetic candidates to index')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per query (median is reported)')
+    args = parser.parse_args()
+
+    queries = [("rare", ["haskell"]), ("common", ["kubernetes"]), ("two words", ["react", "docker"]),
+               ("prefix", ["terra*"])]
+    with tempfile.TemporaryDirectory() as workdir:
+        app, _ = make_app(workdir, "search")
+        with app.app_context():
+            started = time.perf_counter()
+            populate(args.candidates)
+            print(f"insert {args.candidates} candidates (index kept by triggers): {time.perf_counter() - started:.2f}s")
+            started = time.perf_counter()
+            rebuild_search_index()
+            print(f"backfill (rebuild) of the whole index: {time.perf_counter() - started:.2f}s")
+            print(f"{'query':<10}  {'LIKE scan':>10}  {'FTS5 page':>10}   (ms)")
+            for label, terms in queries:
+                like = measure(lambda: like_scan(*(t.rstrip("*") for t in terms)), args.repeat)
+                fts = measure(lambda: search_candidates(" ".join(terms)), args.repeat)
+                print(f"{label:<10}  {like:>10.1f}  {fts:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
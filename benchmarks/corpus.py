@@ -0,0 +1,194 @@
+"""
+Deterministic synthetic mailbox of internship applications.
+
+The same ``--seed`` always yields byte-identical messages, so benchmark runs
+on different commits see the same input. Messages look like what the inbox
+actually receives:
+
+- ``Internship Application – CODE – Name`` subjects, RFC 2047 encoded (UTF-8
+  base64/quoted-printable, ISO-8859-1) since names carry accents;
+- multipart/mixed bodies with a text/plain + text/html alternative in UTF-8,
+  ISO-8859-1 or Windows-1252 and quoted-printable, base64 or 8bit transfer
+  encoding, with the Name/Phone/LinkedIn/GitHub fields the extractor reads;
+- PDF-sized attachments (CV, sometimes a cover letter or portfolio);
+- a few messages that are not applications (newsletters, replies) and
+  repeat applicants, as in a real inbox.
+
+Usage (from the project root):
+    python -m benchmarks.corpus --count 1000 --out /tmp/corpus            # one .eml per message
+    python -m benchmarks.corpus --count 1000 --out /tmp/corpus.mbox --mbox
+"""
+import argparse
+import glob
+import mailbox
+import os
+import random
+from email.header import Header
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email import charset as email_charset
+from email.utils import format_datetime, formataddr
+from datetime import datetime, timedelta, timezone
+
+CODES = {"PY": "Python Developer", "WD": "Web Developer", "GD": "Graphic Designer", "ML": "Machine Learning Intern"}
+FIRST_NAMES = ["Amen", "Sarra", "Yassine", "Chloé", "Mehdi", "Inès", "Jürgen", "Zoë", "Rania", "Aymen", "Léa", "Omar",
+               "Nour", "François", "Emna", "Hédi"]
+LAST_NAMES = ["Kerimi", "Ben Salah", "Trabelsi", "Dupont", "Gharbi", "Müller", "Hammami", "Lefèvre", "Jaziri",
+              "Bouaziz", "Ayari", "Rossi"]
+SKILLS = ["Python", "Django", "Flask", "React", "TypeScript", "Figma", "Photoshop", "PyTorch", "pandas", "Docker",
+          "PostgreSQL", "Kubernetes"]
+SENTENCES = [
+    "I am writing to apply for the internship position advertised on your website.",
+    "During my studies I built several projects, described in the attached résumé.",
+    "I would be delighted to join your team for the summer.",
+    "My final-year project focused on data pipelines and web dashboards.",
+    "I am available for an interview at your earliest convenience.",
+    "Thank you for considering my application; I look forward to hearing from you.",
+]
+# (charset, transfer encoding) of the text parts
+BODY_ENCODINGS = [("utf-8", "quoted-printable"), ("utf-8", "base64"), ("utf-8", "8bit"),
+                  ("iso-8859-1", "quoted-printable"), ("windows-1252", "quoted-printable"), ("windows-1252", "8bit")]
+SUBJECT_ENCODINGS = [("utf-8", "b"), ("utf-8", "q"), ("iso-8859-1", "q")]
+KB = 1024
+
+
+def _text_part(text, subtype, charset, encoding):
+    cs = email_charset.Charset(charset)
+    cs.body_encoding = {"base64": email_charset.BASE64, "quoted-printable": email_charset.QP}.get(encoding)
+    return MIMEText(text, subtype, cs)
+
+
+def _encoded_header(text, charset, encoding):
+    cs = email_charset.Charset(charset)
+    cs.header_encoding = email_charset.BASE64 if encoding == "b" else email_charset.QP
+    return Header(text, cs).encode()
+
+
+def _pdf(rng, size):
+    """Bytes that start like a PDF and compress about as badly as one."""
+    head = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    return head + rng.randbytes(max(size - len(head), 0))
+
+
+def make_message(index, rng, start=datetime(2024, 1, 1, tzinfo=timezone.utc)):
+    """One raw RFC 822 message (bytes); everything comes from ``rng``."""
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    # Every twentieth sender is someone who applied before
+    person = index if index % 20 else rng.randrange(max(index, 1))
+    name = f"{first} {last}"
+    address = f"applicant{person}@example.com"
+    sent = start + timedelta(minutes=index * 7 + rng.randrange(7))
+    charset, encoding = rng.choice(BODY_ENCODINGS)
+
+    if rng.random() < 0.05:
+        # Not an application
+        msg = MIMEMultipart("alternative", boundary=f"==bench-{index}-alt==")
+        msg["Subject"] = rng.choice(["Weekly newsletter", "Re: your question", "Meeting notes"])
+        msg["From"] = formataddr(("Newsletter", f"news{index}@example.org"))
+        msg.attach(_text_part(" ".join(rng.sample(SENTENCES, 3)), "plain", charset, encoding))
+    else:
+        code = rng.choice(list(CODES))
+        skills = ", ".join(rng.sample(SKILLS, 4))
+        lines = [
+            "Hello,", "",
+            *rng.sample(SENTENCES, rng.randint(3, len(SENTENCES))), "",
+            f"Name: {name}",
+            f"Phone: +216 {rng.randrange(10, 99)} {rng.randrange(100, 999)} {rng.randrange(100, 999)}",
+            f"LinkedIn: https://linkedin.com/in/{first.lower()}-{person}",
+            f"GitHub: https://github.com/{first.lower()}{person}",
+            f"Internship: {CODES[code]}",
+            f"Skills: {skills}", "",
+            "Best regards,", name,
+        ]
+        text = "\n".join(lines)
+        # Windows-1252/Latin-1 can't carry every name: transliterate like real mail clients do
+        text = text.encode(charset, errors="replace").decode(charset)
+        html = "<html><body>" + "".join(f"<p>{line}</p>" for line in lines if line) + "</body></html>"
+        html = html.encode(charset, errors="replace").decode(charset)
+
+        # Fixed boundaries: the email package would pick random ones
+        msg = MIMEMultipart("mixed", boundary=f"==bench-{index}-mixed==")
+        subject_charset, subject_encoding = rng.choice(SUBJECT_ENCODINGS)
+        subject = f"Internship Application – {code} – {name}"
+        if subject_charset != "utf-8":
+            subject = subject.replace("–", "-")
+            subject = subject.encode(subject_charset, errors="replace").decode(subject_charset)
+        msg["Subject"] = _encoded_header(subject, subject_charset, subject_encoding)
+        msg["From"] = formataddr((name, address), charset="utf-8")
+        body = MIMEMultipart("alternative", boundary=f"==bench-{index}-alt==")
+        body.attach(_text_part(text, "plain", charset, encoding))
+        body.attach(_text_part(html, "html", charset, encoding))
+        msg.attach(body)
+
+        files = [(f"CV_{first}_{last}.pdf".replace(" ", "_"), rng.randint(80 * KB, 600 * KB))]
+        if rng.random() < 0.3:
+            files.append(("cover_letter.pdf", rng.randint(20 * KB, 120 * KB)))
+        if rng.random() < 0.1:
+            files.append(("portfolio.pdf", rng.randint(1024 * KB, 3072 * KB)))
+        for filename, size in files:
+            attachment = MIMEApplication(_pdf(rng, size), "pdf")
+            attachment.add_header("Content-Disposition", "attachment", filename=filename)
+            msg.attach(attachment)
+
+    msg["To"] = "internships@example.com"
+    msg["Date"] = format_datetime(sent)
+    msg["Message-ID"] = f"<bench-{index}@example.com>"
+    return msg.as_bytes()
+
+
+def generate(count, seed=0):
+    """Yield ``count`` raw messages; the same seed always gives the same bytes."""
+    rng = random.Random(seed)
+    for index in range(count):
+        yield make_message(index, rng)
+
+
+def write_eml(directory, messages):
+    os.makedirs(directory, exist_ok=True)
+    for index, raw in enumerate(messages):
+        with open(os.path.join(directory, f"{index:07d}.eml"), "wb") as f:
+            f.write(raw)
+
+
+def write_mbox(path, messages):
+    box = mailbox.mbox(path, create=True)
+    box.lock()
+    try:
+        for raw in messages:
+            box.add(raw)
+        box.flush()
+    finally:
+        box.unlock()
+        box.close()
+
+
+def load(path):
+    """Raw messages of a corpus written by this module (a directory of .eml files or an mbox)."""
+    if os.path.isdir(path):
+        for name in sorted(glob.glob(os.path.join(path, "*.eml"))):
+            with open(name, "rb") as f:
+                yield f.read()
+    else:
+        for message in mailbox.mbox(path, create=False):
+            yield message.as_bytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic mailbox of internship applications")
+    parser.add_argument('--count', type=int, default=1000, help='Messages to generate')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (same seed, same corpus)')
+    parser.add_argument('--out', required=True, help='Directory for .eml files, or mbox file with --mbox')
+    parser.add_argument('--mbox', action='store_true', help='Write a single mbox file instead of .eml files')
+    args = parser.parse_args()
+
+    messages = generate(args.count, args.seed)
+    if args.mbox:
+        write_mbox(args.out, messages)
+    else:
+        write_eml(args.out, messages)
+    print(f"Wrote {args.count} messages to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+End-to-end benchmark suite over a synthetic mailbox.
+
+Runs the ingestion pipeline over a ``benchmarks.corpus`` mailbox one stage at
+a time so each is timed on its own:
+
+- parse:       raw RFC 822 bytes -> ``EmailMessage`` (``parse_email``), with the
+               headers, body and attachment payloads decoded
+- extract:     ``extract_candidate`` on subject, body and sender
+- attachments: writing attachment content to a fresh ``AttachmentStore``
+- ingest:      duplicate check and bulk insert into a fresh SQLite database,
+               one transaction per batch (``new_candidates`` + ``save_candidates``)
+
+For every stage it reports wall time, messages/s, MB/s of input and the
+process peak RSS so far, and writes everything to a JSON file together with
+the commit it ran on. ``--compare`` checks a run against an earlier result
+file and exits non-zero when a stage got slower than ``--tolerance`` allows.
+
+Usage (from the project root):
+    python -m benchmarks.suite --count 500 --output benchmarks/results/after.json
+    python -m benchmarks.suite --count 500 --compare benchmarks/results/before.json
+    python -m benchmarks.suite --corpus /tmp/corpus.mbox        # a corpus written by benchmarks.corpus
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.bench_ingest import make_app
+from benchmarks.corpus import CODES, generate, load
+from src.internship_scraper.extraction import extract_candidate
+from src.internship_scraper.imap import Attachment as MailAttachment, parse_email
+from src.internship_scraper.storage import store_attachments
+from src.webapp.db import db
+from src.webapp.scraper import new_candidates, save_candidates
+
+MB = 1024 * 1024
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def stage(results, name, items, size, run):
+    """Time ``run()`` and record it under ``name``; returns what ``run`` returned."""
+    started = time.perf_counter()
+    value = run()
+    seconds = time.perf_counter() - started
+    results[name] = {
+        "seconds": round(seconds, 4),
+        "items": items,
+        "items_per_s": round(items / seconds, 1) if seconds else None,
+        "mb": round(size / MB, 2),
+        "mb_per_s": round(size / MB / seconds, 2) if seconds else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    print(f"{name:<12} {items:>7} in {seconds:8.3f}s  {results[name]['items_per_s'] or 0:>10.1f} /s  "
+          f"{results[name]['mb_per_s'] or 0:>8.2f} MB/s  peak RSS {results[name]['peak_rss_mb']:.0f} MB")
+    return value
+
+
+def parse_all(raw_messages):
+    """``parse_email`` each message and read every field the later stages use.
+
+    Messages decode lazily, so without this the decoding would be timed in
+    extract and attachments, and parse would only time wrapping the bytes.
+    """
+    messages = []
+    for i, raw in enumerate(raw_messages):
+        msg = parse_email(raw, uid=str(i).encode())
+        msg.subject, msg.sender, msg.body
+        for att in msg.attachments:
+            att.data
+        messages.append(msg)
+    return messages
+
+
+def run_suite(raw_messages, workdir, batch_size):
+    results = {}
+    raw_size = sum(len(raw) for raw in raw_messages)
+
+    messages = stage(results, "parse", len(raw_messages), raw_size, lambda: parse_all(raw_messages))
+    del raw_messages[:]
+
+    text_size = sum(len(msg.subject) + len(msg.body) + len(msg.sender) for msg in messages)
+    candidates = stage(results, "extract", len(messages), text_size,
+                       lambda: [extract_candidate(msg.subject, msg.body, msg.sender, CODES) for msg in messages])
+
+    app, store = make_app(workdir, "suite")
+    attachment_size = sum(len(att.data or b"") for msg in messages for att in msg.attachments)
+    stored = stage(results, "attachments", sum(len(msg.attachments) for msg in messages), attachment_size,
+                   lambda: [store_attachments(msg.attachments, store) for msg in messages])
+    for msg, blobs in zip(messages, stored):
+        # Content is on disk now, as after a streamed fetch; ingestion only records it
+        msg.attachments = [MailAttachment(blob.filename, None, blob.content_type, path=blob.path, sha256=blob.sha256)
+                           for blob in blobs]
+
+    def ingest():
+        inserted = 0
+        with app.app_context():
+            pairs = list(zip(messages, candidates))
+            for start in range(0, len(pairs), batch_size):
+                fresh = new_candidates(pairs[start:start + batch_size])
+                inserted += len(save_candidates([(data, msg.attachments) for msg, data in fresh], store))
+                db.session.commit()
+        return inserted
+
+    inserted = stage(results, "ingest", len(messages), text_size, ingest)
+    results["ingest"]["inserted"] = inserted
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print throughput changes against ``baseline``; returns the stages that regressed."""
+    regressions = []
+    print(f"\ncompared with {baseline.get('commit') or 'baseline'} ({baseline.get('date', '?')}):")
+    for name, current in results.items():
+        before = baseline.get("stages", {}).get(name)
+        if not before or not before.get("items_per_s") or not current.get("items_per_s"):
+            continue
+        change = current["items_per_s"] / before["items_per_s"] - 1
+        flag = ""
+        if change < -tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<12} {before['items_per_s']:>10.1f} -> {current['items_per_s']:>10.1f} /s  {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the end-to-end ingestion benchmark suite")
+    parser.add_argument('--count', type=int, default=500, help='Messages to generate (ignored with --corpus)')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus seed')
+    parser.add_argument('--corpus', help='Use an existing .eml directory or mbox instead of generating one')
+    parser.add_argument('--batch-size', type=int, default=200, help='Candidates per ingestion transaction')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed throughput drop per stage before --compare fails (fraction)')
+    args = parser.parse_args()
+
+    raw_messages = list(load(args.corpus) if args.corpus else generate(args.count, args.seed))
+    corpus_mb = sum(len(raw) for raw in raw_messages) / MB
+    print(f"corpus: {len(raw_messages)} messages, {corpus_mb:.1f} MB")
+    with tempfile.TemporaryDirectory() as workdir:
+        stages = run_suite(raw_messages, workdir, args.batch_size)
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": {"source": args.corpus or "generated", "seed": None if args.corpus else args.seed,
+                   "messages": stages["parse"]["items"], "mb": round(corpus_mb, 2)},
+        "batch_size": args.batch_size,
+        "stages": stages,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(stages, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,4 +5,5 @@ Provides modular functions and classes for connecting to IMAP, searching, fetchi
 Can be used as a CLI tool or imported as a library.
 """
 
-from .imap import IMAPClient, EmailMessage, Attachment
\ No newline at end of file
+from .imap import IMAPClient, EmailMessage, Attachment, parse_email, uid_set
+from .aio import AsyncIMAPClient
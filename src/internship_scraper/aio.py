@@ -0,0 +1,243 @@
+"""
+asyncio-native IMAP client.
+
+``AsyncIMAPClient`` mirrors ``IMAPClient`` (``connect``, ``search``,
+``fetch_email``, ``fetch_many``, ``mark_read``, ``logout``) on top of asyncio
+streams. Commands are tagged and may be in flight together: ``fetch_many``
+pipelines several UID FETCH batches over one connection, and one event loop
+can drive any number of clients. Responses are collected in imaplib's shape
+so MIME parsing is shared with the sync client.
+"""
+import asyncio
+import imaplib
+import logging
+import re
+import ssl
+from collections import deque
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from .imap import EmailMessage, iter_fetch_response, parse_email, uid_set
+
+# Response types are case-insensitive (RFC 3501 section 9); they are upper-cased before use
+_TAGGED_RE = re.compile(rb"^(?P<tag>[A-Z]\d+) (?P<type>[A-Z]+) ?(?P<data>.*)$", re.IGNORECASE)
+_UNTAGGED_STATUS_RE = re.compile(rb"^\* (?P<data>\d+) (?P<type>[A-Z-]+)( (?P<data2>.*))?$", re.IGNORECASE)
+_UNTAGGED_RE = re.compile(rb"^\* (?P<type>[A-Z-]+)( (?P<data>.*))?$", re.IGNORECASE)
+_RESPONSE_CODE_RE = re.compile(rb"\[(?P<type>[A-Z-]+)( (?P<data>[^\]]*))?\]", re.IGNORECASE)
+_LITERAL_RE = re.compile(rb".*\{(?P<size>\d+)\}$")
+
+class AsyncIMAPError(Exception):
+    """Raised when the server answers a command with NO or BAD, or the connection drops."""
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+class _Command:
+    def __init__(self, tag: bytes):
+        self.tag = tag
+        self.untagged: Dict[str, List] = {}
+        self.future = asyncio.get_running_loop().create_future()
+
+class AsyncIMAPClient:
+    """asyncio IMAP client with the same surface as IMAPClient.
+
+    Untagged responses are attributed to the oldest command still waiting for
+    its tagged completion, which matches how servers answer pipelined
+    commands; every FETCH result also carries its UID.
+    """
+    def __init__(self, server: str, user: str, password: str, folder: str = "INBOX",
+                 port: Optional[int] = None, ssl_context: Optional[ssl.SSLContext] = None, use_ssl: bool = True):
+        self.server = server
+        self.user = user
+        self.password = password
+        self.folder = folder
+        # Like imaplib: IMAPS on 993, plain IMAP on 143
+        self.port = port if port is not None else (imaplib.IMAP4_SSL_PORT if use_ssl else imaplib.IMAP4_PORT)
+        self.ssl_context = ssl_context
+        self.use_ssl = use_ssl
+        self.uidvalidity = None
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._pending = deque()
+        self._tag_counter = 0
+
+    async def connect(self):
+        """Connect, login and select the folder."""
+        try:
+            context = (self.ssl_context or ssl.create_default_context()) if self.use_ssl else None
+            self._reader, self._writer = await asyncio.open_connection(self.server, self.port, ssl=context)
+            greeting = await self._reader.readline()
+            if not greeting.startswith(b"* OK") and not greeting.startswith(b"* PREAUTH"):
+                raise AsyncIMAPError(f"Unexpected greeting: {greeting!r}")
+            self._reader_task = asyncio.create_task(self._dispatch())
+            await self._command(f"LOGIN {_quote(self.user)} {_quote(self.password)}")
+            untagged = await self._command(f"SELECT {_quote(self.folder)}")
+            values = untagged.get("UIDVALIDITY")
+            self.uidvalidity = int(values[0]) if values else None
+            logging.info(f"Connected to {self.server}, folder {self.folder}")
+        except Exception as e:
+            logging.error(f"IMAP connection failed: {e}")
+            raise
+
+    async def search(self, criteria: str = "UNSEEN") -> List[bytes]:
+        """Search for emails matching the criteria and return their UIDs."""
+        try:
+            untagged = await self._command(f"UID SEARCH {criteria}")
+            return b" ".join(data for data in untagged.get("SEARCH", []) if data).split()
+        except Exception as e:
+            logging.error(f"Search error: {e}")
+            return []
+
+    async def search_after(self, last_uid: int) -> List[bytes]:
+        """Return UIDs strictly greater than ``last_uid`` (``UID n+1:*``)."""
+        return [uid for uid in await self.search(f"UID {last_uid + 1}:*") if int(uid) > last_uid]
+
+    async def fetch_email(self, msg_id: bytes) -> Optional[EmailMessage]:
+        """Fetch and parse a single email by UID."""
+        uid = msg_id.decode() if isinstance(msg_id, bytes) else str(msg_id)
+        try:
+            untagged = await self._command(f"UID FETCH {uid} (UID BODY.PEEK[])")
+            for _, raw in iter_fetch_response(untagged.get("FETCH", [])):
+                return parse_email(raw, uid=uid.encode())
+            return None
+        except Exception as e:
+            logging.error(f"Failed to fetch email {msg_id}: {e}")
+            return None
+
+    async def fetch_many(self, uids: Iterable[bytes], batch_size: int = 200, pipeline: int = 4) -> AsyncIterator[EmailMessage]:
+        """Fetch emails in UID-set batches with up to ``pipeline`` FETCH commands in flight.
+
+        Messages are yielded in UID order; a failed batch is logged and skipped.
+        """
+        uids = sorted(uids, key=int)
+        in_flight = deque()
+        for start in range(0, len(uids), batch_size):
+            batch = uids[start:start + batch_size]
+            in_flight.append((batch, asyncio.ensure_future(self._command(f"UID FETCH {uid_set(batch)} (UID BODY.PEEK[])"))))
+            if len(in_flight) >= pipeline:
+                for msg in await self._collect_batch(*in_flight.popleft()):
+                    yield msg
+        while in_flight:
+            for msg in await self._collect_batch(*in_flight.popleft()):
+                yield msg
+
+    async def _collect_batch(self, batch: List[bytes], future) -> List[EmailMessage]:
+        try:
+            untagged = await future
+        except Exception as e:
+            logging.error(f"Failed to fetch emails {uid_set(batch)}: {e}")
+            return []
+        messages = []
+        for uid, raw in iter_fetch_response(untagged.get("FETCH", [])):
+            try:
+                messages.append(parse_email(raw, uid=uid))
+            except Exception as e:
+                logging.error(f"Failed to parse email {uid}: {e}")
+        return messages
+
+    async def mark_read(self, msg_id: bytes):
+        """Mark an email as read."""
+        uid = msg_id.decode() if isinstance(msg_id, bytes) else str(msg_id)
+        try:
+            await self._command(f"UID STORE {uid} +FLAGS (\\Seen)")
+        except Exception as e:
+            logging.warning(f"Failed to mark email {msg_id} as read: {e}")
+
+    async def mark_read_many(self, uids: Iterable[bytes], batch_size: int = 1000) -> bool:
+        """Mark emails as read with one silent ``UID STORE <set> +FLAGS.SILENT`` per batch."""
+        uids = sorted(uids, key=int)
+        ok = True
+        for start in range(0, len(uids), batch_size):
+            batch = uid_set(uids[start:start + batch_size])
+            try:
+                await self._command(f"UID STORE {batch} +FLAGS.SILENT (\\Seen)")
+            except Exception as e:
+                logging.warning(f"Failed to mark emails {batch} as read: {e}")
+                ok = False
+        return ok
+
+    async def logout(self):
+        """Logout from the IMAP server and close the connection."""
+        if not self._writer:
+            return
+        try:
+            await self._command("LOGOUT")
+            logging.info("Logged out from IMAP server.")
+        except Exception as e:
+            logging.warning(f"Logout failed: {e}")
+        finally:
+            self._writer.close()
+            if self._reader_task:
+                self._reader_task.cancel()
+            self._writer = None
+
+    async def _command(self, line: str) -> Dict[str, List]:
+        """Send one tagged command and wait for its completion; returns its untagged responses."""
+        if self._writer is None or self._reader_task is None or self._reader_task.done():
+            raise AsyncIMAPError("Not connected")
+        self._tag_counter += 1
+        command = _Command(f"A{self._tag_counter:04d}".encode())
+        self._pending.append(command)
+        self._writer.write(command.tag + b" " + line.encode() + b"\r\n")
+        await self._writer.drain()
+        return await command.future
+
+    async def _dispatch(self):
+        """Read responses forever, routing them to pending commands."""
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    raise AsyncIMAPError("Connection closed by server")
+                line = line.rstrip(b"\r\n")
+                tagged = _TAGGED_RE.match(line)
+                if tagged:
+                    self._complete(tagged.group("tag"), tagged.group("type").decode().upper(),
+                                   tagged.group("data"))
+                elif line.startswith(b"* "):
+                    await self._untagged(line)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            while self._pending:
+                command = self._pending.popleft()
+                if not command.future.done():
+                    command.future.set_exception(e if isinstance(e, AsyncIMAPError) else AsyncIMAPError(str(e)))
+
+    async def _untagged(self, line: bytes):
+        target = self._pending[0].untagged if self._pending else {}
+        match = _UNTAGGED_STATUS_RE.match(line)
+        if match:
+            kind = match.group("type").decode().upper()
+            data = match.group("data") + (b" " + match.group("data2") if match.group("data2") else b"")
+        elif match := _UNTAGGED_RE.match(line):
+            kind = match.group("type").decode().upper()
+            data = match.group("data") or b""
+        else:
+            # Still read any literal it announces, so the stream stays in step
+            logging.warning(f"Ignoring unrecognized untagged response {line[:80]!r}")
+            kind, data, target = None, line, {}
+        # Literals arrive as (head, literal) tuples followed by the rest of the line, as in imaplib
+        while True:
+            literal = _LITERAL_RE.match(data)
+            if not literal:
+                break
+            payload = await self._reader.readexactly(int(literal.group("size")))
+            target.setdefault(kind, []).append((data, payload))
+            data = (await self._reader.readline()).rstrip(b"\r\n")
+        target.setdefault(kind, []).append(data)
+        if kind in ("OK", "NO", "BAD"):
+            code = _RESPONSE_CODE_RE.search(data)
+            if code:
+                target.setdefault(code.group("type").decode().upper(), []).append(code.group("data"))
+
+    def _complete(self, tag: bytes, status: str, text: bytes):
+        for command in list(self._pending):
+            if command.tag == tag:
+                self._pending.remove(command)
+                if status == "OK":
+                    command.future.set_result(command.untagged)
+                else:
+                    command.future.set_exception(AsyncIMAPError(f"{status} {text.decode(errors='ignore')}"))
+                return
+        logging.warning(f"Unexpected tagged response {tag!r}")
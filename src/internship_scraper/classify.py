@@ -0,0 +1,156 @@
+"""
+Cheap classification of mailbox messages before anything is downloaded.
+
+Only mail with an ``Internship Application – CODE – Name`` subject or an
+``Internship Code:`` line in its body is an application. ``select_applications``
+narrows a list of UIDs down to those, each step far cheaper than the
+download it saves:
+
+1. The ``ApplicationRules`` are compiled into ``UID SEARCH`` keys
+   (``SUBJECT``, ``BODY`` and ``FROM``), so the server drops what can't match.
+2. IMAP SEARCH only matches substrings, so subject hits go through a header
+   pass. It fetches ``BODY.PEEK[HEADER.FIELDS (SUBJECT FROM DATE)]``, a few
+   hundred bytes per message, and checks the exact subject pattern.
+3. A server that refuses these searches gets the header pass over every UID.
+   Messages whose subject doesn't match are then kept ``unverified`` when
+   a body marker is configured. ``Selection.accept`` checks them once
+   their text part is in, before any attachment is fetched.
+
+Rejected messages are never downloaded past their headers and never flagged.
+``Selection.counts`` says how many each step skipped.
+"""
+import logging
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .extraction import SUBJECT_PREFIX, subject_code_re
+from .imap import EmailMessage
+from .metrics import metrics
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def _any_of(keys: List[str]) -> str:
+    """SEARCH keys OR-ed together (``OR a OR b c``)."""
+    return keys[0] if len(keys) == 1 else f"OR {keys[0]} {_any_of(keys[1:])}"
+
+class ApplicationRules:
+    """What makes a message an application.
+
+    The subject must start with ``subject_prefix``, a dash and a code, in any
+    case: the same ``extraction.subject_code_re`` pattern that later reads the
+    code, so replies don't count. Otherwise the
+    body needs a ``body_marker`` line (``None`` turns that off). With
+    ``senders`` only mail from one of those addresses or domains counts.
+    """
+    def __init__(self, subject_prefix: str = SUBJECT_PREFIX, body_marker: Optional[str] = "Internship Code:",
+                 senders: Iterable[str] = ()):
+        self.subject_prefix = subject_prefix
+        self.body_marker = body_marker
+        self.senders = tuple(sender.lower() for sender in senders)
+        self.subject_re = subject_code_re(subject_prefix)
+        self.body_re = re.compile(r"^[ \t]*" + re.escape(body_marker), re.IGNORECASE | re.MULTILINE) if body_marker else None
+
+    def search_keys(self) -> Tuple[Optional[str], Optional[str]]:
+        """``(subject key, body key)`` for ``UID SEARCH``; None where a rule can't be sent as ASCII."""
+        sender_key = ""
+        if self.senders:
+            if not all(sender.isascii() for sender in self.senders):
+                return None, None
+            sender_key = " " + _any_of([f"FROM {_quote(sender)}" for sender in self.senders])
+        subject_key = f"SUBJECT {_quote(self.subject_prefix)}{sender_key}" if self.subject_prefix.isascii() else None
+        body_key = None
+        if self.body_marker and self.body_marker.isascii():
+            body_key = f"BODY {_quote(self.body_marker)}{sender_key}"
+        return subject_key, body_key
+
+    def sender_ok(self, sender: str) -> bool:
+        return not self.senders or any(allowed in sender.lower() for allowed in self.senders)
+
+    def subject_ok(self, subject: str) -> bool:
+        return self.subject_re.match(subject) is not None
+
+    def body_ok(self, body: str) -> bool:
+        return self.body_re is not None and self.body_re.search(body) is not None
+
+DEFAULT_RULES = ApplicationRules()
+
+class Selection:
+    """Result of ``select_applications``: the UIDs to fetch and what was skipped on the way."""
+    def __init__(self, rules: ApplicationRules, uids: List[bytes], unverified: Set[bytes], rejected: List[bytes],
+                 counts: Dict[str, int]):
+        self.rules = rules
+        self.uids = uids
+        # Kept only in case their body has the marker
+        self.unverified = unverified
+        # Skipped UIDs, so an incremental sync can move its checkpoint past them
+        self.rejected = rejected
+        self.counts = counts
+
+    @property
+    def skipped(self) -> int:
+        return self.counts["search_skipped"] + self.counts["header_skipped"] + self.counts["body_skipped"]
+
+    def accept(self, msg: EmailMessage) -> bool:
+        """False (and counted) for an unverified message whose body has no marker either."""
+        if msg.uid not in self.unverified or self.rules.body_ok(msg.body):
+            return True
+        self.counts["body_skipped"] += 1
+        self.rejected.append(msg.uid)
+        metrics.count("classify_body_skipped")
+        return False
+
+    def filter(self, messages: Iterable[EmailMessage]) -> Iterator[EmailMessage]:
+        """The accepted ``messages``."""
+        return (msg for msg in messages if self.accept(msg))
+
+def select_applications(client, uids: Iterable[bytes], criteria: str = "UNSEEN",
+                        rules: ApplicationRules = DEFAULT_RULES, batch_size: int = 500) -> Selection:
+    """Classify ``uids`` (found with ``criteria``) on a connected ``IMAPClient`` or pool.
+
+    ``criteria`` is repeated in the prefilter searches, so the server only
+    looks at the same messages. UIDs returned in UID order.
+    """
+    with metrics.timer("classify"):
+        uids = sorted(uids, key=int)
+        wanted = set(uids)
+        counts = {"searched": len(uids), "search_skipped": 0, "header_skipped": 0, "body_skipped": 0}
+        subject_key, body_key = rules.search_keys()
+        by_subject = by_body = None
+        if uids and subject_key:
+            by_subject = client.try_search(f"{criteria} {subject_key}")
+            if by_subject is not None and rules.body_marker:
+                by_body = client.try_search(f"{criteria} {body_key}") if body_key else None
+                if by_body is None:
+                    by_subject = None
+        if by_subject is not None:
+            # The server checked the body marker and sender already; subjects still need the exact pattern
+            keep = wanted.intersection(by_body or ())
+            to_check = wanted.intersection(by_subject) - keep
+            search_rejected = wanted - to_check - keep
+        else:
+            if uids:
+                logging.info("Server-side SEARCH prefilter unavailable; classifying every message by its headers")
+            keep, to_check, search_rejected = set(), wanted, set()
+        checked, unverified = set(), set()
+        for summary in client.fetch_header_fields(to_check, batch_size=batch_size) if to_check else ():
+            checked.add(summary.uid)
+            if not rules.sender_ok(summary.sender):
+                continue
+            if rules.subject_ok(summary.subject):
+                keep.add(summary.uid)
+            elif by_subject is None and rules.body_marker:
+                keep.add(summary.uid)
+                unverified.add(summary.uid)
+        # UIDs of a failed header batch are neither kept nor rejected. A sync checkpoint only moves over
+        # the settled UIDs below them (SyncCheckpoint.expect), so the next run classifies them again
+        header_rejected = checked - keep
+        counts["search_skipped"] = len(search_rejected)
+        counts["header_skipped"] = len(header_rejected)
+        selected = [uid for uid in uids if uid in keep]
+        rejected = [uid for uid in uids if uid in search_rejected or uid in header_rejected]
+    metrics.count("classify_search_skipped", counts["search_skipped"])
+    metrics.count("classify_header_skipped", counts["header_skipped"])
+    logging.info(f"Classified {len(uids)} messages: {len(selected)} to fetch ({len(unverified)} pending a body check), "
+                 f"{counts['search_skipped']} skipped by SEARCH, {counts['header_skipped']} by headers")
+    return Selection(rules, selected, unverified, rejected, counts)
@@ -1,68 +1,194 @@
 import argparse
 import os
 import csv
+import json
 import logging
-from . import IMAPClient
+import time
+from .classify import select_applications
+from .flags import FlagBuffer
+from .metrics import metrics
+from .pool import IMAPConnectionPool
+from .sources import open_source, process_archive
+from .spool import MessageSpool
+from .storage import AttachmentStore, store_attachments
+from .sync import StateFile, checkpoint_key, plan_sync
 
 def save_attachments(attachments, folder):
-    """Save attachments to disk and return list of saved file paths."""
-    os.makedirs(folder, exist_ok=True)
-    saved_files = []
-    for att in attachments:
-        if att.filename and att.data:
-            file_path = os.path.join(folder, att.filename)
-            try:
-                with open(file_path, 'wb') as f:
-                    f.write(att.data)
-                saved_files.append(file_path)
-            except Exception as e:
-                logging.error(f"Failed to save attachment {att.filename}: {e}")
-    return saved_files
+    """Store attachments content-addressed under ``folder``; returns ``filename=blob path`` entries.
+
+    Blobs are named by their hash only, so the original filename is kept next to the path.
+    """
+    return [f"{blob.filename}={blob.path}" for blob in store_attachments(attachments, AttachmentStore(folder))]
+
+FIELDNAMES = ["subject", "sender", "body", "attachments"]
+CANDIDATE_FIELDNAMES = ["name", "email", "phone", "linkedin", "github", "internship", "notes"]
+
+def email_row(email_msg, attachment_folder):
+    """Save a message's attachments and return its CSV row."""
+    saved_files = save_attachments(email_msg.attachments, attachment_folder)
+    return {
+        "subject": email_msg.subject,
+        "sender": email_msg.sender,
+        "body": email_msg.body,
+        "attachments": ", ".join(saved_files)
+    }
+
+def stream_to_csv(messages, csv_path, attachment_folder, on_durable=None, fsync_rows=True):
+    """Append one CSV row per message as it arrives, flushing and fsyncing each row.
+
+    ``on_durable(email_msg)`` runs only after the row is on disk, which is where
+    callers mark the message read or advance a sync checkpoint. Nothing but
+    the current message is kept in memory. With ``fsync_rows=False`` (nothing
+    to acknowledge, e.g. an archive import) the file is synced once at the end.
+    """
+    write_header = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+    count = 0
+    with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        if write_header:
+            writer.writeheader()
+        for email_msg in messages:
+            row = email_row(email_msg, attachment_folder)
+            with metrics.timer("csv_write"):
+                writer.writerow(row)
+                if fsync_rows:
+                    f.flush()
+                    os.fsync(f.fileno())
+            count += 1
+            if on_durable:
+                on_durable(email_msg)
+        f.flush()
+        os.fsync(f.fileno())
+    return count
 
 def main():
     """Run the IMAP email scraper CLI."""
     parser = argparse.ArgumentParser(description="General IMAP Email Scraper CLI")
-    parser.add_argument('--imap-server', type=str, required=True, help='IMAP server (e.g. imap.gmail.com)')
-    parser.add_argument('--email-user', type=str, required=True, help='Email user')
-    parser.add_argument('--email-pass', type=str, required=True, help='Email password or app token')
+    parser.add_argument('--imap-server', type=str, help='IMAP server (e.g. imap.gmail.com)')
+    parser.add_argument('--email-user', type=str, help='Email user')
+    parser.add_argument('--email-pass', type=str, help='Email password or app token')
+    parser.add_argument('--archive', type=str, help='Read an mbox file, Maildir or .eml directory instead of IMAP')
+    parser.add_argument('--workers', type=int, default=None, help='Parser processes for --archive and --reprocess (default: one per CPU)')
+    parser.add_argument('--spool', type=str, help='Keep a compressed copy of every fetched message in this folder')
+    parser.add_argument('--spool-max-mb', type=int, default=None, help='Evict least recently used spooled messages beyond this size')
+    parser.add_argument('--reprocess', action='store_true', help='Re-extract candidates from --spool into --csv-path instead of fetching')
+    parser.add_argument('--code-map', type=str, default='', help='JSON internship code mapping used by --reprocess')
     parser.add_argument('--folder', type=str, default='INBOX', help='IMAP folder')
     parser.add_argument('--attachment-folder', type=str, default='attachements', help='Folder to save attachments')
     parser.add_argument('--csv-path', type=str, default='emails.csv', help='CSV file to save emails')
     parser.add_argument('--search', type=str, default='UNSEEN', help='IMAP search criteria')
+    parser.add_argument('--applications-only', action='store_true', help='Skip mail that is not an internship application, using SEARCH and header fields only')
+    parser.add_argument('--sync', action='store_true', help='Incremental UID sync from the last checkpoint instead of --search')
+    parser.add_argument('--state-file', type=str, default='.imap_sync_state.json', help='File holding --sync checkpoints')
+    parser.add_argument('--connections', type=int, default=1, help='Parallel IMAP sessions used to fetch large backlogs')
+    parser.add_argument('--max-connections', type=int, default=None, help='Per-server session cap (defaults to the known limit, e.g. 15 for Gmail)')
+    parser.add_argument('--batch-size', type=int, default=200, help='Messages fetched per UID FETCH round trip')
+    parser.add_argument('--stream', action='store_true', help='Append and fsync each CSV row as it arrives; mark read in batches once written')
+    parser.add_argument('--max-batch-bytes', type=int, default=4 * 1024 * 1024, help='Byte budget per FETCH batch in --stream mode')
+    parser.add_argument('--profile', action='store_true', help='Print per-stage timings, bytes received and messages/s at the end')
     parser.add_argument('--log-level', type=str, default='INFO', help='Logging level (DEBUG, INFO, WARNING, ERROR)')
     args = parser.parse_args()
+    if args.reprocess and not args.spool:
+        parser.error("--reprocess needs --spool")
+    if not (args.archive or args.reprocess) and not (args.imap_server and args.email_user and args.email_pass):
+        parser.error("--imap-server, --email-user and --email-pass are required unless --archive or --reprocess is given")
 
     logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.INFO),
                         format='%(asctime)s %(levelname)s %(message)s')
+    if args.profile:
+        metrics.enabled = True
+        metrics.reset()
+    started = time.perf_counter()
 
     try:
-        client = IMAPClient(args.imap_server, args.email_user, args.email_pass, args.folder)
+        spool = MessageSpool(args.spool, args.spool_max_mb * 1024 * 1024 if args.spool_max_mb else None) if args.spool else None
+        if args.reprocess:
+            # Limited to one mailbox when its server and user are given
+            account = f"{args.email_user}@{args.imap_server}" if args.email_user and args.imap_server else None
+            results = process_archive(spool.refs(account), workers=args.workers, attachments=False,
+                                      code_map=json.loads(args.code_map) if args.code_map else None)
+            with open(args.csv_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=CANDIDATE_FIELDNAMES, extrasaction='ignore')
+                writer.writeheader()
+                count = 0
+                for _, candidate in results:
+                    writer.writerow(candidate)
+                    count += 1
+            logging.info(f"Re-extracted {count} candidates from {args.spool} to {args.csv_path}")
+            return
+        if args.archive:
+            # Attachments are written by the workers, so email_row only records their paths
+            results = process_archive(open_source(args.archive), workers=args.workers,
+                                      store_root=args.attachment_folder, extract=False)
+            count = stream_to_csv((msg for msg, _ in results), args.csv_path, args.attachment_folder, fsync_rows=False)
+            logging.info(f"Imported {count} emails from {args.archive} to {args.csv_path}")
+            return
+        client = IMAPConnectionPool(args.imap_server, args.email_user, args.email_pass, args.folder,
+                                    size=args.connections, max_connections=args.max_connections, spool=spool)
         client.connect()
-        msg_ids = client.search(args.search)
+        if args.sync:
+            state = StateFile(args.state_file)
+            key = checkpoint_key(args.imap_server, args.email_user, args.folder)
+            checkpoint = state.load(key)
+            msg_ids = plan_sync(client, checkpoint)
+        else:
+            msg_ids = client.search(args.search)
+        selection = None
+        if args.applications_only:
+            selection = select_applications(client, msg_ids, f"UID {checkpoint.last_uid + 1}:*" if args.sync else args.search)
+            msg_ids = selection.uids
+
+        def applications(messages):
+            return selection.filter(messages) if selection else messages
+
+        def settle_rejected():
+            # Skipped mail needn't be looked at again; the checkpoint still stops below any UID left unsettled
+            for uid in selection.rejected if selection else ():
+                checkpoint.advance(uid)
+        if args.stream:
+            flags = FlagBuffer(client, batch_size=args.batch_size)
+
+            def on_durable(email_msg):
+                flags.add(email_msg.uid)
+                if args.sync:
+                    checkpoint.advance(email_msg.uid)
+                    state.save(key, checkpoint)
+            messages = client.fetch_many(msg_ids, batch_size=args.batch_size, max_batch_bytes=args.max_batch_bytes)
+            count = stream_to_csv(applications(messages), args.csv_path, args.attachment_folder, on_durable)
+            flags.flush()
+            client.logout()
+            if args.sync and selection:
+                settle_rejected()
+                state.save(key, checkpoint)
+            logging.info(f"Streamed {count} emails to {args.csv_path}")
+            return
         emails = []
-        for msg_id in msg_ids:
-            email_msg = client.fetch_email(msg_id)
-            if email_msg:
-                saved_files = save_attachments(email_msg.attachments, args.attachment_folder)
-                emails.append({
-                    "subject": email_msg.subject,
-                    "sender": email_msg.sender,
-                    "body": email_msg.body,
-                    "attachments": ", ".join(saved_files)
-                })
-                client.mark_read(msg_id)
-        client.logout()
+        processed = []
+        for email_msg in applications(client.fetch_many(msg_ids, batch_size=args.batch_size)):
+            emails.append(email_row(email_msg, args.attachment_folder))
+            processed.append(email_msg.uid)
+            if args.sync:
+                checkpoint.advance(email_msg.uid)
         # Save to CSV
-        fieldnames = ["subject", "sender", "body", "attachments"]
-        with open(args.csv_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+        with metrics.timer("csv_write"), open(args.csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
             writer.writeheader()
-            for email_row in emails:
-                writer.writerow(email_row)
+            for row in emails:
+                writer.writerow(row)
         logging.info(f"Saved {len(emails)} emails to {args.csv_path}")
+        # Messages are fetched with BODY.PEEK, so they stay unread until the CSV exists
+        client.mark_read_many(processed)
+        client.logout()
+        if args.sync:
+            # Only checkpoint once the CSV is written, so a crash re-fetches instead of skipping
+            settle_rejected()
+            state.save(key, checkpoint)
     except Exception as e:
         logging.error(f"Error: {e}")
         exit(1)
+    finally:
+        if args.profile:
+            print(metrics.summary(time.perf_counter() - started))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,157 @@
+"""
+Candidate extraction engine.
+
+All field patterns are compiled once. A lowercased copy of the body is
+scanned a single time with a case-sensitive alternation of every field label
+(``name``, ``phone``, ...), which the regex engine runs far faster than an
+IGNORECASE search; at each label hit the fields still missing are matched
+anchored at that position in the original body. Because every field pattern
+starts with its label, the first anchored hit is exactly what a separate
+``re.search`` per field would have found.
+"""
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Tuple
+
+from .metrics import metrics
+
+# (field, label text, value regex); extra fields can be passed to CandidateExtractor
+DEFAULT_FIELDS = (
+    ("name", r"Name", r".+"),
+    ("phone", r"Phone", r"[+\d\s\-()]+"),
+    ("linkedin", r"LinkedIn", r"https?://[\w\.-/]+|linkedin.com/in/[\w\-]+"),
+    ("github", r"GitHub", r"https?://[\w\.-/]+|github.com/[\w\-]+"),
+    ("internship", r"Internship", r"[\w\s]+"),
+    ("code", r"Internship Code", r"\w+"),
+)
+
+SUBJECT_PREFIX = "Internship Application"
+
+def subject_code_re(prefix: str = SUBJECT_PREFIX) -> Pattern:
+    """``<prefix> – CODE``, in any case. ``classify.ApplicationRules`` filters subjects with the same pattern."""
+    return re.compile(r"\s*" + re.escape(prefix) + r"\s*[–-]\s*(\w+)", re.IGNORECASE)
+
+SUBJECT_CODE_RE = subject_code_re()
+SUBJECT_RE = re.compile(SUBJECT_CODE_RE.pattern + r"\s*[–-]\s*(.+)", re.IGNORECASE)
+_EMAIL_RE = re.compile(r'<(.+?)>')
+_NAME_RE = re.compile(r'(.*?)<')
+# Characters IGNORECASE matches to an ASCII letter that str.lower() leaves alone
+_CASE_FOLD = {0x131: "i", 0x17f: "s"}
+
+def extract_email(sender):
+    match = _EMAIL_RE.search(sender)
+    return match.group(1) if match else sender
+
+def extract_name(sender):
+    match = _NAME_RE.match(sender)
+    return match.group(1).strip() if match else sender.split('@')[0]
+
+class CandidateExtractor:
+    """Compiled, single-pass extractor for candidate fields in an email body."""
+    def __init__(self, extra_fields: Iterable[Tuple[str, str, str]] = (), flags: int = re.IGNORECASE):
+        self.flags = flags
+        self.fields = list(DEFAULT_FIELDS) + list(extra_fields)
+        self._compile()
+
+    def add_field(self, name: str, label: str, value: str):
+        """Extract an additional ``<label>: <value>`` field, returned under ``name``."""
+        self.fields.append((name, label, value))
+        self._compile()
+
+    def _compile(self):
+        # lowercased label -> [(field, pattern)]
+        self._by_label: Dict[str, List[Tuple[str, Pattern]]] = {}
+        for name, label, value in self.fields:
+            pattern = re.compile(rf"{re.escape(label)}[:\s]+({value})", self.flags)
+            self._by_label.setdefault(label.lower(), []).append((name, pattern))
+        self._all = [field for fields in self._by_label.values() for field in fields]
+        labels = sorted(self._by_label, key=len, reverse=True)
+        alternation = "|".join(re.escape(label) for label in labels)
+        self._label_re = re.compile(alternation)
+        self._label_ignorecase_re = re.compile(f"(?=(?:{alternation}))", re.IGNORECASE)
+        # Labels that can start inside another label's hit, which the scan steps over:
+        # label -> [(offset, other)], e.g. "internship" at 0 in "internship code"
+        self._nested = {
+            label: [(offset, other) for offset in range(len(label)) for other in labels
+                    if other != label and label[offset:offset + len(other)] == other[:len(label) - offset]]
+            for label in labels
+        }
+
+    def _label_positions(self, lowered: str) -> Iterator[Tuple[int, List[Tuple[str, Pattern]]]]:
+        for hit in self._label_re.finditer(lowered):
+            start, label = hit.start(), hit.group()
+            yield start, self._by_label[label]
+            for offset, other in self._nested[label]:
+                if lowered.startswith(other, start + offset):
+                    yield start + offset, self._by_label[other]
+
+    def scan(self, body: str) -> Dict[str, str]:
+        """Return ``{field: value}`` for the first occurrence of each field in ``body``."""
+        lowered = body.lower()
+        if not body.isascii():
+            lowered = lowered.translate(_CASE_FOLD)
+        if len(lowered) == len(body):
+            positions = self._label_positions(lowered)
+        else:
+            # e.g. "İ" lowers to two characters, so offsets no longer line up
+            positions = ((hit.start(), self._all) for hit in self._label_ignorecase_re.finditer(body))
+        found = {}
+        wanted = len(self._all)
+        for position, fields in positions:
+            for name, pattern in fields:
+                if name not in found:
+                    match = pattern.match(body, position)
+                    if match:
+                        found[name] = match.group(1).strip()
+            if len(found) == wanted:
+                break
+        return found
+
+    def parse_candidate(self, body: str, sender: str) -> Dict[str, Optional[str]]:
+        """Extract candidate info from an email body and sender."""
+        found = self.scan(body)
+        candidate = {
+            "name": found["name"] if "name" in found else extract_name(sender),
+            "email": extract_email(sender),
+            "phone": found.get("phone"),
+            "linkedin": found.get("linkedin"),
+            "github": found.get("github"),
+            "internship": found["internship"] if "internship" in found else found.get("code"),
+            "notes": body,
+        }
+        for name, _, _ in self.fields[len(DEFAULT_FIELDS):]:
+            candidate[name] = found.get(name)
+        return candidate
+
+    def extract(self, subject: str, body: str, sender: str, code_map: Optional[Dict[str, str]] = None) -> Dict[str, Optional[str]]:
+        """Extract a candidate, letting an ``Internship Application – CODE – Name`` subject override body fields."""
+        with metrics.timer("extract"):
+            return self._extract(subject, body, sender, code_map)
+
+    def _extract(self, subject, body, sender, code_map):
+        candidate = self.parse_candidate(body, sender)
+        code_map = code_map or {}
+        subject_match = SUBJECT_RE.match(subject)
+        if subject_match:
+            code = subject_match.group(1)
+            candidate["name"] = subject_match.group(2).strip()
+            candidate["internship"] = _internship(code_map, code)
+        else:
+            code_match = SUBJECT_CODE_RE.search(subject)
+            if code_match:
+                code = code_match.group(1)
+                candidate["internship"] = _internship(code_map, code)
+        return candidate
+
+def _internship(code_map: Dict[str, str], code: str) -> str:
+    # Subjects match in any case; the code map is keyed by upper-case codes
+    return code_map.get(code) or code_map.get(code.upper(), code)
+
+DEFAULT_EXTRACTOR = CandidateExtractor()
+
+def parse_candidate(body: str, sender: str):
+    """Extract candidate info from an email body and sender with the default fields."""
+    return DEFAULT_EXTRACTOR.parse_candidate(body, sender)
+
+def extract_candidate(subject: str, body: str, sender: str, code_map: Optional[Dict[str, str]] = None):
+    """Extract a candidate from subject, body and sender with the default fields."""
+    return DEFAULT_EXTRACTOR.extract(subject, body, sender, code_map)
@@ -0,0 +1,41 @@
+"""
+Deferred, batched flag updates.
+
+Marking each processed message read costs one ``UID STORE`` round trip per
+message. ``FlagBuffer`` collects UIDs whose results are already committed
+(DB row written, CSV row fsynced) and marks them read with one
+``UID STORE <set> +FLAGS.SILENT (\\Seen)`` per batch, so mark-as-read costs
+about one round trip per ``batch_size`` messages.
+"""
+from typing import List
+
+class FlagBuffer:
+    """Buffer of committed UIDs waiting to be marked read.
+
+    Only ``add`` a UID once whatever was produced from that message is
+    durable: a full buffer is flushed immediately. Call ``flush`` after the
+    last commit; UIDs still buffered when the process dies simply stay unread
+    and are fetched again next run. Works with ``IMAPClient`` and
+    ``IMAPConnectionPool``.
+    """
+    def __init__(self, client, batch_size: int = 500):
+        self.client = client
+        self.batch_size = batch_size
+        self.pending: List[bytes] = []
+        self.flushes = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, uid: bytes):
+        self.pending.append(uid)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> bool:
+        """Mark every buffered UID read; returns False if a STORE failed."""
+        if not self.pending:
+            return True
+        uids, self.pending = self.pending, []
+        self.flushes += 1
+        return self.client.mark_read_many(uids, batch_size=self.batch_size)
@@ -1,97 +1,732 @@
 import imaplib
 import email
 from email.header import decode_header
+from email.parser import BytesHeaderParser
+import base64
+import io
+import quopri
 import re
 import os
 import logging
-from typing import List, Optional
+import ssl
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+from .metrics import metrics
+from .response import parse_fetch_items, walk_bodystructure
+
+_UID_RE = re.compile(rb"UID (\d+)")
+# Headers describing the original MIME structure, replaced when only the text part is kept
+_MIME_HEADER_RE = re.compile(rb"^(?:content-[\w-]+|mime-version):.*\n(?:[ \t].*\n)*", re.IGNORECASE | re.MULTILINE)
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+# Header fields fetched by fetch_header_fields, enough to classify a message
+HEADER_FIELDS = ("SUBJECT", "FROM", "DATE")
+
+class AttachmentTooLarge(Exception):
+    """Raised while streaming a part that turns out larger than the allowed maximum."""
+
+class AttachmentFetchError(Exception):
+    """Raised when the server refuses a part or sends less of it than BODYSTRUCTURE announced."""
 
 class Attachment:
-    """Represents an email attachment."""
-    def __init__(self, filename: str, data: bytes):
+    """Represents an email attachment.
+
+    Attachments from ``fetch_headers_many`` carry their IMAP ``section``,
+    transfer ``encoding`` and encoded ``size`` but no content until
+    ``fetch_attachments`` runs. Content is then either in ``data`` or, when
+    streamed to disk, in the file at ``path`` (with its ``sha256``); ``open``
+    works for both. ``skipped`` is set for parts over the size limit.
+
+    Attachments of a parsed message keep their MIME part and only undo its
+    transfer encoding the first time ``data`` is read.
+    """
+    __slots__ = ("filename", "content_type", "section", "encoding", "size", "path", "sha256", "skipped",
+                 "_data", "_part")
+
+    def __init__(self, filename: str, data: Optional[bytes], content_type: Optional[str] = None,
+                 section: Optional[str] = None, encoding: Optional[str] = None, size: Optional[int] = None,
+                 path: Optional[str] = None, sha256: Optional[str] = None):
         self.filename = filename
-        self.data = data
+        self.content_type = content_type
+        self.section = section
+        self.encoding = encoding
+        self.size = size
+        self.path = path
+        self.sha256 = sha256
+        self.skipped = False
+        self._data = data
+        self._part = None
+
+    @classmethod
+    def from_part(cls, part, filename: Optional[str], content_type: Optional[str] = None) -> "Attachment":
+        """Attachment whose content is decoded from the MIME ``part`` on first use."""
+        att = cls(filename, None, content_type=content_type)
+        att._part = part
+        return att
+
+    @property
+    def data(self) -> Optional[bytes]:
+        if self._part is not None:
+            with metrics.timer("decode_attachment"):
+                self._data = self._part.get_payload(decode=True)
+            self._part = None
+        return self._data
+
+    @data.setter
+    def data(self, value: Optional[bytes]):
+        self._data = value
+        self._part = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._part is not None or self._data is not None or self.path is not None
+
+    def open(self) -> BinaryIO:
+        """Binary file object over the attachment content."""
+        if self.path is not None:
+            return open(self.path, 'rb')
+        return io.BytesIO(self.data or b"")
+
+    def __getstate__(self):
+        # Pickled (e.g. back from a worker process) with the content decoded
+        return {name: getattr(self, name) for name in self.__slots__[:-2]}, self.data
+
+    def __setstate__(self, state):
+        fields, self._data = state
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self._part = None
+
+# Placeholder for fields a lazily parsed EmailMessage hasn't decoded yet
+_UNSET = object()
+_HEADER_END_RE = re.compile(rb"\r?\n\r?\n")
+
+def decode_text(payload: bytes, charset: Optional[str]) -> str:
+    """Decode a text part with its declared charset, falling back to UTF-8."""
+    try:
+        return payload.decode(charset or "utf-8", errors="ignore")
+    except LookupError:
+        return payload.decode("utf-8", errors="ignore")
+
+class HeaderSummary(NamedTuple):
+    """Decoded ``Subject``/``From``/``Date`` of one message, from ``fetch_header_fields``."""
+    uid: bytes
+    subject: str
+    sender: str
+    date: Optional[str]
 
 class EmailMessage:
-    """Represents a parsed email message."""
-    def __init__(self, subject: str, sender: str, body: str, attachments: List[Attachment]):
-        self.subject = subject
-        self.sender = sender
-        self.body = body
-        self.attachments = attachments
+    """Represents a parsed email message.
+
+    ``parse_email`` builds it around a zero-copy ``memoryview`` of the raw
+    message and decodes nothing up front. Reading ``subject`` or ``sender``
+    parses the header block only; reading ``body`` or ``attachments`` parses
+    the MIME structure once, after which the raw bytes are released.
+    Attachment payloads stay encoded until their ``data`` is read. Every
+    field can also be passed or assigned directly.
+    """
+    __slots__ = ("uid", "_raw", "_subject", "_sender", "_body", "_attachments")
+
+    def __init__(self, subject: str, sender: str, body: str, attachments: List[Attachment], uid: Optional[bytes] = None):
+        self.uid = uid
+        self._raw = None
+        self._subject = subject
+        self._sender = sender
+        self._body = body
+        self._attachments = attachments
+
+    @classmethod
+    def from_raw(cls, raw: bytes, uid: Optional[bytes] = None) -> "EmailMessage":
+        msg = cls(_UNSET, _UNSET, _UNSET, _UNSET, uid=uid)
+        msg._raw = memoryview(raw)
+        return msg
+
+    @property
+    def subject(self) -> str:
+        if self._subject is _UNSET:
+            self._decode_headers()
+        return self._subject
+
+    @subject.setter
+    def subject(self, value: str):
+        self._subject = value
+
+    @property
+    def sender(self) -> str:
+        if self._sender is _UNSET:
+            self._decode_headers()
+        return self._sender
+
+    @sender.setter
+    def sender(self, value: str):
+        self._sender = value
+
+    @property
+    def body(self) -> str:
+        if self._body is _UNSET:
+            self._decode_mime()
+        return self._body
+
+    @body.setter
+    def body(self, value: str):
+        self._body = value
+
+    @property
+    def attachments(self) -> List[Attachment]:
+        if self._attachments is _UNSET:
+            self._decode_mime()
+        return self._attachments
+
+    @attachments.setter
+    def attachments(self, value: List[Attachment]):
+        self._attachments = value
+
+    def _decode_headers(self):
+        with metrics.timer("parse_headers"):
+            end = _HEADER_END_RE.search(self._raw)
+            header = bytes(self._raw[:end.end()] if end else self._raw)
+            headers = BytesHeaderParser().parsebytes(header)
+            self._set_headers(headers)
+
+    def _set_headers(self, headers):
+        if self._subject is _UNSET:
+            self._subject = IMAPClient._safe_decode(headers.get("Subject"))
+        if self._sender is _UNSET:
+            self._sender = IMAPClient._safe_decode(headers.get("From"))
+
+    def _decode_mime(self):
+        metrics.count("messages_parsed")
+        with metrics.timer("parse"):
+            # What message_from_bytes does, minus its bytes() copy of the memoryview
+            msg = email.message_from_string(str(self._raw, "ascii", "surrogateescape"))
+            self._set_headers(msg)
+            body = ""
+            attachments = []
+            if msg.is_multipart():
+                for part in msg.walk():
+                    content_type = part.get_content_type()
+                    content_disp = part.get("Content-Disposition")
+                    if content_type == "text/plain" and (not content_disp or "attachment" not in content_disp.lower()):
+                        payload = part.get_payload(decode=True)
+                        if payload:
+                            body = decode_text(payload, part.get_content_charset())
+                    if content_disp and "attachment" in content_disp.lower():
+                        attachments.append(Attachment.from_part(part, part.get_filename(), content_type))
+            else:
+                payload = msg.get_payload(decode=True)
+                if payload:
+                    body = decode_text(payload, msg.get_content_charset())
+            if self._body is _UNSET:
+                self._body = body
+            if self._attachments is _UNSET:
+                self._attachments = attachments
+            # Everything is decoded (or held by its part): the raw bytes can go
+            self._raw = None
+
+    def __getstate__(self):
+        return self.uid, self.subject, self.sender, self.body, self.attachments
+
+    def __setstate__(self, state):
+        self.uid, self._subject, self._sender, self._body, self._attachments = state
+        self._raw = None
+
+def parse_email(raw: bytes, uid: Optional[bytes] = None) -> EmailMessage:
+    """Wrap a raw RFC822 message in an EmailMessage; fields are decoded when first read."""
+    return EmailMessage.from_raw(raw, uid=uid)
+
+def decode_transfer(data: bytes, encoding: Optional[str]) -> bytes:
+    """Undo a Content-Transfer-Encoding on a raw body part."""
+    encoding = (encoding or "").lower()
+    if encoding == "base64":
+        return base64.b64decode(data)
+    if encoding == "quoted-printable":
+        return quopri.decodestring(data)
+    return data
+
+def text_only_message(header: bytes, content_type: str = "text/plain", charset: Optional[str] = None,
+                      encoding: Optional[str] = None, body: bytes = b"") -> bytes:
+    """An RFC 822 message made of ``header`` and one text part, still transfer-encoded."""
+    header = _MIME_HEADER_RE.sub(b"", header.rstrip(b"\r\n").replace(b"\r\n", b"\n") + b"\n")
+    params = f'; charset="{charset}"' if charset else ""
+    mime = f"MIME-Version: 1.0\nContent-Type: {content_type}{params}\n"
+    if encoding:
+        mime += f"Content-Transfer-Encoding: {encoding}\n"
+    return header.replace(b"\n", b"\r\n") + mime.replace("\n", "\r\n").encode() + b"\r\n" + body
+
+def decoded_size_estimate(size: int, encoding: Optional[str]) -> int:
+    """Rough decoded size of a part whose BODYSTRUCTURE reports ``size`` encoded octets."""
+    if (encoding or "").lower() == "base64":
+        # 76-character lines plus CRLF carry 57 bytes each
+        return size * 57 // 78
+    return size
+
+def attachments_complete(msg: EmailMessage) -> bool:
+    """True once every attachment of ``msg`` is loaded or skipped, i.e. none failed to download."""
+    return all(att.loaded or att.skipped for att in msg.attachments)
+
+class PartReader:
+    """Readable stream over one body part, fetched in ``BODY.PEEK[section]<offset.length>`` chunks.
+
+    The transfer encoding is undone chunk by chunk, so memory stays around one
+    chunk whatever the size of the part. ``read`` returns at most one decoded
+    chunk and ``b""`` at the end. Passing ``max_size`` raises
+    ``AttachmentTooLarge`` as soon as more decoded bytes than that arrive.
+    A refused FETCH, a response without the part, or a part ending before
+    its BODYSTRUCTURE ``size`` raises ``AttachmentFetchError``, so a store
+    never keeps a truncated blob.
+    """
+    def __init__(self, connection, uid: bytes, section: str, encoding: Optional[str],
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, max_size: Optional[int] = None,
+                 first_chunk: Optional[bytes] = None, size: Optional[int] = None):
+        self.connection = connection
+        self.uid = uid
+        self.section = section
+        self.encoding = (encoding or "").lower()
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        self.offset = 0
+        self.decoded = 0
+        self.done = False
+        self._carry = b""
+        self._first_chunk = first_chunk
+        self.size = size
+
+    def read(self, size: int = -1) -> bytes:
+        while not self.done:
+            data = self._decode(self._next_chunk())
+            if data:
+                self.decoded += len(data)
+                if self.max_size is not None and self.decoded > self.max_size:
+                    raise AttachmentTooLarge(f"Part {self.section} of email {self.uid} exceeds {self.max_size} bytes")
+                return data
+        return b""
+
+    def _next_chunk(self) -> bytes:
+        if self._first_chunk is not None:
+            raw, self._first_chunk = self._first_chunk, None
+        else:
+            status, msg_data = uid_command(
+                self.connection, "FETCH", self.uid, f"(UID BODY.PEEK[{self.section}]<{self.offset}.{self.chunk_size}>)")
+            if status != "OK":
+                raise AttachmentFetchError(f"Fetching part {self.section} of email {self.uid} failed: {status} {msg_data}")
+            name = f"BODY[{self.section}]<{self.offset}>"
+            values = [item[name] for item in parse_fetch_items(msg_data) if name in item]
+            if not values:
+                raise AttachmentFetchError(f"No {name} in the response for email {self.uid}")
+            raw = values[-1] if isinstance(values[-1], bytes) else b""
+        self.offset += len(raw)
+        # A short (or empty) partial fetch means the part is exhausted
+        self.done = len(raw) < self.chunk_size
+        if self.done and self.size is not None and self.offset < self.size:
+            raise AttachmentFetchError(f"Part {self.section} of email {self.uid} ended after {self.offset} "
+                                       f"of {self.size} octets")
+        return raw
+
+    def _decode(self, raw: bytes) -> bytes:
+        if self.encoding == "base64":
+            data = self._carry + raw.translate(None, b" \t\r\n")
+            cut = len(data) if self.done else len(data) - len(data) % 4
+            data, self._carry = data[:cut], data[cut:]
+            return base64.b64decode(data) if data else b""
+        if self.encoding == "quoted-printable":
+            data = self._carry + raw
+            cut = len(data) if self.done else data.rfind(b"\n") + 1
+            data, self._carry = data[:cut], data[cut:]
+            return quopri.decodestring(data) if data else b""
+        return raw
+
+def uid_set(uids: Iterable[Union[bytes, int]]) -> str:
+    """Compress UIDs into an IMAP sequence set, e.g. ``1:200,205,207:210``."""
+    numbers = sorted({int(uid) for uid in uids})
+    ranges = []
+    for number in numbers:
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ",".join(str(start) if start == end else f"{start}:{end}" for start, end in ranges)
+
+def response_size(data) -> int:
+    """Bytes in an imaplib response: status lines plus literals."""
+    size = 0
+    for item in data or ():
+        if isinstance(item, tuple):
+            size += sum(len(part) for part in item if isinstance(part, bytes))
+        elif isinstance(item, bytes):
+            size += len(item)
+    return size
+
+def uid_command(connection, command: str, *args):
+    """``connection.uid(command, ...)``, timed as ``imap_<command>`` with the response bytes counted."""
+    if not metrics.enabled:
+        return connection.uid(command, *args)
+    with metrics.timer(f"imap_{command.lower()}"):
+        typ, data = connection.uid(command, *args)
+    metrics.count("imap_commands")
+    metrics.count("imap_bytes_received", response_size(data))
+    return typ, data
+
+def iter_fetch_response(msg_data) -> Iterator[tuple]:
+    """Yield ``(uid, literal)`` pairs from an imaplib FETCH response.
+
+    Servers may send the ``UID`` item before or after the message literal, so a
+    trailing non-literal chunk is also checked for it.
+    """
+    pending = None
+    for response_part in msg_data:
+        if isinstance(response_part, tuple):
+            if pending:
+                yield pending[0], pending[1]
+            match = _UID_RE.search(response_part[0])
+            pending = [match.group(1) if match else None, response_part[1]]
+        elif pending and pending[0] is None and isinstance(response_part, bytes):
+            match = _UID_RE.search(response_part)
+            if match:
+                pending[0] = match.group(1)
+    if pending:
+        yield pending[0], pending[1]
 
 class IMAPClient:
-    """IMAP client for connecting, searching, and fetching emails."""
-    def __init__(self, server: str, user: str, password: str, folder: str = "INBOX"):
+    """IMAP client for connecting, searching, and fetching emails.
+
+    Message ids returned by ``search`` are UIDs, so they stay valid across
+    sessions and can be combined into UID sets by ``fetch_many``.
+    """
+    def __init__(self, server: str, user: str, password: str, folder: str = "INBOX",
+                 port: Optional[int] = None, ssl_context: Optional[ssl.SSLContext] = None, use_ssl: bool = True):
         self.server = server
         self.user = user
         self.password = password
         self.folder = folder
+        self.port = port
+        self.ssl_context = ssl_context
+        self.use_ssl = use_ssl
         self.connection = None
+        self.uidvalidity = None
+        # Optional spool.MessageSpool keeping a compressed copy of every fetched message
+        self.spool = None
+
+    def _spool(self, uid: bytes, raw: bytes, partial: bool = False):
+        if self.spool is None or uid is None or not raw:
+            return
+        try:
+            self.spool.put(f"{self.user}@{self.server}", self.folder, self.uidvalidity, uid, raw, partial=partial)
+        except Exception as e:
+            logging.warning(f"Failed to spool email {uid}: {e}")
 
     def connect(self):
         """Connect to the IMAP server and select the folder."""
         try:
-            self.connection = imaplib.IMAP4_SSL(self.server)
-            self.connection.login(self.user, self.password)
-            self.connection.select(self.folder)
+            # TCP connect plus the TLS handshake
+            with metrics.timer("imap_connect"):
+                if self.use_ssl:
+                    self.connection = imaplib.IMAP4_SSL(self.server, self.port or imaplib.IMAP4_SSL_PORT,
+                                                        ssl_context=self.ssl_context)
+                else:
+                    self.connection = imaplib.IMAP4(self.server, self.port or imaplib.IMAP4_PORT)
+            with metrics.timer("imap_login"):
+                self.connection.login(self.user, self.password)
+            with metrics.timer("imap_select"):
+                self.connection.select(self.folder)
+            _, data = self.connection.response("UIDVALIDITY")
+            self.uidvalidity = int(data[0]) if data and data[0] else None
             logging.info(f"Connected to {self.server}, folder {self.folder}")
         except Exception as e:
             logging.error(f"IMAP connection failed: {e}")
             raise
 
     def search(self, criteria: str = "UNSEEN") -> List[bytes]:
-        """Search for emails matching the criteria."""
+        """Search for emails matching the criteria and return their UIDs."""
+        return self.try_search(criteria) or []
+
+    def try_search(self, criteria: str) -> Optional[List[bytes]]:
+        """Like ``search``, but None when the server refuses the criteria instead of no match."""
         try:
-            status, messages = self.connection.search(None, criteria)
+            status, messages = uid_command(self.connection, "SEARCH", None, criteria)
             if status != "OK":
                 logging.warning(f"Search failed: {status}")
-                return []
+                return None
             return messages[0].split()
         except Exception as e:
             logging.error(f"Search error: {e}")
-            return []
+            return None
+
+    def search_after(self, last_uid: int) -> List[bytes]:
+        """Return UIDs strictly greater than ``last_uid`` (``UID n+1:*``)."""
+        # "n:*" always matches the highest UID in the folder, even when it is below n
+        return [uid for uid in self.search(f"UID {last_uid + 1}:*") if int(uid) > last_uid]
 
     def fetch_email(self, msg_id: bytes) -> Optional[EmailMessage]:
-        """Fetch and parse a single email by message ID."""
+        """Fetch and parse a single email by UID."""
         try:
-            _, msg_data = self.connection.fetch(msg_id, "(RFC822)")
-            for response_part in msg_data:
-                if isinstance(response_part, tuple):
-                    msg = email.message_from_bytes(response_part[1])
-                    subject = self._safe_decode(msg.get("Subject"))
-                    sender = self._safe_decode(msg.get("From"))
-                    body = ""
-                    attachments = []
-                    if msg.is_multipart():
-                        for part in msg.walk():
-                            content_type = part.get_content_type()
-                            content_disp = part.get("Content-Disposition")
-                            if content_type == "text/plain" and (not content_disp or "attachment" not in content_disp.lower()):
-                                payload = part.get_payload(decode=True)
-                                if payload:
-                                    body = payload.decode(errors="ignore")
-                            if content_disp and "attachment" in content_disp.lower():
-                                att_name = part.get_filename()
-                                att_data = part.get_payload(decode=True)
-                                attachments.append(Attachment(att_name, att_data))
-                    else:
-                        payload = msg.get_payload(decode=True)
-                        if payload:
-                            body = payload.decode(errors="ignore")
-                    return EmailMessage(subject, sender, body, attachments)
+            _, msg_data = uid_command(self.connection, "FETCH", msg_id, "(BODY.PEEK[])")
+            for _, raw in iter_fetch_response(msg_data):
+                metrics.count("messages_fetched")
+                self._spool(msg_id, raw)
+                return parse_email(raw, uid=msg_id)
             return None
         except Exception as e:
             logging.error(f"Failed to fetch email {msg_id}: {e}")
             return None
 
+    def message_sizes(self, uids: Iterable[bytes]) -> Dict[bytes, int]:
+        """Return ``{uid: RFC822.SIZE}`` using one cheap FETCH per 1000 UIDs."""
+        uids = sorted(uids, key=int)
+        sizes = {}
+        for start in range(0, len(uids), 1000):
+            batch = uids[start:start + 1000]
+            try:
+                _, msg_data = uid_command(self.connection, "FETCH", uid_set(batch), "(UID RFC822.SIZE)")
+                for item in parse_fetch_items(msg_data):
+                    sizes[item["UID"]] = int(item["RFC822.SIZE"])
+            except Exception as e:
+                logging.warning(f"Failed to fetch sizes for {uid_set(batch)}: {e}")
+        return sizes
+
+    def plan_batches(self, uids: Iterable[bytes], batch_size: int = 200,
+                     max_batch_bytes: Optional[int] = None) -> List[List[bytes]]:
+        """Split UIDs into FETCH batches of at most ``batch_size`` messages.
+
+        With ``max_batch_bytes`` a batch also stops growing once its messages
+        add up to that many bytes (a single larger message gets a batch of its
+        own), so memory stays bounded by the budget or the largest message.
+        """
+        uids = sorted(uids, key=int)
+        if not max_batch_bytes:
+            return [uids[start:start + batch_size] for start in range(0, len(uids), batch_size)]
+        sizes = self.message_sizes(uids)
+        batches, current, current_bytes = [], [], 0
+        for uid in uids:
+            size = sizes.get(uid, 0)
+            if current and (len(current) >= batch_size or current_bytes + size > max_batch_bytes):
+                batches.append(current)
+                current, current_bytes = [], 0
+            current.append(uid)
+            current_bytes += size
+        if current:
+            batches.append(current)
+        return batches
+
+    def fetch_many(self, uids: Iterable[bytes], batch_size: int = 200,
+                   max_batch_bytes: Optional[int] = None) -> Iterator[EmailMessage]:
+        """Fetch and parse emails with one ``UID FETCH`` per batch of UIDs.
+
+        Each batch is sent as a compressed UID set (``1:200,205``) and its
+        messages are yielded as soon as that batch's response is parsed, so a
+        backlog costs one round trip per batch instead of one per message.
+        Messages are fetched with ``BODY.PEEK[]`` and stay unread until
+        ``mark_read``. A failed batch is logged and skipped.
+        """
+        for batch in self.plan_batches(uids, batch_size, max_batch_bytes):
+            try:
+                _, msg_data = uid_command(self.connection, "FETCH", uid_set(batch), "(UID BODY.PEEK[])")
+            except Exception as e:
+                logging.error(f"Failed to fetch emails {uid_set(batch)}: {e}")
+                continue
+            for uid, raw in iter_fetch_response(msg_data):
+                metrics.count("messages_fetched")
+                self._spool(uid, raw)
+                try:
+                    yield parse_email(raw, uid=uid)
+                except Exception as e:
+                    logging.error(f"Failed to parse email {uid}: {e}")
+
+    def iter_emails(self, criteria: str = "UNSEEN", max_batch_bytes: int = 4 * 1024 * 1024) -> Iterator[EmailMessage]:
+        """Yield the emails matching ``criteria`` one at a time.
+
+        Batches are capped at ``max_batch_bytes``, so only one batch (or one
+        oversized message) is held in memory while the caller works through it.
+        """
+        return self.fetch_many(self.search(criteria), max_batch_bytes=max_batch_bytes)
+
+    def fetch_header_fields(self, uids: Iterable[bytes], batch_size: int = 500,
+                            fields: Iterable[str] = HEADER_FIELDS) -> Iterator[HeaderSummary]:
+        """Fetch a few header fields only (``BODY.PEEK[HEADER.FIELDS (...)]``), a few hundred bytes per message.
+
+        One round trip per batch; nothing else of the message is transferred
+        and it stays unread.
+        """
+        section = f"HEADER.FIELDS ({' '.join(fields)})"
+        uids = sorted(uids, key=int)
+        for start in range(0, len(uids), batch_size):
+            batch = uids[start:start + batch_size]
+            try:
+                _, msg_data = uid_command(self.connection, "FETCH", uid_set(batch), f"(UID BODY.PEEK[{section}])")
+                items = list(parse_fetch_items(msg_data))
+            except Exception as e:
+                logging.error(f"Failed to fetch header fields {uid_set(batch)}: {e}")
+                continue
+            for item in items:
+                # Servers differ in how they echo the field list, so match on the prefix
+                header = next((value for name, value in item.items() if name.startswith("BODY[HEADER.FIELDS")), b"")
+                headers = BytesHeaderParser().parsebytes(header or b"")
+                yield HeaderSummary(item["UID"], self._safe_decode(headers.get("Subject")),
+                                    self._safe_decode(headers.get("From")), headers.get("Date"))
+
+    def fetch_headers_many(self, uids: Iterable[bytes], batch_size: int = 200) -> Iterator[EmailMessage]:
+        """Fetch headers, structure and the text body only, leaving attachments on the server.
+
+        Each batch costs one ``UID FETCH (BODYSTRUCTURE BODY.PEEK[HEADER])`` plus
+        one ``BODY.PEEK[section]`` round trip per distinct text section. The
+        yielded messages list their attachments without data; call
+        ``fetch_attachments`` for the ones worth keeping.
+        """
+        uids = sorted(uids, key=int)
+        for start in range(0, len(uids), batch_size):
+            batch = uids[start:start + batch_size]
+            try:
+                _, msg_data = uid_command(self.connection, "FETCH", uid_set(batch), "(UID BODYSTRUCTURE BODY.PEEK[HEADER])")
+                summaries = list(parse_fetch_items(msg_data))
+            except Exception as e:
+                logging.error(f"Failed to fetch headers {uid_set(batch)}: {e}")
+                continue
+            messages = {}
+            text_sections = {}
+            # uid -> [header, text part, raw text], kept only for the spool
+            spooled = {}
+            for item in summaries:
+                try:
+                    uid = item["UID"]
+                    metrics.count("messages_fetched")
+                    with metrics.timer("parse"):
+                        msg, text_part = self._summary_message(uid, item["BODY[HEADER]"], item["BODYSTRUCTURE"])
+                    metrics.count("messages_parsed")
+                except Exception as e:
+                    logging.error(f"Failed to parse headers of email {item.get('UID')}: {e}")
+                    continue
+                messages[uid] = msg
+                if self.spool is not None:
+                    spooled[uid] = [item["BODY[HEADER]"], text_part, b""]
+                if text_part is not None:
+                    text_sections.setdefault(text_part.section, []).append((uid, text_part))
+            for section, entries in text_sections.items():
+                parts = dict(entries)
+                try:
+                    _, msg_data = uid_command(self.connection, "FETCH", uid_set(parts), f"(UID BODY.PEEK[{section}])")
+                    for item in parse_fetch_items(msg_data):
+                        part = parts.get(item.get("UID"))
+                        data = item.get(f"BODY[{section}]")
+                        if part is not None and data:
+                            messages[item["UID"]].body = decode_text(decode_transfer(data, part.encoding), part.charset)
+                            if item["UID"] in spooled:
+                                spooled[item["UID"]][2] = data
+                except Exception as e:
+                    logging.error(f"Failed to fetch body section {section} for {uid_set(parts)}: {e}")
+            for uid, (header, part, data) in spooled.items():
+                # Attachments stay on the server: spool what extraction reads
+                if part is None:
+                    self._spool(uid, text_only_message(header), partial=True)
+                else:
+                    self._spool(uid, text_only_message(header, part.content_type, part.charset, part.encoding, data),
+                                partial=True)
+            for uid in sorted(messages, key=int):
+                yield messages[uid]
+
+    def fetch_attachments(self, msg: EmailMessage, store=None, max_size: Optional[int] = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE) -> EmailMessage:
+        """Download the attachment parts of a message from ``fetch_headers_many``.
+
+        The first ``chunk_size`` octets of every part come back in one round
+        trip; larger parts continue in ``<offset.length>`` chunks. With an
+        ``AttachmentStore`` each part is decoded incrementally into a temp file
+        that the store renames into place, and ``att.path``/``att.sha256`` are
+        set instead of ``att.data``. Parts over ``max_size`` decoded bytes are
+        skipped, without downloading them when BODYSTRUCTURE already says so.
+        Parts that fail to download are left unloaded (see ``attachments_complete``).
+        """
+        pending = []
+        for att in msg.attachments:
+            if att.loaded or att.skipped or not att.section:
+                continue
+            if max_size is not None and att.size and decoded_size_estimate(att.size, att.encoding) > max_size:
+                att.skipped = True
+                logging.info(f"Skipping attachment {att.filename} of email {msg.uid}: larger than {max_size} bytes")
+                continue
+            pending.append(att)
+        if not pending:
+            return msg
+        items = " ".join(f"BODY.PEEK[{att.section}]<0.{chunk_size}>" for att in pending)
+        try:
+            status, msg_data = uid_command(self.connection, "FETCH", msg.uid, f"(UID {items})")
+            if status != "OK":
+                raise AttachmentFetchError(f"{status} {msg_data}")
+            first_chunks = {}
+            for item in parse_fetch_items(msg_data):
+                for att in pending:
+                    data = item.get(f"BODY[{att.section}]<0>")
+                    if data is not None:
+                        first_chunks[att.section] = data
+        except Exception as e:
+            logging.error(f"Failed to fetch attachments of email {msg.uid}: {e}")
+            return msg
+        for att in pending:
+            # A part missing from the first response is fetched again by the reader
+            reader = PartReader(self.connection, msg.uid, att.section, att.encoding, chunk_size, max_size,
+                                first_chunk=first_chunks.get(att.section), size=att.size)
+            try:
+                if store is not None:
+                    blob = store.put(reader, att.filename, att.content_type)
+                    att.path, att.sha256 = blob.path, blob.sha256
+                else:
+                    data = bytearray()
+                    for chunk in iter(reader.read, b""):
+                        data += chunk
+                    att.data = bytes(data)
+            except AttachmentTooLarge as e:
+                att.skipped = True
+                logging.info(f"Skipping attachment {att.filename}: {e}")
+            except Exception as e:
+                logging.error(f"Failed to fetch attachment {att.filename} of email {msg.uid}: {e}")
+        return msg
+
+    @classmethod
+    def _summary_message(cls, uid: bytes, header: bytes, structure):
+        """Build an EmailMessage (without body) from headers and BODYSTRUCTURE."""
+        headers = BytesHeaderParser().parsebytes(header)
+        parts = walk_bodystructure(structure)
+        text_part = None
+        attachments = []
+        if not isinstance(structure[0], list):
+            # Single-part message: the whole body is the text, as in parse_email
+            text_part = parts[0]
+            parts = []
+        for part in parts:
+            if part.is_attachment:
+                attachments.append(Attachment(
+                    cls._safe_decode(part.filename), None, content_type=part.content_type,
+                    section=part.section, encoding=part.encoding, size=part.size,
+                ))
+            elif part.content_type == "text/plain":
+                text_part = part
+        msg = EmailMessage(cls._safe_decode(headers.get("Subject")), cls._safe_decode(headers.get("From")),
+                           "", attachments, uid=uid)
+        return msg, text_part
+
     def mark_read(self, msg_id: bytes):
         """Mark an email as read."""
         try:
-            self.connection.store(msg_id, '+FLAGS','\\Seen')
+            status, data = uid_command(self.connection, "STORE", msg_id, '+FLAGS', '\\Seen')
+            if status != "OK":
+                logging.warning(f"Failed to mark email {msg_id} as read: {status} {data}")
         except Exception as e:
             logging.warning(f"Failed to mark email {msg_id} as read: {e}")
 
+    def mark_read_many(self, uids: Iterable[bytes], batch_size: int = 1000) -> bool:
+        """Mark emails as read with one silent ``UID STORE <set> +FLAGS.SILENT`` per batch."""
+        uids = sorted(uids, key=int)
+        ok = True
+        for start in range(0, len(uids), batch_size):
+            batch = uid_set(uids[start:start + batch_size])
+            try:
+                status, data = uid_command(self.connection, "STORE", batch, "+FLAGS.SILENT", "(\\Seen)")
+                if status != "OK":
+                    logging.warning(f"Failed to mark emails {batch} as read: {status} {data}")
+                    ok = False
+            except Exception as e:
+                logging.warning(f"Failed to mark emails {batch} as read: {e}")
+                ok = False
+        return ok
+
     def logout(self):
         """Logout from the IMAP server."""
         if self.connection:
@@ -106,7 +741,12 @@ class IMAPClient:
         """Safely decode an email header value."""
         if not header_value:
             return ""
-        decoded, encoding = decode_header(header_value)[0]
-        if isinstance(decoded, bytes):
-            return decoded.decode(encoding if encoding else "utf-8", errors="ignore")
-        return decoded
+        chunks = []
+        for decoded, encoding in decode_header(header_value):
+            if isinstance(decoded, bytes):
+                try:
+                    decoded = decoded.decode(encoding if encoding else "utf-8", errors="ignore")
+                except LookupError:
+                    decoded = decoded.decode("utf-8", errors="ignore")
+            chunks.append(decoded)
+        return "".join(chunks)
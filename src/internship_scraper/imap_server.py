@@ -0,0 +1,538 @@
+"""
+In-process IMAP4rev1 stand-in server.
+
+``IMAPStandIn`` serves a list of raw messages over a real socket, plain TCP or
+TLS with a throw-away self-signed certificate, so ``IMAPClient``, the
+connection pool and ``AsyncIMAPClient`` can be tested and benchmarked end to
+end without a mail account or network. It understands CAPABILITY, NOOP,
+LOGIN, SELECT/EXAMINE, SEARCH, FETCH (including partial
+``BODY[section]<offset.length>`` fetches), STORE, their UID forms, IDLE,
+EXPUNGE, CLOSE and LOGOUT.
+
+Knobs for the network path:
+
+- ``latency``: seconds added before every command is answered (one round trip);
+- ``bandwidth``: cap on response bytes per second, per session;
+- ``max_connections``: LOGINs beyond it get ``NO [LIMIT]``, like Gmail's cap;
+- ``fail_next(command, response)``: answer the next ``command`` with e.g.
+  ``NO [THROTTLED] ...`` instead of running it.
+
+``stats`` counts commands by name plus ``bytes_sent`` and ``connections``.
+
+    with IMAPStandIn(messages, latency=0.02) as server:
+        client = server.client()
+        client.connect()
+        uids = client.search("ALL")
+"""
+import email
+import ipaddress
+import logging
+import os
+import re
+import select
+import shutil
+import socket
+import socketserver
+import ssl
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from .imap import IMAPClient
+from .testing import fetch_response, wire_fetch
+
+THROTTLED = "NO [THROTTLED] Too many requests, slow down"
+_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|(\()|(\))|([^\s()]+)')
+_LITERAL_RE = re.compile(rb"\{(\d+)(\+?)\}\r?\n$")
+_SEND_CHUNK = 16 * 1024
+_MONTHS = {m: i for i, m in enumerate(["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"], 1)}
+
+def self_signed_certificate(hostname: str = "localhost"):
+    """PEM ``(certificate, private key)`` for ``hostname`` and 127.0.0.1, valid for a day."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, hostname)])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(minutes=5)).not_valid_after(now + timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([
+            x509.DNSName(hostname), x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+        ]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    return (certificate.public_bytes(serialization.Encoding.PEM),
+            key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                              serialization.NoEncryption()))
+
+def _tokens(text: str) -> List:
+    """Split command arguments into atoms/quoted strings, with parenthesized groups as nested lists."""
+    stack = [[]]
+    for quoted, opening, closing, atom in _TOKEN_RE.findall(text):
+        if opening:
+            stack.append([])
+        elif closing:
+            group = stack.pop()
+            stack[-1].append(group)
+        elif atom:
+            stack[-1].append(atom)
+        else:
+            stack[-1].append(re.sub(r"\\(.)", r"\1", quoted))
+    return stack[0]
+
+def _parse_date(value: str):
+    day, month, year = value.split("-")
+    return datetime(int(year), _MONTHS[month.upper()], int(day)).date()
+
+class IMAPStandIn:
+    """Threaded IMAP server over an in-memory folder; see the module docstring."""
+    def __init__(self, messages: Iterable[bytes] = (), user: str = "user", password: str = "password",
+                 folder: str = "INBOX", uidvalidity: int = 1, latency: float = 0.0, bandwidth: Optional[int] = None,
+                 max_connections: Optional[int] = None, tls: bool = False, host: str = "127.0.0.1", port: int = 0):
+        self.user = user
+        self.password = password
+        self.folder = folder
+        self.uidvalidity = uidvalidity
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.max_connections = max_connections
+        self.tls = tls
+        self.host = host
+        self.port = port
+        self.stats = Counter()
+        self.messages: Dict[int, bytes] = {}
+        self.flags: Dict[int, Set[str]] = {}
+        self._headers: Dict[int, email.message.Message] = {}
+        self._next_uid = 1
+        self._sessions = 0
+        self._failures = deque()
+        self._lock = threading.Condition()
+        self._server = None
+        self._thread = None
+        self._certdir = None
+        self.certificate = None
+        for raw in messages:
+            self.append(raw)
+
+    # --- mailbox -----------------------------------------------------------
+
+    def append(self, raw: bytes, flags: Iterable[str] = ()) -> int:
+        """Add a message (sessions in IDLE are told about it) and return its UID."""
+        with self._lock:
+            uid = self._next_uid
+            self._next_uid += 1
+            self.messages[uid] = raw
+            self.flags[uid] = set(flags)
+            self._lock.notify_all()
+            return uid
+
+    def uids(self) -> List[int]:
+        with self._lock:
+            return sorted(self.messages)
+
+    def headers(self, uid: int):
+        if uid not in self._headers:
+            self._headers[uid] = BytesHeaderParser().parsebytes(self.messages[uid])
+        return self._headers[uid]
+
+    def fail_next(self, command: str, response: str = THROTTLED, times: int = 1):
+        """Answer the next ``times`` ``command`` (e.g. ``"UID FETCH"``) with ``response`` instead of running it."""
+        with self._lock:
+            self._failures.extend([(command.upper(), response)] * times)
+
+    def _take_failure(self, command: str) -> Optional[str]:
+        with self._lock:
+            for index, (failing, response) in enumerate(self._failures):
+                if failing == command:
+                    del self._failures[index]
+                    return response
+        return None
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    # --- server lifecycle --------------------------------------------------
+
+    def start(self) -> "IMAPStandIn":
+        context = None
+        if self.tls:
+            cert, key = self_signed_certificate()
+            self.certificate = cert
+            self._certdir = tempfile.mkdtemp(prefix="imap-stand-in-")
+            certfile, keyfile = os.path.join(self._certdir, "cert.pem"), os.path.join(self._certdir, "key.pem")
+            with open(certfile, "wb") as f:
+                f.write(cert)
+            with open(keyfile, "wb") as f:
+                f.write(key)
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(certfile, keyfile)
+        self._server = _Server((self.host, self.port), _Session, self, context)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="imap-stand-in", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._certdir:
+            shutil.rmtree(self._certdir, ignore_errors=True)
+            self._certdir = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def client_ssl_context(self) -> Optional[ssl.SSLContext]:
+        """Client context trusting this server's self-signed certificate."""
+        if not self.tls:
+            return None
+        return ssl.create_default_context(cadata=self.certificate.decode())
+
+    def client_options(self) -> Dict:
+        """Keyword arguments pointing an IMAPClient or AsyncIMAPClient at this server."""
+        return {"port": self.port, "use_ssl": self.tls, "ssl_context": self.client_ssl_context()}
+
+    def client(self, client_class=IMAPClient, **kwargs):
+        """A client for this server's account (not connected yet)."""
+        options = {**self.client_options(), **kwargs}
+        return client_class(self.host, self.user, self.password, self.folder, **options)
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, handler, stand_in: IMAPStandIn, context: Optional[ssl.SSLContext]):
+        self.stand_in = stand_in
+        self.context = context
+        super().__init__(address, handler)
+
+    def get_request(self):
+        sock, address = super().get_request()
+        # Responses go out line by line; don't let Nagle + delayed ACKs add 40 ms to each round trip
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.context:
+            # The handshake runs in the session thread, not the accept loop
+            sock = self.context.wrap_socket(sock, server_side=True, do_handshake_on_connect=False)
+        return sock, address
+
+class _Session(socketserver.StreamRequestHandler):
+    """One client connection."""
+    def setup(self):
+        if isinstance(self.request, ssl.SSLSocket):
+            self.request.do_handshake()
+        super().setup()
+        self.box: IMAPStandIn = self.server.stand_in
+        self.authenticated = False
+        self.selected = False
+        self.readonly = False
+
+    def finish(self):
+        if self.authenticated:
+            with self.box._lock:
+                self.box._sessions -= 1
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def send(self, data):
+        if isinstance(data, str):
+            data = data.encode() + b"\r\n"
+        if self.box.bandwidth:
+            for start in range(0, len(data), _SEND_CHUNK):
+                chunk = data[start:start + _SEND_CHUNK]
+                self.wfile.write(chunk)
+                time.sleep(len(chunk) / self.box.bandwidth)
+        else:
+            self.wfile.write(data)
+        self.box._count("bytes_sent", len(data))
+
+    def read_command(self) -> Optional[str]:
+        """One command line with any ``{n}`` literals inlined as quoted strings."""
+        line = b""
+        while True:
+            chunk = self.rfile.readline()
+            if not chunk:
+                return None
+            literal = _LITERAL_RE.search(chunk)
+            if not literal:
+                return (line + chunk).rstrip(b"\r\n").decode("utf-8", "replace")
+            if not literal.group(2):
+                self.send("+ Ready for literal data")
+            data = self.rfile.read(int(literal.group(1)))
+            quoted = data.decode("utf-8", "replace").replace("\\", "\\\\").replace('"', '\\"')
+            line += chunk[:literal.start()] + f'"{quoted}"'.encode()
+
+    def handle(self):
+        self.box._count("connections")
+        self.send("* OK [CAPABILITY IMAP4rev1 IDLE UIDPLUS] IMAP4rev1 stand-in ready")
+        while True:
+            try:
+                line = self.read_command()
+            except (OSError, ValueError):
+                return
+            if line is None:
+                return
+            tag, _, rest = line.partition(" ")
+            command, _, args = rest.partition(" ")
+            command = command.upper()
+            if command == "UID":
+                sub, _, args = args.partition(" ")
+                command = f"UID {sub.upper()}"
+            self.box._count(command)
+            if self.box.latency:
+                time.sleep(self.box.latency)
+            failure = self.box._take_failure(command)
+            if failure:
+                self.send(f"{tag} {failure}")
+                continue
+            method = getattr(self, "do_" + command.replace(" ", "_"), None)
+            if method is None:
+                self.send(f"{tag} BAD Unknown command {command}")
+                continue
+            if command not in ("CAPABILITY", "NOOP", "LOGIN", "LOGOUT") and not self.authenticated:
+                self.send(f"{tag} BAD Log in first")
+                continue
+            try:
+                status = method(args.strip())
+            except Exception as e:
+                logging.debug(f"IMAP stand-in: {command} {args!r} failed: {e!r}")
+                status = f"BAD {command} failed: {e}"
+            self.send(f"{tag} {status}")
+            if command == "LOGOUT":
+                return
+
+    # --- commands ----------------------------------------------------------
+
+    def do_CAPABILITY(self, args):
+        self.send("* CAPABILITY IMAP4rev1 IDLE UIDPLUS")
+        return "OK CAPABILITY completed"
+
+    def do_NOOP(self, args):
+        return "OK NOOP completed"
+
+    def do_CHECK(self, args):
+        return "OK CHECK completed"
+
+    def do_LOGOUT(self, args):
+        self.send("* BYE Logging out")
+        return "OK LOGOUT completed"
+
+    def do_LOGIN(self, args):
+        user, password = (_tokens(args) + [None, None])[:2]
+        if user != self.box.user or password != self.box.password:
+            return "NO [AUTHENTICATIONFAILED] Invalid credentials"
+        with self.box._lock:
+            if self.box.max_connections is not None and self.box._sessions >= self.box.max_connections:
+                return "NO [LIMIT] Too many simultaneous connections"
+            self.box._sessions += 1
+        self.authenticated = True
+        return "OK [CAPABILITY IMAP4rev1 IDLE UIDPLUS] Logged in"
+
+    def do_SELECT(self, args, readonly=False):
+        folder = (_tokens(args) or [""])[0]
+        if folder.upper() != self.box.folder.upper():
+            self.selected = False
+            return "NO [NONEXISTENT] Unknown mailbox"
+        uids = self.box.uids()
+        self.send(f"* {len(uids)} EXISTS")
+        self.send("* 0 RECENT")
+        self.send("* FLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft)")
+        self.send(f"* OK [UIDVALIDITY {self.box.uidvalidity}] UIDs valid")
+        self.send(f"* OK [UIDNEXT {self.box._next_uid}] Predicted next UID")
+        self.selected, self.readonly = True, readonly
+        return f"OK [{'READ-ONLY' if readonly else 'READ-WRITE'}] {'EXAMINE' if readonly else 'SELECT'} completed"
+
+    def do_EXAMINE(self, args):
+        return self.do_SELECT(args, readonly=True)
+
+    def do_CLOSE(self, args):
+        self.selected = False
+        return "OK CLOSE completed"
+
+    def do_EXPUNGE(self, args):
+        if not self.selected or self.readonly:
+            return "NO Mailbox not writable"
+        with self.box._lock:
+            uids = sorted(self.box.messages)
+            for seq in range(len(uids), 0, -1):
+                if "\\Deleted" in self.box.flags[uids[seq - 1]]:
+                    del self.box.messages[uids[seq - 1]]
+                    self.send(f"* {seq} EXPUNGE")
+        return "OK EXPUNGE completed"
+
+    def do_IDLE(self, args):
+        if not self.selected:
+            return "BAD No mailbox selected"
+        known = len(self.box.uids())
+        self.send("+ idling")
+        while True:
+            with self.box._lock:
+                self.box._lock.wait_for(lambda: len(self.box.messages) != known, timeout=0.05)
+                count = len(self.box.messages)
+            if count != known:
+                self.send(f"* {count} EXISTS")
+                known = count
+            # TLS may already hold decrypted bytes the socket no longer reports as readable
+            pending = self.request.pending() if isinstance(self.request, ssl.SSLSocket) else 0
+            if pending or select.select([self.request], [], [], 0)[0]:
+                line = self.rfile.readline()
+                if not line or line.strip().upper() == b"DONE":
+                    return "OK IDLE terminated"
+
+    def _resolve(self, sequence_set: str, by_uid: bool) -> List[int]:
+        """UIDs named by a UID set or a sequence-number set, in ascending order."""
+        uids = self.box.uids()
+        if not uids:
+            return []
+        top = uids[-1] if by_uid else len(uids)
+        numbers = set()
+        for item in sequence_set.split(","):
+            start, _, end = item.partition(":")
+            start = top if start == "*" else int(start)
+            end = start if not end else (top if end == "*" else int(end))
+            low, high = min(start, end), max(start, end)
+            if by_uid:
+                numbers.update(uid for uid in uids if low <= uid <= high)
+            else:
+                numbers.update(uids[n - 1] for n in range(max(low, 1), min(high, len(uids)) + 1))
+        return sorted(numbers)
+
+    def _search(self, args, by_uid):
+        if not self.selected:
+            return "BAD No mailbox selected"
+        keys = _tokens(args)
+        if len(keys) >= 2 and keys[0].upper() == "CHARSET":
+            keys = keys[2:]
+        uids = self.box.uids()
+        matches = [uid for uid in uids if self._matches(uid, list(keys), uids)]
+        numbers = matches if by_uid else [uids.index(uid) + 1 for uid in matches]
+        self.send("* SEARCH" + "".join(f" {n}" for n in numbers))
+        return "OK SEARCH completed"
+
+    def do_SEARCH(self, args):
+        return self._search(args, by_uid=False)
+
+    def do_UID_SEARCH(self, args):
+        return self._search(args, by_uid=True)
+
+    def _matches(self, uid: int, keys: List, uids: List[int]) -> bool:
+        while keys:
+            if not self._match_key(uid, keys, uids):
+                return False
+        return True
+
+    def _match_key(self, uid: int, keys: List, uids: List[int]) -> bool:
+        key = keys.pop(0)
+        if isinstance(key, list):
+            return self._matches(uid, list(key), uids)
+        name = key.upper()
+        flags = self.box.flags[uid]
+        if name == "ALL":
+            return True
+        if name == "NOT":
+            return not self._match_key(uid, keys, uids)
+        if name == "OR":
+            first = self._match_key(uid, keys, uids)
+            second = self._match_key(uid, keys, uids)
+            return first or second
+        for flag in ("SEEN", "DELETED", "FLAGGED", "ANSWERED", "DRAFT"):
+            if name == flag:
+                return f"\\{flag.title()}" in flags
+            if name == f"UN{flag}":
+                return f"\\{flag.title()}" not in flags
+        if name == "UID":
+            return uid in self._resolve(keys.pop(0), by_uid=True)
+        if re.fullmatch(r"[\d*:,]+", name):
+            return uid in self._resolve(name, by_uid=False)
+        if name in ("SUBJECT", "FROM", "TO", "CC", "BCC"):
+            return keys.pop(0).lower() in IMAPClient._safe_decode(self.box.headers(uid).get(name.title(), "")).lower()
+        if name == "HEADER":
+            field, value = keys.pop(0), keys.pop(0)
+            header = self.box.headers(uid).get(field)
+            return header is not None and value.lower() in IMAPClient._safe_decode(header).lower()
+        if name in ("BODY", "TEXT"):
+            return keys.pop(0).lower().encode() in self.box.messages[uid].lower()
+        if name in ("LARGER", "SMALLER"):
+            size, limit = len(self.box.messages[uid]), int(keys.pop(0))
+            return size > limit if name == "LARGER" else size < limit
+        if name in ("SINCE", "BEFORE", "ON", "SENTSINCE", "SENTBEFORE", "SENTON"):
+            # Internal dates are not tracked: the Date header stands in for both kinds
+            day = _parse_date(keys.pop(0))
+            try:
+                sent = parsedate_to_datetime(self.box.headers(uid).get("Date")).date()
+            except (TypeError, ValueError):
+                return False
+            return {"SINCE": sent >= day, "BEFORE": sent < day, "ON": sent == day}[name.replace("SENT", "")]
+        raise ValueError(f"unsupported search key {key}")
+
+    def _fetch(self, args, by_uid):
+        if not self.selected:
+            return "BAD No mailbox selected"
+        sequence_set, _, items = args.partition(" ")
+        uids = self.box.uids()
+        marks_seen = not self.readonly and re.search(r"BODY\[|RFC822(?![.\w])|RFC822\.TEXT", items.upper())
+        for uid in self._resolve(sequence_set, by_uid):
+            with self.box._lock:
+                raw = self.box.messages.get(uid)
+                flags = set(self.box.flags.get(uid, ()))
+            if raw is None:
+                continue
+            if marks_seen:
+                with self.box._lock:
+                    self.box.flags[uid].add("\\Seen")
+            self.send(wire_fetch(fetch_response(uid, raw, items, flags=flags, seq=uids.index(uid) + 1)))
+        return "OK FETCH completed"
+
+    def do_FETCH(self, args):
+        return self._fetch(args, by_uid=False)
+
+    def do_UID_FETCH(self, args):
+        return self._fetch(args, by_uid=True)
+
+    def _store(self, args, by_uid):
+        if not self.selected:
+            return "BAD No mailbox selected"
+        if self.readonly:
+            return "NO Mailbox is read-only"
+        sequence_set, operation, flag_list = (_tokens(args) + [None, None])[:3]
+        flag_list = flag_list if isinstance(flag_list, list) else [flag_list]
+        operation = operation.upper()
+        uids = self.box.uids()
+        for uid in self._resolve(sequence_set, by_uid):
+            with self.box._lock:
+                flags = self.box.flags[uid]
+                if operation.startswith("+"):
+                    flags.update(flag_list)
+                elif operation.startswith("-"):
+                    flags.difference_update(flag_list)
+                else:
+                    flags.clear()
+                    flags.update(flag_list)
+                current = " ".join(sorted(flags))
+            if not operation.endswith(".SILENT"):
+                self.send(f"* {uids.index(uid) + 1} FETCH (UID {uid} FLAGS ({current}))")
+        return "OK STORE completed"
+
+    def do_STORE(self, args):
+        return self._store(args, by_uid=False)
+
+    def do_UID_STORE(self, args):
+        return self._store(args, by_uid=True)
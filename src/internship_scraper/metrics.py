@@ -0,0 +1,142 @@
+"""
+Lightweight pipeline instrumentation.
+
+``metrics`` is a process-wide registry of stage timers and counters. The IMAP
+client, parser, extractor, attachment store and the webapp ingestion path
+report into it, so a slow scrape can be split into login, SEARCH, FETCH,
+MIME parsing, extraction, disk writes and database commits.
+
+It is disabled by default: ``timer()`` then hands back a shared no-op context
+manager and ``count()`` returns after one attribute check, so instrumented
+code costs next to nothing. The CLI enables it for ``--profile`` and the
+webapp for its ``/metrics`` route.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class StageStats:
+    """Calls, total and slowest duration of one timed stage."""
+    __slots__ = ("calls", "seconds", "max_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+class Metrics:
+    """Thread-safe stage timers and counters; near free while ``enabled`` is False."""
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Dict[str, int] = {}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def timer(self, stage: str):
+        """Context manager adding the time spent inside it to ``stage``."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timed(stage)
+
+    @contextmanager
+    def _timed(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def observe(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.calls += 1
+            stats.seconds += seconds
+            if seconds > stats.max_seconds:
+                stats.max_seconds = seconds
+
+    def count(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+            self.started = time.monotonic()
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Plain-dict copy of everything recorded so far."""
+        with self._lock:
+            return {
+                "stages": {name: {"calls": s.calls, "seconds": s.seconds, "max_seconds": s.max_seconds}
+                           for name, s in self.stages.items()},
+                "counters": dict(self.counters),
+                "uptime_seconds": time.monotonic() - self.started,
+            }
+
+    def render_prometheus(self, prefix: str = "internship_scraper") -> str:
+        """The metrics in the Prometheus text exposition format (version 0.0.4)."""
+        data = self.snapshot()
+        lines: List[str] = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{labels} {value:g}" if isinstance(value, float)
+                             else f"{prefix}_{name}{labels} {value}")
+
+        stages = sorted(data["stages"].items())
+        family("stage_seconds_total", "counter", "Time spent in each pipeline stage.",
+               [(f'{{stage="{name}"}}', s["seconds"]) for name, s in stages])
+        family("stage_calls_total", "counter", "Times each pipeline stage ran.",
+               [(f'{{stage="{name}"}}', s["calls"]) for name, s in stages])
+        family("stage_max_seconds", "gauge", "Slowest single run of each pipeline stage.",
+               [(f'{{stage="{name}"}}', s["max_seconds"]) for name, s in stages])
+        for name, value in sorted(data["counters"].items()):
+            family(f"{name}_total", "counter", f"Total {name.replace('_', ' ')}.", [("", value)])
+        family("metrics_uptime_seconds", "gauge", "Seconds since the metrics were last reset.",
+               [("", data["uptime_seconds"])])
+        return "\n".join(lines) + "\n"
+
+    def summary(self, elapsed: Optional[float] = None) -> str:
+        """Human-readable table of stages and counters, as printed by ``--profile``."""
+        data = self.snapshot()
+        elapsed = elapsed if elapsed is not None else data["uptime_seconds"]
+        counters = data["counters"]
+        lines = [f"{'stage':<20} {'calls':>8} {'total s':>10} {'avg ms':>10} {'max ms':>10} {'share':>7}"]
+        for name, s in sorted(data["stages"].items(), key=lambda item: item[1]["seconds"], reverse=True):
+            avg = s["seconds"] / s["calls"] * 1000 if s["calls"] else 0.0
+            share = s["seconds"] / elapsed if elapsed else 0.0
+            lines.append(f"{name:<20} {s['calls']:>8} {s['seconds']:>10.3f} {avg:>10.2f} "
+                         f"{s['max_seconds'] * 1000:>10.2f} {share:>7.1%}")
+        for name, value in sorted(counters.items()):
+            lines.append(f"{name:<20} {value:>8}")
+        received = counters.get("imap_bytes_received", 0) + counters.get("archive_bytes_read", 0)
+        # Archive imports parse in worker processes, whose counters stay there
+        messages = max(counters.get("messages_parsed", 0), counters.get("archive_messages", 0))
+        if elapsed:
+            lines.append(f"elapsed {elapsed:.3f}s, {messages / elapsed:.1f} messages/s, "
+                         f"{received / elapsed / (1024 * 1024):.2f} MB/s received ({received} bytes)")
+        return "\n".join(lines)
+
+metrics = Metrics()
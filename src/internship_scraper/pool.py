@@ -0,0 +1,164 @@
+"""
+Parallel IMAP sessions for large backlogs.
+
+``IMAPConnectionPool`` keeps up to N authenticated ``IMAPClient`` sessions on
+the same folder, hands UID batches to whichever session is idle and yields the
+results back in UID order, so callers keep the same loop they use with a
+single ``IMAPClient``.
+"""
+import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional
+
+from .imap import IMAPClient, EmailMessage, HeaderSummary
+
+# Simultaneous IMAP sessions a server accepts per account; extra logins get rejected
+SERVER_CONNECTION_CAPS = {
+    "imap.gmail.com": 15,
+    "outlook.office365.com": 20,
+}
+DEFAULT_CONNECTION_CAP = 8
+
+class IMAPConnectionPool:
+    """Pool of IMAPClient sessions sharing one account and folder.
+
+    Sessions beyond the first are opened lazily, only when there are more
+    pending batches than idle sessions. ``size`` is clamped to
+    ``max_connections``, which defaults to the known cap for ``server``.
+    A ``spool`` (``spool.MessageSpool``) is attached to every session.
+    """
+    def __init__(self, server: str, user: str, password: str, folder: str = "INBOX", size: int = 4,
+                 max_connections: Optional[int] = None, client_factory=IMAPClient, spool=None):
+        if max_connections is None:
+            max_connections = SERVER_CONNECTION_CAPS.get(server.lower(), DEFAULT_CONNECTION_CAP)
+        self.server = server
+        self.user = user
+        self.password = password
+        self.folder = folder
+        self.size = max(1, min(size, max_connections))
+        self.client_factory = client_factory
+        self.spool = spool
+        self.clients: List[IMAPClient] = []
+        self._idle = queue.LifoQueue()
+        self._opening = 0
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Open the first session; the others are opened on demand."""
+        self._idle.put(self._open())
+
+    @property
+    def uidvalidity(self) -> Optional[int]:
+        return self.clients[0].uidvalidity if self.clients else None
+
+    def _open(self) -> IMAPClient:
+        client = self.client_factory(self.server, self.user, self.password, self.folder)
+        client.spool = self.spool
+        client.connect()
+        with self._lock:
+            self.clients.append(client)
+        return client
+
+    def _acquire(self) -> IMAPClient:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = len(self.clients) + self._opening < self.size
+            if can_open:
+                self._opening += 1
+        if not can_open:
+            return self._idle.get()
+        try:
+            return self._open()
+        except Exception as e:
+            with self._lock:
+                if not self.clients:
+                    raise
+                # The server refused another session: settle for the ones we have
+                self.size = len(self.clients)
+            logging.warning(f"Could not open extra IMAP session, continuing with {self.size}: {e}")
+            return self._idle.get()
+        finally:
+            with self._lock:
+                self._opening -= 1
+
+    @contextmanager
+    def session(self):
+        """Check out an idle session for the duration of the block."""
+        client = self._acquire()
+        try:
+            yield client
+        finally:
+            self._idle.put(client)
+
+    def _map_batches(self, method: str, uids: Iterable[bytes], batch_size: int,
+                     max_batch_bytes: Optional[int] = None) -> Iterator[EmailMessage]:
+        with self.session() as client:
+            batches = client.plan_batches(uids, batch_size, max_batch_bytes)
+
+        def work(batch):
+            with self.session() as client:
+                return list(getattr(client, method)(batch, batch_size=len(batch)))
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            pending = deque()
+            for batch in batches:
+                pending.append(executor.submit(work, batch))
+                # Bound buffered results while keeping every session busy
+                if len(pending) >= self.size * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def fetch_many(self, uids: Iterable[bytes], batch_size: int = 200,
+                   max_batch_bytes: Optional[int] = None) -> Iterator[EmailMessage]:
+        """Parallel ``IMAPClient.fetch_many``; messages are yielded in UID order.
+
+        At most ``2 * size`` batches are buffered at a time.
+        """
+        return self._map_batches("fetch_many", uids, batch_size, max_batch_bytes)
+
+    def fetch_headers_many(self, uids: Iterable[bytes], batch_size: int = 200) -> Iterator[EmailMessage]:
+        """Parallel ``IMAPClient.fetch_headers_many``; messages are yielded in UID order."""
+        return self._map_batches("fetch_headers_many", uids, batch_size)
+
+    def fetch_header_fields(self, uids: Iterable[bytes], batch_size: int = 500) -> Iterator[HeaderSummary]:
+        """Parallel ``IMAPClient.fetch_header_fields``; summaries are yielded in UID order."""
+        return self._map_batches("fetch_header_fields", uids, batch_size)
+
+    def fetch_attachments(self, msg: EmailMessage, store=None, max_size: Optional[int] = None) -> EmailMessage:
+        with self.session() as client:
+            return client.fetch_attachments(msg, store=store, max_size=max_size)
+
+    def search(self, criteria: str = "UNSEEN") -> List[bytes]:
+        with self.session() as client:
+            return client.search(criteria)
+
+    def try_search(self, criteria: str) -> Optional[List[bytes]]:
+        with self.session() as client:
+            return client.try_search(criteria)
+
+    def search_after(self, last_uid: int) -> List[bytes]:
+        with self.session() as client:
+            return client.search_after(last_uid)
+
+    def mark_read(self, msg_id: bytes):
+        with self.session() as client:
+            client.mark_read(msg_id)
+
+    def mark_read_many(self, uids: Iterable[bytes], batch_size: int = 1000) -> bool:
+        with self.session() as client:
+            return client.mark_read_many(uids, batch_size)
+
+    def logout(self):
+        """Logout every open session."""
+        for client in self.clients:
+            client.logout()
+        self.clients = []
+        self._idle = queue.LifoQueue()
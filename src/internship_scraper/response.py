@@ -0,0 +1,160 @@
+"""
+Parsing of IMAP FETCH responses and BODYSTRUCTURE trees.
+
+imaplib hands FETCH data back as a flat list in which every literal
+(``{123}``) arrives as a ``(head, literal)`` tuple followed by the rest of the
+line. ``parse_fetch_items`` stitches that back into one dict per message, e.g.
+``{"UID": b"42", "BODYSTRUCTURE": [...], "BODY[HEADER]": b"..."}``.
+"""
+import re
+from email.utils import collapse_rfc2231_value, decode_params, unquote
+from typing import Dict, Iterator, List, Optional
+
+_LITERAL_RE = re.compile(rb"\{(\d+)\}$")
+
+class PartInfo:
+    """One leaf of a BODYSTRUCTURE tree, addressable as ``BODY[section]``."""
+    def __init__(self, section: str, content_type: str, encoding: str, size: int,
+                 filename: Optional[str], disposition: Optional[str], charset: Optional[str]):
+        self.section = section
+        self.content_type = content_type
+        self.encoding = encoding
+        self.size = size
+        self.filename = filename
+        self.disposition = disposition
+        self.charset = charset
+
+    @property
+    def is_attachment(self) -> bool:
+        return self.disposition == "attachment"
+
+class _Literal(bytes):
+    """Marks literal payloads so the tokenizer never mistakes them for parens."""
+
+def _tokenize(data: bytes, tokens: List):
+    """Append the tokens of one response chunk: ``(``, ``)``, strings, atoms and ``None`` for NIL."""
+    i, length = 0, len(data)
+    while i < length:
+        char = data[i:i + 1]
+        if char in b" \r\n":
+            i += 1
+        elif char in b"()":
+            tokens.append(char.decode())
+            i += 1
+        elif char == b'"':
+            j, value = i + 1, bytearray()
+            while j < length and data[j:j + 1] != b'"':
+                if data[j:j + 1] == b"\\":
+                    j += 1
+                value += data[j:j + 1]
+                j += 1
+            tokens.append(bytes(value))
+            i = j + 1
+        else:
+            j, depth = i, 0
+            # Atoms such as BODY[HEADER.FIELDS (SUBJECT FROM)]<0> may contain spaces and parens inside brackets
+            while j < length:
+                char = data[j:j + 1]
+                if char == b"[":
+                    depth += 1
+                elif char == b"]":
+                    depth -= 1
+                elif depth == 0 and char in b' ()"\r\n':
+                    break
+                j += 1
+            atom = data[i:j]
+            tokens.append(None if atom.upper() == b"NIL" else atom)
+            i = j
+
+def _build(tokens: List, pos: int):
+    """Turn the flat token list into nested lists starting at ``pos``."""
+    items = []
+    while pos < len(tokens):
+        token = tokens[pos]
+        if token == "(":
+            child, pos = _build(tokens, pos + 1)
+            items.append(child)
+        elif token == ")":
+            return items, pos + 1
+        else:
+            items.append(token)
+            pos += 1
+    return items, pos
+
+def parse_fetch_items(msg_data) -> Iterator[Dict[str, object]]:
+    """Yield one ``{item name: value}`` dict per message in an imaplib FETCH response."""
+    tokens: List = []
+    for response_part in msg_data:
+        if isinstance(response_part, tuple):
+            head, literal = response_part
+            match = _LITERAL_RE.search(head)
+            _tokenize(head[:match.start()] if match else head, tokens)
+            tokens.append(_Literal(literal))
+        elif isinstance(response_part, bytes):
+            _tokenize(response_part, tokens)
+    pos = 0
+    while pos < len(tokens):
+        # Each untagged response is "<seq> (<name> <value> ...)"
+        if tokens[pos] == "(":
+            values, pos = _build(tokens, pos + 1)
+            item = {}
+            for name, value in zip(values[0::2], values[1::2]):
+                item[name.decode().upper()] = bytes(value) if isinstance(value, _Literal) else value
+            yield item
+        else:
+            pos += 1
+
+def _text(value) -> Optional[str]:
+    return value.decode(errors="ignore") if isinstance(value, bytes) else None
+
+def _params(value) -> Dict[str, str]:
+    """Body or disposition parameters, with RFC 2231 ones (``filename*0*=utf-8''...``) joined and decoded.
+
+    Same handling as ``email.message.Message.get_param``, so a part gets the
+    filename a full MIME parse would give it.
+    """
+    if not isinstance(value, list):
+        return {}
+    pairs = [(_text(k).lower(), _text(v) or "") for k, v in zip(value[0::2], value[1::2]) if k is not None]
+    # decode_params passes its first pair through untouched (it expects the content type there)
+    params = {}
+    for name, param in decode_params([("", "")] + pairs)[1:]:
+        if isinstance(param, tuple):
+            param = (param[0], param[1], unquote(param[2]))
+        params[name] = collapse_rfc2231_value(param)
+    return params
+
+def walk_bodystructure(structure: List, section: str = "") -> List[PartInfo]:
+    """Flatten a BODYSTRUCTURE tree into its leaf parts with IMAP section numbers."""
+    if structure and isinstance(structure[0], list):
+        parts = []
+        index = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            index += 1
+            parts.extend(walk_bodystructure(child, f"{section}.{index}" if section else str(index)))
+        return parts
+    params = _params(structure[2]) if len(structure) > 2 else {}
+    content_type = f"{_text(structure[0]) or 'text'}/{_text(structure[1]) or 'plain'}".lower()
+    # Extension data (disposition) follows the fixed fields, which are longer for text/* and message/rfc822
+    extension_at = 7
+    if content_type.startswith("text/"):
+        extension_at = 8
+    elif content_type == "message/rfc822":
+        extension_at = 10
+    disposition, disposition_params = None, {}
+    if len(structure) > extension_at + 1 and isinstance(structure[extension_at + 1], list):
+        disposition_field = structure[extension_at + 1]
+        disposition = (_text(disposition_field[0]) or "").lower() or None
+        disposition_params = _params(disposition_field[1]) if len(disposition_field) > 1 else {}
+    size = structure[6] if len(structure) > 6 else None
+    return [PartInfo(
+        section=section or "1",
+        content_type=content_type,
+        encoding=(_text(structure[5]) or "7bit").lower() if len(structure) > 5 else "7bit",
+        size=int(size) if isinstance(size, bytes) and size.isdigit() else 0,
+        filename=disposition_params.get("filename") or params.get("name"),
+        disposition=disposition,
+        charset=params.get("charset"),
+    )]
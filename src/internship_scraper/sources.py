@@ -0,0 +1,206 @@
+"""
+Offline message sources: mbox files, Maildir folders and ``.eml`` directories.
+
+Exported archives (Google Takeout mbox, Maildir backups) go through the same
+parsing, extraction and storage as a live IMAP session, without one.
+
+A source only yields ``MessageRef``s (file, offset, length), never message
+bytes. mbox boundaries are found by scanning a read-only memory map for
+``\\nFrom `` lines, so a multi-GB file is never loaded. ``process_archive``
+then hands chunks of refs to a process pool. Each worker reads its own slices,
+parses and extracts them, and writes attachments straight into the
+content-addressed store. Only small ``(EmailMessage, candidate)`` results come
+back, in archive order, for the CSV or database sink.
+"""
+import logging
+import mmap
+import os
+import re
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .extraction import extract_candidate
+from .imap import EmailMessage, parse_email
+from .metrics import metrics
+from .storage import AttachmentStore
+
+# mboxrd quoting: ">From " (and ">>From ", ...) lines in a body lose one ">"
+_FROM_QUOTED = re.compile(rb"^>(>*From )", re.MULTILINE)
+
+class MessageRef(NamedTuple):
+    """Where one message lives: ``length`` bytes at ``offset`` of ``path``."""
+    path: str
+    offset: int
+    length: int
+    key: str
+    mbox: bool = False
+    compressed: bool = False
+
+class MboxSource:
+    """Messages of an mbox file, split on ``From `` lines found in a memory map."""
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+
+    def __iter__(self) -> Iterator[MessageRef]:
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:5] != b"From ":
+                    raise ValueError(f"{self.path} is not an mbox file")
+                start = 0
+                while start < size:
+                    # Content starts after the "From sender date" line
+                    body = mm.find(b"\n", start) + 1 or size
+                    separator = mm.find(b"\nFrom ", body - 1)
+                    end = size if separator == -1 else separator
+                    yield MessageRef(self.path, body, max(end - body, 0), f"{os.path.basename(self.path)}:{start}", True)
+                    start = size if separator == -1 else separator + 1
+
+class MaildirSource:
+    """Messages of a Maildir folder (``cur`` and ``new``; ``tmp`` holds deliveries in progress)."""
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+
+    def __iter__(self) -> Iterator[MessageRef]:
+        for sub in ("cur", "new"):
+            folder = os.path.join(self.path, sub)
+            if not os.path.isdir(folder):
+                continue
+            for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+                if entry.is_file() and not entry.name.startswith("."):
+                    yield MessageRef(entry.path, 0, entry.stat().st_size, f"{sub}/{entry.name}")
+
+class EmlDirectorySource:
+    """Every ``*.eml`` file below a directory, in path order."""
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+
+    def __iter__(self) -> Iterator[MessageRef]:
+        for root, dirs, files in os.walk(self.path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(".eml"):
+                    path = os.path.join(root, name)
+                    yield MessageRef(path, 0, os.path.getsize(path), os.path.relpath(path, self.path))
+
+def open_source(path: str):
+    """Pick the source for ``path``: Maildir, ``.eml`` directory, single ``.eml`` file or mbox."""
+    if os.path.isdir(path):
+        if all(os.path.isdir(os.path.join(path, sub)) for sub in ("cur", "new")):
+            return MaildirSource(path)
+        return EmlDirectorySource(path)
+    if path.lower().endswith(".eml"):
+        size = os.path.getsize(path)
+        return [MessageRef(os.path.abspath(path), 0, size, os.path.basename(path))]
+    return MboxSource(path)
+
+def read_message(ref: MessageRef, f=None) -> bytes:
+    """Raw bytes of ``ref``; ``f`` is an already open binary file of ``ref.path``."""
+    if f is None:
+        with open(ref.path, 'rb') as f:
+            return read_message(ref, f)
+    raw = os.pread(f.fileno(), ref.length, ref.offset)
+    if ref.compressed:
+        raw = zlib.decompress(raw)
+    return _FROM_QUOTED.sub(rb"\1", raw) if ref.mbox else raw
+
+def process_refs(refs: List[MessageRef], code_map: Optional[Dict[str, str]] = None,
+                 store_root: Optional[str] = None, max_size: Optional[int] = None, extract: bool = True,
+                 attachments: bool = True):
+    """Parse, extract and store the attachments of ``refs``; runs in a pool worker.
+
+    Returns ``(msg, candidate)`` per ref (``(None, None)`` when the message
+    can't be parsed). Attachments end up in the store under ``store_root`` and
+    come back with ``path``/``sha256`` instead of their content; with
+    ``attachments=False`` they are dropped.
+    """
+    store = AttachmentStore(store_root) if store_root else None
+    results = []
+    files = {}
+    try:
+        for ref in refs:
+            try:
+                f = files.get(ref.path)
+                if f is None:
+                    f = files[ref.path] = open(ref.path, 'rb')
+                msg = parse_email(read_message(ref, f), uid=ref.key.encode())
+                candidate = extract_candidate(msg.subject, msg.body, msg.sender, code_map) if extract else None
+            except Exception as e:
+                logging.error(f"Failed to parse archived email {ref.key}: {e}")
+                results.append((None, None))
+                continue
+            if not attachments:
+                msg.attachments = []
+            for att in msg.attachments:
+                if not att.data:
+                    continue
+                if max_size is not None and len(att.data) > max_size:
+                    att.skipped = True
+                    logging.info(f"Skipping attachment {att.filename} of email {ref.key}: larger than {max_size} bytes")
+                elif store is not None and att.filename:
+                    blob = store.put(att.data, att.filename, att.content_type)
+                    att.path, att.sha256 = blob.path, blob.sha256
+                else:
+                    continue
+                att.data = None
+            results.append((msg, candidate))
+    finally:
+        for f in files.values():
+            f.close()
+    return results
+
+def _chunks(refs: Iterable[MessageRef], size: int) -> Iterator[List[MessageRef]]:
+    chunk = []
+    for ref in refs:
+        chunk.append(ref)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def process_archive(source: Iterable[MessageRef], workers: Optional[int] = None, chunk_size: int = 64,
+                    code_map: Optional[Dict[str, str]] = None, store_root: Optional[str] = None,
+                    max_size: Optional[int] = None, extract: bool = True,
+                    attachments: bool = True) -> Iterator[Tuple[EmailMessage, Optional[dict]]]:
+    """Yield ``(msg, candidate)`` for every parseable message of ``source``, in archive order.
+
+    ``workers`` processes (default: one per CPU) each take ``chunk_size``
+    messages at a time. At most two chunks per worker are in flight, so
+    memory stays bounded however far the sink falls behind. ``workers=1``
+    runs everything in this process.
+    """
+    workers = workers or os.cpu_count() or 1
+    code_map = dict(code_map) if code_map else None
+
+    def chunks():
+        for chunk in _chunks(source, chunk_size):
+            metrics.count("archive_bytes_read", sum(ref.length for ref in chunk))
+            yield chunk
+
+    def results(batch):
+        for msg, candidate in batch:
+            if msg is None:
+                metrics.count("archive_parse_errors")
+                continue
+            metrics.count("archive_messages")
+            yield msg, candidate
+
+    if workers == 1:
+        for chunk in chunks():
+            with metrics.timer("archive_chunk"):
+                batch = process_refs(chunk, code_map, store_root, max_size, extract, attachments)
+            yield from results(batch)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks():
+            pending.append(pool.submit(process_refs, chunk, code_map, store_root, max_size, extract, attachments))
+            if len(pending) >= workers * 2:
+                yield from results(pending.popleft().result())
+        while pending:
+            yield from results(pending.popleft().result())
@@ -0,0 +1,205 @@
+"""
+Local spool of fetched raw messages.
+
+Re-running extraction after a regex or code-map change used to mean marking
+mail unread and downloading it all again. With a ``MessageSpool`` attached,
+``IMAPClient`` keeps a zlib-compressed copy of every message it fetches,
+keyed by (account, folder, UIDVALIDITY, UID), and the spool can later be fed
+to ``sources.process_archive`` like any other archive.
+
+Messages from ``fetch_headers_many`` never have their attachments downloaded,
+so those are spooled as the headers plus the text part only (``partial``).
+That is all extraction reads, and a later full fetch replaces them.
+
+The index is a small SQLite file next to the blobs. When ``max_bytes`` is set,
+the least recently used messages are evicted once the compressed total
+exceeds it.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Iterator, List, NamedTuple, Optional
+
+from .metrics import metrics
+from .sources import MessageRef
+
+INDEX_NAME = "index.sqlite"
+COMPRESSION_LEVEL = 6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    account TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    uid INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    raw_size INTEGER NOT NULL,
+    partial INTEGER NOT NULL DEFAULT 0,
+    stored_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (account, folder, uidvalidity, uid)
+);
+CREATE INDEX IF NOT EXISTS messages_lru ON messages (last_access);
+"""
+
+class SpoolEntry(NamedTuple):
+    account: str
+    folder: str
+    uidvalidity: int
+    uid: int
+    path: str
+    size: int
+    raw_size: int
+    partial: bool
+
+class MessageSpool:
+    """Compressed raw messages under ``root`` with an LRU-evicted size budget."""
+    def __init__(self, root: str, max_bytes: Optional[int] = None):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.root, INDEX_NAME), timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        # Running total, so a put only scans the index when the budget looks exceeded
+        self._total = self.total_bytes
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _relpath(self, account: str, folder: str, uidvalidity: int, uid: int) -> str:
+        mailbox = hashlib.sha1(f"{account}/{folder}".encode()).hexdigest()[:16]
+        return os.path.join(mailbox, str(uidvalidity), f"{uid}.eml.z")
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM messages").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def entry(self, account: str, folder: str, uidvalidity: Optional[int], uid) -> Optional[SpoolEntry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT account, folder, uidvalidity, uid, path, size, raw_size, partial FROM messages "
+                "WHERE account = ? AND folder = ? AND uidvalidity = ? AND uid = ?",
+                (account, folder, uidvalidity or 0, int(uid))).fetchone()
+        return SpoolEntry(*row[:7], bool(row[7])) if row else None
+
+    def put(self, account: str, folder: str, uidvalidity: Optional[int], uid, raw: bytes,
+            partial: bool = False) -> bool:
+        """Spool ``raw``; returns False when an equally complete copy is already there."""
+        uidvalidity, uid = uidvalidity or 0, int(uid)
+        existing = self.entry(account, folder, uidvalidity, uid)
+        if existing is not None and (partial or not existing.partial):
+            return False
+        relpath = self._relpath(account, folder, uidvalidity, uid)
+        path = os.path.join(self.root, relpath)
+        with metrics.timer("spool_write"):
+            data = zlib.compress(raw, COMPRESSION_LEVEL)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".incoming-")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            now = time.time()
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (account, folder, uidvalidity, uid, relpath, len(data), len(raw), int(partial), now, now))
+                self._total += len(data) - (existing.size if existing else 0)
+        metrics.count("spool_bytes_written", len(data))
+        if self.max_bytes is not None and self._total > self.max_bytes:
+            # Down to 90% so the next few puts don't each pay for an eviction scan
+            self.evict(self.max_bytes * 9 // 10)
+        return True
+
+    def get(self, account: str, folder: str, uidvalidity: Optional[int], uid) -> Optional[bytes]:
+        """The spooled raw message, or None; marks it as recently used."""
+        entry = self.entry(account, folder, uidvalidity, uid)
+        if entry is None:
+            return None
+        try:
+            with open(os.path.join(self.root, entry.path), 'rb') as f:
+                raw = zlib.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            logging.warning(f"Dropping unreadable spooled email {uid}: {e}")
+            self._delete([entry])
+            return None
+        with self._lock:
+            self._db.execute("UPDATE messages SET last_access = ? WHERE account = ? AND folder = ? "
+                             "AND uidvalidity = ? AND uid = ?", (time.time(), *entry[:4]))
+        return raw
+
+    def entries(self, account: Optional[str] = None, folder: Optional[str] = None) -> List[SpoolEntry]:
+        """Index entries in (account, folder, UIDVALIDITY, UID) order."""
+        query = "SELECT account, folder, uidvalidity, uid, path, size, raw_size, partial FROM messages"
+        filters, params = [], []
+        if account is not None:
+            filters.append("account = ?")
+            params.append(account)
+        if folder is not None:
+            filters.append("folder = ?")
+            params.append(folder)
+        if filters:
+            query += " WHERE " + " AND ".join(filters)
+        query += " ORDER BY account, folder, uidvalidity, uid"
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [SpoolEntry(*row[:7], bool(row[7])) for row in rows]
+
+    def refs(self, account: Optional[str] = None, folder: Optional[str] = None) -> Iterator[MessageRef]:
+        """``MessageRef``s over the spool, for ``sources.process_archive``."""
+        for entry in self.entries(account, folder):
+            key = f"{entry.account}/{entry.folder}/{entry.uidvalidity}/{entry.uid}"
+            yield MessageRef(os.path.join(self.root, entry.path), 0, entry.size, key, compressed=True)
+
+    def __iter__(self) -> Iterator[MessageRef]:
+        return self.refs()
+
+    def evict(self, max_bytes: int) -> int:
+        """Delete least recently used messages until at most ``max_bytes`` are spooled; returns how many."""
+        with self._lock:
+            # Other processes may share the spool: trust the index, not the running total
+            total = self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM messages").fetchone()[0]
+            if total <= max_bytes:
+                return 0
+            victims = []
+            for row in self._db.execute(
+                    "SELECT account, folder, uidvalidity, uid, path, size, raw_size, partial FROM messages "
+                    "ORDER BY last_access, stored_at"):
+                victims.append(SpoolEntry(*row[:7], bool(row[7])))
+                total -= row[5]
+                if total <= max_bytes:
+                    break
+        self._delete(victims)
+        metrics.count("spool_evictions", len(victims))
+        return len(victims)
+
+    def _delete(self, entries: List[SpoolEntry]):
+        with self._lock:
+            self._db.executemany("DELETE FROM messages WHERE account = ? AND folder = ? AND uidvalidity = ? AND uid = ?",
+                                 [entry[:4] for entry in entries])
+            self._total -= sum(entry.size for entry in entries)
+        for entry in entries:
+            try:
+                os.unlink(os.path.join(self.root, entry.path))
+            except FileNotFoundError:
+                pass
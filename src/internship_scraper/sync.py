@@ -0,0 +1,104 @@
+"""
+Incremental UID sync.
+
+A checkpoint stores the folder's UIDVALIDITY and the highest UID already
+processed, so each run only asks the server for ``UID n+1:*`` instead of
+scanning for UNSEEN mail. When the server reports a different UIDVALIDITY the
+old UIDs are meaningless and the folder is resynced from the start.
+
+``plan_sync`` registers the UIDs of the run with the checkpoint. From then
+on ``advance`` only moves ``last_uid`` over the lowest UIDs that are all
+settled, so a message whose FETCH failed or that could not be parsed holds
+the checkpoint below it and is fetched again by the next run.
+"""
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Set
+
+from .imap import IMAPClient
+
+class SyncCheckpoint:
+    """UIDVALIDITY and highest processed UID for one account/folder."""
+    def __init__(self, uidvalidity: Optional[int] = None, last_uid: int = 0):
+        self.uidvalidity = uidvalidity
+        self.last_uid = last_uid
+        # UIDs of the current run in order, and how many of them are settled from the start
+        self._planned: Optional[List[int]] = None
+        self._settled: Set[int] = set()
+        self._next = 0
+
+    def expect(self, uids: Iterable):
+        """Register the UIDs this run has to settle before the checkpoint may pass them."""
+        self._planned = sorted({int(uid) for uid in uids})
+        self._settled = set()
+        self._next = 0
+
+    def advance(self, uid):
+        """Record ``uid`` as processed (written, or skipped on purpose).
+
+        Without ``expect`` this is a plain high-water mark. With it,
+        ``last_uid`` only moves over the contiguous prefix of settled UIDs.
+        """
+        if self._planned is None:
+            self.last_uid = max(self.last_uid, int(uid))
+            return
+        self._settled.add(int(uid))
+        while self._next < len(self._planned) and self._planned[self._next] in self._settled:
+            self.last_uid = max(self.last_uid, self._planned[self._next])
+            self._next += 1
+
+    def to_dict(self) -> Dict:
+        return {"uidvalidity": self.uidvalidity, "last_uid": self.last_uid}
+
+def checkpoint_key(server: str, user: str, folder: str) -> str:
+    """Key identifying one account/folder pair, e.g. ``jane@example.com@imap.gmail.com/INBOX``."""
+    return f"{user}@{server}/{folder}"
+
+def plan_sync(client: IMAPClient, checkpoint: SyncCheckpoint) -> List[bytes]:
+    """Return the UIDs to process for ``checkpoint`` on a connected client.
+
+    On a UIDVALIDITY change (or the first run) the checkpoint is reset and
+    every message in the folder is returned.
+    """
+    if checkpoint.uidvalidity != client.uidvalidity:
+        if checkpoint.uidvalidity is not None:
+            logging.warning(
+                f"UIDVALIDITY changed for {client.folder} "
+                f"({checkpoint.uidvalidity} -> {client.uidvalidity}); running full resync"
+            )
+        checkpoint.uidvalidity = client.uidvalidity
+        checkpoint.last_uid = 0
+    uids = client.search_after(checkpoint.last_uid)
+    checkpoint.expect(uids)
+    logging.info(f"Sync: {len(uids)} new messages after UID {checkpoint.last_uid}")
+    return uids
+
+class StateFile:
+    """Small JSON file holding sync checkpoints keyed by account/folder."""
+    def __init__(self, path: str):
+        self.path = path
+
+    def _read(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable sync state {self.path}: {e}")
+            return {}
+
+    def load(self, key: str) -> SyncCheckpoint:
+        """Return the stored checkpoint for ``key``, or an empty one."""
+        data = self._read().get(key, {})
+        return SyncCheckpoint(data.get("uidvalidity"), data.get("last_uid", 0))
+
+    def save(self, key: str, checkpoint: SyncCheckpoint):
+        """Persist ``checkpoint`` atomically, keeping other keys intact."""
+        state = self._read()
+        state[key] = checkpoint.to_dict()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,540 @@
+import csv
+import time
+import pytest
+from email.message import EmailMessage as MIMEMessage
+from src.internship_scraper.imap import IMAPClient, uid_set, iter_fetch_response
+from src.internship_scraper.testing import fetch_response
+
+def build_raw(subject, body, attachment=None):
+    msg = MIMEMessage()
+    msg["Subject"] = subject
+    msg["From"] = "Jane Doe <jane@example.com>"
+    msg.set_content(body)
+    if attachment:
+        msg.add_attachment(attachment, maintype="application", subtype="pdf", filename="cv.pdf")
+    return msg.as_bytes()
+
+class FakeConnection:
+    """Minimal stand-in for imaplib.IMAP4 answering UID commands from a dict."""
+    def __init__(self, messages):
+        self.messages = messages
+        self.commands = []
+
+    def uid(self, command, *args):
+        self.commands.append((command, args))
+        if command == "SEARCH":
+            return "OK", [b" ".join(str(uid).encode() for uid in sorted(self.messages))]
+        if command == "FETCH":
+            data = []
+            for uid in expand_set(args[0]):
+                if uid in self.messages:
+                    data.extend(fetch_response(uid, self.messages[uid], args[1]))
+            return "OK", data
+        return "OK", [None]
+
+def expand_set(sequence_set):
+    if isinstance(sequence_set, bytes):
+        sequence_set = sequence_set.decode()
+    uids = []
+    for item in sequence_set.split(","):
+        start, _, end = item.partition(":")
+        uids.extend(range(int(start), int(end or start) + 1))
+    return uids
+
+def make_client(messages):
+    client = IMAPClient("imap.example.com", "user", "pass")
+    client.connection = FakeConnection(messages)
+    return client
+
+def test_uid_set_compresses_ranges():
+    assert uid_set([b"3", b"1", b"2", b"7", b"9", b"10"]) == "1:3,7,9:10"
+    assert uid_set([5]) == "5"
+
+def test_iter_fetch_response_reads_trailing_uid():
+    data = [(b"1 (RFC822 {3}", b"abc"), b" UID 42)"]
+    assert list(iter_fetch_response(data)) == [(b"42", b"abc")]
+
+def test_fetch_many_batches_round_trips():
+    messages = {uid: build_raw(f"Subject {uid}", f"Body {uid}") for uid in range(1, 11)}
+    client = make_client(messages)
+    fetched = list(client.fetch_many(client.search(), batch_size=4))
+    assert [m.uid for m in fetched] == [str(uid).encode() for uid in range(1, 11)]
+    assert fetched[0].subject == "Subject 1"
+    fetch_commands = [args for command, args in client.connection.commands if command == "FETCH"]
+    assert [args[0] for args in fetch_commands] == ["1:4", "5:8", "9:10"]
+
+def test_fetch_many_parses_attachments():
+    client = make_client({7: build_raw("With CV", "Hello", attachment=b"%PDF-1.4")})
+    [msg] = client.fetch_many([b"7"])
+    assert msg.body.strip() == "Hello"
+    assert msg.attachments[0].filename == "cv.pdf"
+    assert msg.attachments[0].data == b"%PDF-1.4"
+
+def test_parse_email_decodes_lazily_and_pickles():
+    import pickle
+    from src.internship_scraper.imap import parse_email
+    msg = parse_email(build_raw("Internship Application - Jane", "Résumé attached", attachment=b"%PDF-1.4"), uid=b"3")
+    assert not hasattr(msg, "__dict__")
+    assert msg.subject == "Internship Application - Jane"
+    assert msg._body is msg._attachments  # headers only, body untouched
+    assert msg.body.strip() == "Résumé attached"
+    assert msg._raw is None
+    [att] = msg.attachments
+    assert att._data is None and att.filename == "cv.pdf"  # payload decoded on first access
+    copy = pickle.loads(pickle.dumps(msg))
+    assert (copy.uid, copy.sender, copy.attachments[0].data) == (b"3", "Jane Doe <jane@example.com>", b"%PDF-1.4")
+
+def test_plan_sync_fetches_only_new_uids_and_resyncs_on_uidvalidity_change(tmp_path):
+    from src.internship_scraper.sync import StateFile, SyncCheckpoint, plan_sync
+    client = make_client({uid: build_raw(f"S{uid}", "B") for uid in (3, 5, 9)})
+    client.uidvalidity = 100
+    checkpoint = SyncCheckpoint(uidvalidity=100, last_uid=5)
+    assert plan_sync(client, checkpoint) == [b"9"]
+    assert client.connection.commands[-1] == ("SEARCH", (None, "UID 6:*"))
+
+    client.uidvalidity = 200
+    assert plan_sync(client, checkpoint) == [b"3", b"5", b"9"]
+    assert checkpoint.uidvalidity == 200 and checkpoint.last_uid == 0
+
+    state = StateFile(str(tmp_path / "state.json"))
+    checkpoint.advance(b"9")
+    # 3 and 5 are still pending: the checkpoint may not pass them yet
+    assert checkpoint.last_uid == 0
+    checkpoint.advance(b"3")
+    checkpoint.advance(b"5")
+    state.save("jane@imap/INBOX", checkpoint)
+    assert state.load("jane@imap/INBOX").to_dict() == {"uidvalidity": 200, "last_uid": 9}
+
+def test_sync_checkpoint_stays_below_a_failed_fetch_batch():
+    from src.internship_scraper.imap_server import IMAPStandIn
+    from src.internship_scraper.sync import SyncCheckpoint, plan_sync
+    with IMAPStandIn([build_raw(f"S{uid}", "B") for uid in range(1, 7)]) as server:
+        client = server.client()
+        client.connect()
+        checkpoint = SyncCheckpoint()
+        uids = plan_sync(client, checkpoint)
+        server.fail_next("UID FETCH")
+        fetched = [msg.uid for msg in client.fetch_many(uids, batch_size=2)]
+        for uid in fetched:
+            checkpoint.advance(uid)
+        assert fetched == [b"3", b"4", b"5", b"6"] and checkpoint.last_uid == 0
+        assert plan_sync(client, checkpoint) == [b"1", b"2", b"3", b"4", b"5", b"6"]
+        client.logout()
+
+def test_rejected_uids_do_not_move_the_checkpoint_past_a_failed_header_batch():
+    from src.internship_scraper.classify import select_applications
+    from src.internship_scraper.imap_server import IMAPStandIn
+    from src.internship_scraper.sync import SyncCheckpoint, plan_sync
+    # SEARCH SUBJECT matches them all, so each needs the header pass, which then rejects it
+    with IMAPStandIn([build_raw(f"Internship Application newsletter {uid}", "B") for uid in range(1, 5)]) as server:
+        client = server.client()
+        client.connect()
+        checkpoint = SyncCheckpoint()
+        uids = plan_sync(client, checkpoint)
+        selection = select_applications(client, uids, "ALL", batch_size=2)
+        assert selection.uids == [] and selection.rejected == [b"1", b"2", b"3", b"4"]
+        checkpoint = SyncCheckpoint()
+        uids = plan_sync(client, checkpoint)
+        server.fail_next("UID FETCH")
+        selection = select_applications(client, uids, "ALL", batch_size=2)
+        assert selection.rejected == [b"3", b"4"]
+        for uid in selection.rejected:
+            checkpoint.advance(uid)
+        assert checkpoint.last_uid == 0 and plan_sync(client, checkpoint) == uids
+        client.logout()
+
+def test_headers_first_path_decodes_rfc2231_filenames():
+    from src.internship_scraper.imap import parse_email
+    from src.internship_scraper.response import walk_bodystructure
+    msg = MIMEMessage()
+    msg["Subject"] = "Internship Application – PY – Jérôme"
+    msg.set_content("Name: Jérôme")
+    msg.add_attachment(b"%PDF-1.4", maintype="application", subtype="pdf", filename="CV Jérôme Çelik.pdf")
+    raw = msg.as_bytes()
+    assert b"filename*=utf-8''" in raw
+    [summary] = make_client({1: raw}).fetch_headers_many([b"1"])
+    assert [att.filename for att in summary.attachments] == [att.filename for att in parse_email(raw).attachments]
+    assert summary.attachments[0].filename == "CV Jérôme Çelik.pdf"
+    # Long values come split into continuations
+    part = walk_bodystructure([b"APPLICATION", b"PDF", None, None, None, b"BASE64", b"12", None,
+                               [b"ATTACHMENT", [b"FILENAME*0*", b"utf-8''CV%20J%C3%A9", b"FILENAME*1*", b"r%C3%B4me.pdf"]]])[0]
+    assert part.filename == "CV Jérôme.pdf"
+
+def test_fetch_headers_many_defers_attachment_download():
+    client = make_client({
+        1: build_raw("Internship Application – PY – Jane", "Name: Jane", attachment=b"%PDF" * 1000),
+        2: build_raw("Plain", "Just text"),
+    })
+    messages = list(client.fetch_headers_many([b"1", b"2"]))
+    assert [m.subject for m in messages] == ["Internship Application – PY – Jane", "Plain"]
+    assert [m.body.strip() for m in messages] == ["Name: Jane", "Just text"]
+    [att] = messages[0].attachments
+    assert (att.filename, att.data, att.section) == ("cv.pdf", None, "2")
+    fetched_items = " ".join(args[1] for command, args in client.connection.commands if command == "FETCH")
+    assert "RFC822" not in fetched_items and "BODY.PEEK[2]" not in fetched_items
+
+    client.fetch_attachments(messages[0])
+    assert att.data == b"%PDF" * 1000
+
+def test_connection_pool_merges_batches_in_uid_order():
+    from src.internship_scraper.pool import IMAPConnectionPool
+    messages = {uid: build_raw(f"S{uid}", "B") for uid in range(1, 51)}
+
+    class SlowConnection(FakeConnection):
+        def uid(self, command, *args):
+            time.sleep(0.01)
+            return super().uid(command, *args)
+
+    class FakeClient(IMAPClient):
+        def connect(self):
+            self.connection = SlowConnection(messages)
+
+    pool = IMAPConnectionPool("imap.gmail.com", "u", "p", size=40, client_factory=FakeClient)
+    assert pool.size == 15
+    pool.size = 4
+    pool.connect()
+    fetched = [m.uid for m in pool.fetch_many(pool.search("ALL"), batch_size=5)]
+    assert fetched == [str(uid).encode() for uid in range(1, 51)]
+    assert 1 < len(pool.clients) <= 4
+    pool.logout()
+
+def test_async_client_pipelines_fetch_batches():
+    import asyncio
+    from src.internship_scraper.aio import AsyncIMAPClient
+    from src.internship_scraper.testing import wire_fetch
+    messages = {uid: build_raw(f"S{uid}", f"Body {uid}") for uid in range(1, 8)}
+    received = []
+
+    async def handle(reader, writer):
+        writer.write(b"* OK ready\r\n")
+        while line := await reader.readline():
+            tag, command = line.split(b" ", 1)
+            command = command.strip().decode()
+            received.append(command)
+            if command.startswith("SELECT"):
+                # Lowercase response types and an unknown line (with a literal) must not break the reader
+                writer.write(b"* 7 exists\r\n* ok [uidvalidity 42] UIDs valid\r\n* 3 fetch (FLAGS (\\Seen))\r\n"
+                             b"* ?? {3}\r\nabc\r\n")
+            elif command.startswith("UID SEARCH"):
+                writer.write(b"* SEARCH " + b" ".join(str(uid).encode() for uid in messages) + b"\r\n")
+            elif command.startswith("UID FETCH"):
+                _, _, uids, items = command.split(" ", 3)
+                for uid in expand_set(uids):
+                    writer.write(wire_fetch(fetch_response(uid, messages[uid], items)))
+            writer.write(tag + b" OK done\r\n")
+            if command == "LOGOUT":
+                break
+        writer.close()
+
+    async def scenario():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = AsyncIMAPClient("127.0.0.1", "u", "p", port=port, use_ssl=False)
+        await client.connect()
+        uids = await client.search("ALL")
+        fetched = [msg async for msg in client.fetch_many(uids, batch_size=3)]
+        single = await client.fetch_email(b"5")
+        await client.logout()
+        server.close()
+        return client, fetched, single
+
+    client, fetched, single = asyncio.run(scenario())
+    assert client.uidvalidity == 42
+    assert [m.subject for m in fetched] == [f"S{uid}" for uid in range(1, 8)]
+    assert single.body.strip() == "Body 5"
+    assert [c for c in received if c.startswith("UID FETCH")][:3] == [
+        "UID FETCH 1:3 (UID BODY.PEEK[])", "UID FETCH 4:6 (UID BODY.PEEK[])", "UID FETCH 7 (UID BODY.PEEK[])"]
+
+def test_async_client_default_port_follows_ssl():
+    from src.internship_scraper.aio import AsyncIMAPClient
+    assert AsyncIMAPClient("imap.example.com", "u", "p").port == 993
+    assert AsyncIMAPClient("imap.example.com", "u", "p", use_ssl=False).port == 143
+    assert AsyncIMAPClient("imap.example.com", "u", "p", port=1143, use_ssl=False).port == 1143
+
+def test_iter_emails_streams_rows_before_marking_read(tmp_path):
+    from src.internship_scraper.cli import stream_to_csv
+    messages = {uid: build_raw(f"S{uid}", "x" * 3000, attachment=b"%PDF-1.4" if uid == 1 else None) for uid in range(1, 6)}
+    client = make_client(messages)
+    csv_path = tmp_path / "emails.csv"
+    rows_on_disk = []
+
+    def on_durable(msg):
+        with open(csv_path, newline="") as f:
+            rows_on_disk.append(len(list(csv.DictReader(f))))
+        client.mark_read(msg.uid)
+
+    count = stream_to_csv(client.iter_emails("ALL", max_batch_bytes=7000), str(csv_path), str(tmp_path / "att"), on_durable)
+    assert count == 5 and rows_on_disk == [1, 2, 3, 4, 5]
+    with open(csv_path, newline="") as f:
+        filename, path = next(csv.DictReader(f))["attachments"].split("=", 1)
+    assert filename == "cv.pdf" and open(path, "rb").read() == b"%PDF-1.4"
+    fetches = [args[0] for command, args in client.connection.commands if command == "FETCH" and "PEEK" in args[1]]
+    assert fetches == ["1:2", "3:4", "5"]
+
+def test_candidate_extractor_single_pass_matches_first_occurrence():
+    from src.internship_scraper.extraction import CandidateExtractor, extract_candidate
+    body = "Internship Code: PY\nname: Jane Doe\nPhone: +216 20 000 000\nLinkedInternship: Data\nName: Other\nPortfolio: https://jane.dev"
+    candidate = extract_candidate("Internship Application – PY – Jane D", body, "Jane <jane@example.com>", {"PY": "Python"})
+    assert candidate["name"] == "Jane D" and candidate["internship"] == "Python"
+    assert candidate["phone"] == "+216 20 000 000" and candidate["email"] == "jane@example.com"
+    # As with a separate re.search per field, "Internship" also matches at "Internship Code"
+    assert CandidateExtractor().scan(body)["internship"] == "Code"
+    extractor = CandidateExtractor([("portfolio", "Portfolio", r"https?://\S+")])
+    assert extractor.parse_candidate(body, "jane@example.com")["portfolio"] == "https://jane.dev"
+
+def test_classifier_and_extractor_agree_on_subject_case():
+    from src.internship_scraper.classify import DEFAULT_RULES
+    from src.internship_scraper.extraction import extract_candidate
+    subject = "internship application – py – Jane D"
+    assert DEFAULT_RULES.subject_ok(subject)
+    candidate = extract_candidate(subject, "", "jane@example.com", {"PY": "Python"})
+    assert candidate["name"] == "Jane D" and candidate["internship"] == "Python"
+
+def test_flag_buffer_marks_read_with_one_silent_store_per_batch():
+    from src.internship_scraper.flags import FlagBuffer
+    client = make_client({uid: build_raw(f"S{uid}", "x") for uid in range(1, 8)})
+    flags = FlagBuffer(client, batch_size=3)
+    for msg in client.fetch_many(client.search("ALL")):
+        flags.add(msg.uid)
+    flags.flush()
+    stores = [args for command, args in client.connection.commands if command == "STORE"]
+    assert stores == [("1:3", "+FLAGS.SILENT", "(\\Seen)"), ("4:6", "+FLAGS.SILENT", "(\\Seen)"),
+                      ("7", "+FLAGS.SILENT", "(\\Seen)")]
+    assert len(flags) == 0 and flags.flushes == 3
+
+def test_attachment_store_deduplicates_by_content(tmp_path):
+    import io, os
+    from src.internship_scraper.storage import AttachmentStore
+    store = AttachmentStore(str(tmp_path))
+    first = store.put(b"%PDF cv", "resume.pdf")
+    again = store.put(io.BytesIO(b"%PDF cv"), "cv-copy.pdf")
+    other = store.put(b"%PDF other", "resume.pdf")
+    assert first.created and not again.created and other.created
+    assert first.path == again.path != other.path
+    assert first.path == os.path.join(str(tmp_path), first.sha256[:2], first.sha256[2:4], first.sha256)
+    assert first.content_type == "application/pdf" and first.size == 7
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith(".")) == []
+
+def test_fetch_attachments_streams_chunks_into_store(tmp_path):
+    import hashlib
+    from src.internship_scraper.storage import AttachmentStore, store_attachments
+    pdf = bytes(range(256)) * 200
+    client = make_client({1: build_raw("With CV", "Name: Jane", attachment=pdf)})
+    [msg] = client.fetch_headers_many([b"1"])
+    store = AttachmentStore(str(tmp_path))
+    client.fetch_attachments(msg, store=store, chunk_size=4096)
+    [att] = msg.attachments
+    assert att.data is None and att.sha256 == hashlib.sha256(pdf).hexdigest()
+    with att.open() as f:
+        assert f.read() == pdf
+    partial = [args[1] for command, args in client.connection.commands if command == "FETCH" and "<" in args[1]]
+    assert partial[0] == "(UID BODY.PEEK[2]<0.4096>)" and partial[1] == "(UID BODY.PEEK[2]<4096.4096>)"
+    assert len(partial) == -(-att.size // 4096)
+    [blob] = store_attachments(msg.attachments, store)
+    assert blob.path == att.path and not blob.created
+
+    [small] = make_client({1: build_raw("With CV", "Name: Jane", attachment=pdf)}).fetch_headers_many([b"1"])
+    client.fetch_attachments(small, max_size=len(pdf) // 2)
+    assert small.attachments[0].skipped and not small.attachments[0].loaded
+
+def test_stand_in_server_over_tls_serves_client_end_to_end(tmp_path):
+    import socket
+    from functools import partial
+    from src.internship_scraper.imap_server import IMAPStandIn
+    from src.internship_scraper.pool import IMAPConnectionPool
+    from src.internship_scraper.imap import AttachmentFetchError, PartReader, attachments_complete
+    from src.internship_scraper.storage import AttachmentStore
+    pdf = bytes(range(256)) * 64
+    messages = [build_raw(f"Application {i}", f"Name: Jane {i}", attachment=pdf if i % 2 else None) for i in range(1, 7)]
+    with IMAPStandIn(messages, tls=True, max_connections=2) as server:
+        client = server.client()
+        client.connect()
+        assert client.uidvalidity == 1 and client.search() == [str(i).encode() for i in range(1, 7)]
+        assert client.search('SUBJECT "Application 3"') == [b"3"]
+        [msg] = client.fetch_headers_many([b"1"])
+        client.fetch_attachments(msg, store=AttachmentStore(str(tmp_path)), chunk_size=4096)
+        with msg.attachments[0].open() as f:
+            assert f.read() == pdf
+        # A refused FETCH leaves the part unloaded instead of storing an empty blob; a retry completes it
+        [msg] = client.fetch_headers_many([b"3"])
+        server.fail_next("UID FETCH")
+        client.fetch_attachments(msg, store=AttachmentStore(str(tmp_path)), chunk_size=4096)
+        assert not attachments_complete(msg) and msg.attachments[0].path is None
+        client.fetch_attachments(msg, store=AttachmentStore(str(tmp_path)), chunk_size=4096)
+        assert attachments_complete(msg) and open(msg.attachments[0].path, "rb").read() == pdf
+        att = msg.attachments[0]
+        reader = PartReader(client.connection, b"3", att.section, att.encoding, chunk_size=4096, size=att.size)
+        assert reader.read()
+        server.fail_next("UID FETCH")
+        with pytest.raises(AttachmentFetchError):
+            reader.read()
+        short = PartReader(client.connection, b"3", att.section, att.encoding, chunk_size=4096, size=att.size + 1)
+        with pytest.raises(AttachmentFetchError):
+            b"".join(iter(short.read, b""))
+        assert [m.subject for m in client.fetch_many([b"2", b"3"])] == ["Application 2", "Application 3"]
+        # Peeking fetches leave messages unread until they are marked
+        assert client.mark_read_many([b"1", b"2"]) and client.search() == [b"3", b"4", b"5", b"6"]
+        server.fail_next("UID STORE")
+        assert not client.mark_read_many([b"3"]) and client.search() == [b"3", b"4", b"5", b"6"]
+        server.fail_next("UID SEARCH")
+        assert client.search() == [] and client.search() == [b"3", b"4", b"5", b"6"]
+
+        # A third session is refused like over a provider's connection cap; the pool keeps going with two
+        pool = IMAPConnectionPool("127.0.0.1", server.user, server.password, size=4,
+                                  client_factory=partial(type(client), **server.client_options()))
+        pool.connect()
+        assert len(list(pool.fetch_many(pool.search("ALL"), batch_size=1))) == 6 and len(pool.clients) <= 2
+        pool.logout()
+        client.logout()
+
+    with IMAPStandIn(messages[:1]) as server:
+        with socket.create_connection((server.host, server.port)) as sock, sock.makefile("rwb", buffering=0) as f:
+            f.readline()
+            f.write(b"a LOGIN user password\r\nb SELECT INBOX\r\n")
+            while not f.readline().startswith(b"b OK"):
+                pass
+            f.write(b"c IDLE\r\n")
+            assert f.readline().startswith(b"+")
+            server.append(messages[1])
+            assert f.readline() == b"* 2 EXISTS\r\n"
+            f.write(b"DONE\r\n")
+            assert f.readline() == b"c OK IDLE terminated\r\n"
+
+def test_metrics_time_pipeline_stages_only_when_enabled(tmp_path):
+    from src.internship_scraper.extraction import extract_candidate
+    from src.internship_scraper.metrics import metrics
+    from src.internship_scraper.storage import AttachmentStore, store_attachments
+    messages = {uid: build_raw(f"Internship Application – PY – Jane {uid}", "Phone: +216 1", attachment=b"%PDF-1.4")
+                for uid in range(1, 6)}
+    was_enabled = metrics.enabled
+    try:
+        metrics.enabled = False
+        metrics.reset()
+        list(make_client(messages).fetch_many([b"1", b"2"]))
+        assert metrics.snapshot()["stages"] == {} and metrics.snapshot()["counters"] == {}
+
+        metrics.enabled = True
+        client = make_client(messages)
+        store = AttachmentStore(str(tmp_path))
+        for msg in client.fetch_many(client.search(), batch_size=2):
+            extract_candidate(msg.subject, msg.body, msg.sender)
+            store_attachments(msg.attachments, store)
+        data = metrics.snapshot()
+        assert data["stages"]["imap_fetch"]["calls"] == 3 and data["stages"]["imap_search"]["calls"] == 1
+        assert data["stages"]["parse"]["calls"] == data["stages"]["extract"]["calls"] == 5
+        assert data["stages"]["attachment_store"]["calls"] == 5
+        counters = data["counters"]
+        assert counters["messages_fetched"] == counters["messages_parsed"] == 5
+        # Only a MIME parse counts, not wrapping a message or reading its headers
+        from src.internship_scraper.imap import parse_email
+        assert parse_email(messages[1]).subject and metrics.snapshot()["counters"]["messages_parsed"] == 5
+        assert counters["imap_bytes_received"] > sum(len(raw) for raw in messages.values())
+        assert counters["attachment_bytes_written"] == 8 and counters["attachments_deduplicated"] == 4
+
+        text = metrics.render_prometheus()
+        assert '# TYPE internship_scraper_stage_seconds_total counter' in text
+        assert 'internship_scraper_stage_calls_total{stage="parse"} 5' in text
+        assert 'internship_scraper_messages_parsed_total 5' in text
+        summary = metrics.summary(elapsed=1.0)
+        assert "5.0 messages/s" in summary and "MB/s received" in summary
+    finally:
+        metrics.enabled = was_enabled
+        metrics.reset()
+
+def test_archive_sources_feed_the_same_pipeline(tmp_path):
+    import mailbox
+    from src.internship_scraper.sources import MaildirSource, MboxSource, open_source, process_archive
+    raws = [build_raw(f"Internship Application – PY – Jane {i}", f"Hello\nFrom the team of {i}\nPhone: +216 {i}",
+                      attachment=b"%PDF-1.4 " + bytes([i])) for i in range(5)]
+    box = mailbox.mbox(str(tmp_path / "takeout.mbox"))
+    for raw in raws:
+        box.add(raw)  # escapes the body's "From " line as ">From "
+    box.close()
+    maildir = mailbox.Maildir(str(tmp_path / "backup"))
+    for raw in raws:
+        maildir.add(raw)
+    (tmp_path / "eml" / "2024").mkdir(parents=True)
+    for i, raw in enumerate(raws):
+        (tmp_path / "eml" / "2024" / f"{i}.eml").write_bytes(raw)
+
+    assert isinstance(open_source(str(tmp_path / "takeout.mbox")), MboxSource)
+    assert isinstance(open_source(str(tmp_path / "backup")), MaildirSource)
+    for path, workers in (("takeout.mbox", 1), ("takeout.mbox", 2), ("backup", 2), ("eml", 1)):
+        results = list(process_archive(open_source(str(tmp_path / path)), workers=workers, chunk_size=2,
+                                       store_root=str(tmp_path / "store"), code_map={"PY": "Python Developer"}))
+        if path != "backup":
+            # Maildir file names carry no order, the other sources keep the archive's
+            assert [msg.subject for msg, _ in results] == [f"Internship Application – PY – Jane {i}" for i in range(5)]
+        assert sorted(candidate["phone"] for _, candidate in results) == [f"+216 {i}" for i in range(5)]
+        assert all(candidate["internship"] == "Python Developer" for _, candidate in results)
+        assert all("\nFrom the team of" in msg.body for msg, _ in results)
+        for msg, _ in results:
+            att, = msg.attachments
+            assert att.data is None and open(att.path, "rb").read().startswith(b"%PDF-1.4 ")
+
+def test_spool_keeps_fetched_messages_for_reprocessing(tmp_path):
+    from src.internship_scraper.extraction import CandidateExtractor
+    from src.internship_scraper.sources import process_archive
+    from src.internship_scraper.spool import MessageSpool
+    messages = {
+        1: build_raw("Internship Application – PY – Jane", "Name: Jane\nSchool: ENIT", attachment=b"%PDF" * 1000),
+        2: build_raw("Internship Application – ML – Omar", "Name: Omar\nSchool: INSAT"),
+        3: build_raw("Internship Application – WD – Lea", "Name: Lea\nSchool: ESPRIT"),
+    }
+    spool = MessageSpool(str(tmp_path / "spool"))
+    client = make_client(messages)
+    client.uidvalidity = 7
+    client.spool = spool
+    list(client.fetch_headers_many([b"1", b"2"]))
+    assert [(e.uid, e.partial) for e in spool.entries()] == [(1, True), (2, True)]
+    # Headers and text only: the attachment was never downloaded, and it isn't spooled either
+    partial = spool.get("user@imap.example.com", "INBOX", 7, 1)
+    assert b"%PDF" not in partial and len(partial) < len(messages[1])
+    list(client.fetch_many([b"1", b"3"]))
+    assert [(e.uid, e.partial) for e in spool.entries()] == [(1, False), (2, True), (3, False)]
+    assert spool.get("user@imap.example.com", "INBOX", 7, 1) == messages[1]
+    assert spool.entries()[0].size < spool.entries()[0].raw_size
+
+    # A new field is picked up from the spool, no server involved
+    results = list(process_archive(spool, workers=1, attachments=False, code_map={"PY": "Python Developer"}))
+    assert [c["internship"] for _, c in results] == ["Python Developer", "ML", "WD"]
+    assert all(msg.attachments == [] for msg, _ in results)
+    school = CandidateExtractor([("school", "School", r"\w+")])
+    assert [school.extract(m.subject, m.body, m.sender)["school"] for m, _ in results] == ["ENIT", "INSAT", "ESPRIT"]
+
+    # Over budget, the least recently used go first
+    spool.get("user@imap.example.com", "INBOX", 7, 2)
+    spool.evict(spool.entries()[1].size)
+    assert [e.uid for e in spool.entries()] == [2]
+    assert len(MessageSpool(str(tmp_path / "spool"))) == 1
+
+def test_select_applications_prefilters_with_search_and_header_fields():
+    from src.internship_scraper.classify import ApplicationRules, select_applications
+    from src.internship_scraper.imap_server import IMAPStandIn
+    messages = [
+        build_raw("Internship Application – PY – Jane", "Name: Jane", attachment=b"%PDF" * 1000),
+        build_raw("Weekly newsletter", "Nothing to see"),
+        build_raw("Your Internship Application was received", "Thanks"),
+        build_raw("Hello", "Internship Code: DS\nName: Omar"),
+    ]
+    with IMAPStandIn(messages) as server:
+        client = server.client()
+        client.connect()
+        selection = select_applications(client, client.search())
+        assert selection.uids == [b"1", b"4"] and not selection.unverified and selection.rejected == [b"2", b"3"]
+        assert selection.counts == {"searched": 4, "search_skipped": 1, "header_skipped": 1, "body_skipped": 0}
+        assert [(s.uid, s.subject) for s in client.fetch_header_fields([b"2"])] == [(b"2", "Weekly newsletter")]
+        # Header fields are peeked: nothing was marked read
+        assert client.search() == [b"1", b"2", b"3", b"4"]
+
+        # Without SEARCH, unmatched subjects wait for their text part to be checked for the marker
+        uids = client.search()
+        server.fail_next("UID SEARCH")
+        selection = select_applications(client, uids)
+        assert selection.uids == [b"1", b"2", b"3", b"4"] and selection.unverified == {b"2", b"3", b"4"}
+        accepted = [m.uid for m in selection.filter(client.fetch_headers_many(selection.uids))]
+        assert accepted == [b"1", b"4"] and selection.skipped == 2 and selection.rejected == [b"2", b"3"]
+
+        rules = ApplicationRules(body_marker=None, senders=["recruiting@example.com"])
+        assert select_applications(client, client.search(), rules=rules).uids == []
+        client.logout()
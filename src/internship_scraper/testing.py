@@ -0,0 +1,139 @@
+"""
+Helpers for exercising IMAPClient without a real mail server.
+
+They render a raw RFC822 message the way an IMAP server would answer
+``BODYSTRUCTURE``, ``BODY[HEADER]``, ``BODY[HEADER.FIELDS (...)]`` and
+``BODY[<section>]<offset.length>`` fetch items.
+"""
+import email
+import re
+from email.message import Message
+from email.utils import collapse_rfc2231_value, encode_rfc2231
+from typing import Optional
+
+# One header field with its folded continuation lines
+_HEADER_FIELD_RE = re.compile(rb"^[^ \t\r\n][^\n]*\n(?:[ \t][^\n]*\n)*", re.MULTILINE)
+
+def _quote(value: Optional[str]) -> str:
+    if value is None:
+        return "NIL"
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def _raw_param(name: str, value):
+    """A parameter as a server sends it: RFC 2231 values stay ``name*`` = ``charset''%XX...``."""
+    if isinstance(value, tuple):
+        return f"{name}*", encode_rfc2231(collapse_rfc2231_value(value), value[0] or "utf-8")
+    return name, value
+
+def _param_list(pairs) -> str:
+    pairs = [_raw_param(k, v) for k, v in pairs if v is not None]
+    if not pairs:
+        return "NIL"
+    return "(" + " ".join(f"{_quote(k.upper())} {_quote(v)}" for k, v in pairs) + ")"
+
+def split_message(raw: bytes):
+    """Split raw message bytes into ``(header block incl. blank line, body)``."""
+    for separator in (b"\r\n\r\n", b"\n\n"):
+        index = raw.find(separator)
+        if index != -1:
+            return raw[:index + len(separator)], raw[index + len(separator):]
+    return raw, b""
+
+def bodystructure(part: Message) -> str:
+    """Render the IMAP BODYSTRUCTURE of a parsed message."""
+    if part.is_multipart():
+        children = "".join(bodystructure(child) for child in part.get_payload())
+        return f"({children} {_quote(part.get_content_subtype().upper())})"
+    payload = part.get_payload(decode=False)
+    payload = payload.encode("utf-8", "surrogateescape") if isinstance(payload, str) else payload
+    params = (part.get_params() or [])[1:]
+    fields = [
+        _quote(part.get_content_maintype().upper()), _quote(part.get_content_subtype().upper()),
+        _param_list(params), _quote(part.get("Content-ID")), _quote(part.get("Content-Description")),
+        _quote((part.get("Content-Transfer-Encoding") or "7bit").upper()), str(len(payload)),
+    ]
+    if part.get_content_maintype() == "text":
+        fields.append(str(payload.count(b"\n")))
+    disposition = part.get_content_disposition()
+    if disposition:
+        filename = part.get_param("filename", header="content-disposition")
+        fields += ["NIL", f"({_quote(disposition.upper())} {_param_list([('filename', filename)])})"]
+    return "(" + " ".join(fields) + ")"
+
+def _find_part(msg: Message, section: str) -> Message:
+    part = msg
+    for index in section.split("."):
+        if part.is_multipart():
+            part = part.get_payload()[int(index) - 1]
+        elif index != "1":
+            raise KeyError(section)
+    return part
+
+def body_section(raw: bytes, section: str) -> bytes:
+    """Return what a server sends for ``BODY[section]``: headers, text or a part's encoded payload."""
+    header, body = split_message(raw)
+    section = section.upper()
+    if section == "":
+        return raw
+    if section == "HEADER":
+        return header
+    if section.startswith("HEADER.FIELDS"):
+        names = set(section[section.index("(") + 1:section.rindex(")")].split())
+        exclude = section.startswith("HEADER.FIELDS.NOT")
+        fields = [field for field in _HEADER_FIELD_RE.findall(header)
+                  if (field.split(b":", 1)[0].strip().decode(errors="ignore").upper() in names) != exclude]
+        return b"".join(fields) + (b"\r\n" if header.endswith(b"\r\n") else b"\n")
+    if section == "TEXT":
+        return body
+    msg = email.message_from_bytes(raw)
+    part = _find_part(msg, section)
+    if part is msg and not msg.is_multipart():
+        return body
+    payload = part.get_payload(decode=False)
+    return payload.encode("utf-8", "surrogateescape") if isinstance(payload, str) else payload.as_bytes()
+
+def fetch_response(uid: int, raw: bytes, items: str, flags=None, seq: Optional[int] = None):
+    """Build the imaplib-shaped data list for ``UID FETCH <uid> (<items>)`` on one message.
+
+    ``flags`` answers a FLAGS item; ``seq`` is the message sequence number (defaults to the UID).
+    """
+    data, text = [], f"{seq or uid} (UID {uid}"
+    for item in re.findall(r"BODY(?:\.PEEK)?\[[^\]]*\](?:<\d+\.\d+>)?|[A-Z0-9.]+", items.strip("()").upper()):
+        if item == "UID":
+            continue
+        if item == "FLAGS":
+            text += f" FLAGS ({' '.join(sorted(flags or ()))})"
+            continue
+        if item == "BODYSTRUCTURE":
+            text += f" BODYSTRUCTURE {bodystructure(email.message_from_bytes(raw))}"
+            continue
+        if item == "RFC822.SIZE":
+            text += f" RFC822.SIZE {len(raw)}"
+            continue
+        if item == "RFC822":
+            name, literal = "RFC822", raw
+        else:
+            section, _, partial = item[item.index("[") + 1:].partition("]")
+            name, literal = f"BODY[{section}]", body_section(raw, section)
+            if partial:
+                # <offset.length> answers as BODY[section]<offset> with at most length octets
+                offset, length = (int(n) for n in partial.strip("<>").split("."))
+                name, literal = f"{name}<{offset}>", literal[offset:offset + length]
+        data.append((f"{text} {name} {{{len(literal)}}}".encode(), literal))
+        text = ""
+    data.append(f"{text})".encode())
+    return data
+
+def wire_fetch(data) -> bytes:
+    """Serialize ``fetch_response`` output the way it travels on the wire (``* n FETCH ...``)."""
+    out = b""
+    for index, item in enumerate(data):
+        head = item[0] if isinstance(item, tuple) else item
+        if index == 0:
+            seq, _, rest = head.partition(b" ")
+            head = b"* " + seq + b" FETCH " + rest
+        if isinstance(item, tuple):
+            out += head + b"\r\n" + item[1]
+        else:
+            out += head + b"\r\n"
+    return out
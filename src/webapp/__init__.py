@@ -1,6 +1,6 @@
 from flask import Flask
 # TODO: NOTE: You can load config from config.yaml here if needed
-# TODO: FIXME: Ensure thread-safe behavior when using internship_scraper in routes
+# Scrapes triggered from routes run through src.webapp.jobs.JobRunner (one job per account at a time)
 
 def create_app():
     """
@@ -9,23 +9,44 @@ import os
 
 app = Flask(__name__)
 # Use absolute path for database file
-db_path = os.path.join(os.path.dirname(__file__), '../../instance/database.db')
-db_uri = f"sqlite:///{os.path.abspath(db_path)}"
+from src.webapp.models import INSTANCE_DIR
+os.makedirs(INSTANCE_DIR, exist_ok=True)
+db_path = os.path.join(INSTANCE_DIR, 'database.db')
+db_uri = f"sqlite:///{db_path}"
 app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "supersecretkey")
+# Optional attachment offloading to the front proxy: X-Sendfile (Apache, lighttpd) or an
+# nginx internal location aliased to the attachment folder, e.g. ATTACHMENT_ACCEL_REDIRECT=/protected-attachments
+app.config['USE_X_SENDFILE'] = os.environ.get("USE_X_SENDFILE", "").lower() in ("1", "true", "yes")
+app.config['ATTACHMENT_ACCEL_REDIRECT'] = os.environ.get("ATTACHMENT_ACCEL_REDIRECT")
+# Optional local copy of fetched messages, so `flask reprocess` can re-extract without downloading again
+app.config['RAW_SPOOL_DIR'] = os.environ.get("RAW_SPOOL_DIR")
+app.config['RAW_SPOOL_MAX_MB'] = int(os.environ.get("RAW_SPOOL_MAX_MB", "2048"))
+# Per-stage scrape timings and counters, served on /metrics; METRICS_ENABLED=0 turns them off
+app.config['METRICS_ENABLED'] = os.environ.get("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
 db.init_app(app)
 
-from src.webapp.models import Candidate, Attachment, Setting
+from src.internship_scraper.metrics import metrics
+metrics.enabled = app.config['METRICS_ENABLED']
+
+from src.webapp.models import Candidate, Attachment, Setting, SyncState, ScrapeJob
 from src.webapp.routes import register_routes
 register_routes(app)
+from src.webapp.commands import register_commands
+register_commands(app)
+
+# Scrapes run in the background, one at a time per account
+from src.webapp.jobs import JobRunner
+jobs = JobRunner(app)
 
 # ------------------------
 # Run app
 # ------------------------
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()  # create tables if they don't exist
-        print("Database tables created.")
+        from src.webapp.services import upgrade_schema
+        upgrade_schema()  # create tables if they don't exist, add columns newer versions need
+        print("Database schema up to date.")
     app.run(debug=True)
 
@@ -0,0 +1,69 @@
+import click
+from flask import Flask
+
+def register_commands(app: Flask):
+    # -------------------------
+    # Schema Upgrade
+    # -------------------------
+    @app.cli.command("upgrade-db")
+    def upgrade_db():
+        """Add the tables, columns and indexes a database created by an older version is missing."""
+        from src.webapp.services import upgrade_schema
+        added = upgrade_schema()
+        click.echo(f"Added {', '.join(added)}." if added else "Schema already up to date.")
+
+    # -------------------------
+    # Search Index Backfill
+    # -------------------------
+    @app.cli.command("search-index")
+    def search_index():
+        """Build the candidate full-text index (run once on databases created before search existed)."""
+        from src.webapp.services import rebuild_search_index
+        count = rebuild_search_index()
+        click.echo(f"Indexed {count} candidates.")
+
+    # -------------------------
+    # Offline Archive Import
+    # -------------------------
+    @app.cli.command("import-archive")
+    @click.argument("path", type=click.Path(exists=True))
+    @click.option("--workers", type=int, default=None, help="Parser processes (default: one per CPU).")
+    @click.option("--batch-size", type=int, default=200, help="Candidates per database transaction.")
+    def import_archive(path, workers, batch_size):
+        """Import candidates from an mbox file, Maildir or directory of .eml files."""
+        from src.webapp.scraper import import_archive
+        result = import_archive(path, workers=workers, batch_size=batch_size)
+        click.echo(f"Read {result['total']} emails, added {result['new_count']} candidates, "
+                   f"skipped {result['skipped']}.")
+
+    # -------------------------
+    # Re-extract From The Spool
+    # -------------------------
+    @app.cli.command("reprocess")
+    @click.option("--workers", type=int, default=None, help="Parser processes (default: one per CPU).")
+    def reprocess(workers):
+        """Re-run extraction over the raw-message spool and update existing candidates in place."""
+        from src.webapp.services import raw_spool
+        from src.webapp.scraper import reprocess_spool
+        spool = raw_spool()
+        if spool is None:
+            raise click.ClickException("RAW_SPOOL_DIR is not set, nothing has been spooled.")
+        result = reprocess_spool(spool, workers=workers)
+        click.echo(f"Re-extracted {result['total']} emails, updated {result['updated']} candidates, "
+                   f"{result['missing']} not in the database.")
+
+    # -------------------------
+    # Candidate Export
+    # -------------------------
+    @app.cli.command("export")
+    @click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), default="csv", show_default=True)
+    @click.option("--internship", default=None, help="Only candidates for this internship.")
+    @click.option("--reviewed", type=click.Choice(["yes", "no"]), default=None, help="Only reviewed or unreviewed candidates.")
+    @click.option("--output", "-o", type=click.File("wb", lazy=False), default="-",
+                  help="File to write (default: stdout).")
+    def export(fmt, internship, reviewed, output):
+        """Stream candidates to CSV or JSON Lines, in constant memory."""
+        from src.webapp.services import export_csv, export_jsonl
+        chunks = (export_csv if fmt == "csv" else export_jsonl)(internship, {"yes": True, "no": False}.get(reviewed))
+        for chunk in chunks:
+            output.write(chunk.encode("utf-8"))
@@ -0,0 +1,32 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+from cryptography.fernet import Fernet
+
+# The tests never touch the live instance/ folder: the app is pointed at a throwaway one (database and
+# attachment root) with its own key before anything imports it. load_dotenv() doesn't override these.
+_instance_dir = tempfile.mkdtemp(prefix="webapp-tests-")
+os.environ["INSTANCE_DIR"] = _instance_dir
+os.environ["FERNET_KEY"] = Fernet.generate_key().decode()
+
+@pytest.fixture(scope="session", autouse=True)
+def instance_dir():
+    """The temporary instance folder, with the schema created; removed after the run."""
+    from src.webapp.app import app
+    from src.webapp.services import upgrade_schema
+    with app.app_context():
+        upgrade_schema()
+    yield _instance_dir
+    shutil.rmtree(_instance_dir, ignore_errors=True)
+
+@pytest.fixture
+def attachment_root(instance_dir):
+    """Attachment folder of the current settings, inside the temporary instance folder."""
+    from src.webapp.app import app
+    from src.webapp.settings_cache import current_settings
+    with app.app_context():
+        root = current_settings().attachment_root
+    assert root.startswith(instance_dir)
+    return root
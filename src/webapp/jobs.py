@@ -0,0 +1,154 @@
+"""
+Background scrape jobs.
+
+A scrape of a large mailbox takes minutes, far longer than a request should
+block. ``JobRunner`` runs scrapes on a small thread pool instead; every run is
+a ``ScrapeJob`` row whose progress counts the dashboard polls through
+``/jobs/<id>``. A partial unique index on the table keeps at most one queued
+or running job per account, also across processes.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+
+from src.internship_scraper.metrics import metrics
+from src.webapp.models import db, ScrapeJob
+
+# Every runner stamps heartbeat_at on the jobs it owns this often, whatever the scrape is doing
+HEARTBEAT_EVERY = timedelta(seconds=30)
+# An active job without a heartbeat for this long belongs to a process that died
+STALE_AFTER = timedelta(minutes=3)
+
+class JobLost(Exception):
+    """Raised in a job's thread once its job was given up as stale (and maybe replaced by a new one)."""
+
+def _utcnow():
+    # SQLite hands datetimes back naive, in UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class JobRunner:
+    """Runs scrapes in background threads, at most one per account.
+
+    ``scrape(progress)`` does the work and returns the scraper's result dict;
+    it defaults to ``services.scrape_and_save_candidates``.
+
+    Jobs carry the ``runner_id`` of the runner that queued them. A heartbeat
+    thread stamps them every ``heartbeat_every``, independently of how long a
+    scrape batch takes, and every write a job's thread makes is conditional on
+    the job still being active and its own. A job given up as stale therefore
+    stays failed: its thread stops at the next progress report.
+    """
+    def __init__(self, app, scrape=None, max_workers=2, stale_after=STALE_AFTER, heartbeat_every=HEARTBEAT_EVERY):
+        self.app = app
+        self.scrape = scrape
+        self.stale_after = stale_after
+        self.heartbeat_every = heartbeat_every
+        self.runner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape-job")
+        self._heartbeat = None
+        self._lock = threading.Lock()
+
+    def submit(self, account):
+        """Queue a scrape of ``account``. Returns ``(job, created)``; an active job is returned instead of a second one."""
+        active = self.active_job(account)
+        if active:
+            return active, False
+        job = ScrapeJob(account=account, status="queued", runner=self.runner_id, heartbeat_at=_utcnow())
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another request or process queued one in between
+            db.session.rollback()
+            return self.active_job(account), False
+        self._start_heartbeat()
+        self.executor.submit(self._run, job.id)
+        return job, True
+
+    def active_job(self, account):
+        """The queued or running job of ``account``, if any; stale ones are marked failed."""
+        job = ScrapeJob.query.filter(ScrapeJob.account == account, ScrapeJob.status.in_(ScrapeJob.ACTIVE)).first()
+        cutoff = _utcnow() - self.stale_after
+        last_seen = job and (job.heartbeat_at or job.updated_at)
+        if last_seen and last_seen < cutoff:
+            # Conditional, so a heartbeat landing in between keeps the job alive
+            result = db.session.execute(
+                update(ScrapeJob)
+                .where(ScrapeJob.id == job.id, ScrapeJob.status.in_(ScrapeJob.ACTIVE),
+                       func.coalesce(ScrapeJob.heartbeat_at, ScrapeJob.updated_at) < cutoff)
+                .values(status="failed", error="Interrupted: no heartbeat for too long", finished_at=_utcnow())
+            )
+            db.session.commit()
+            if result.rowcount:
+                return None
+            db.session.refresh(job)
+        return job
+
+    def _owned(self, job_id):
+        return (ScrapeJob.id == job_id, ScrapeJob.runner == self.runner_id, ScrapeJob.status.in_(ScrapeJob.ACTIVE))
+
+    def _update(self, job_id, **values):
+        """Write ``values`` to a job this runner still owns; False once it was given up as stale."""
+        result = db.session.execute(update(ScrapeJob).where(*self._owned(job_id)).values(heartbeat_at=_utcnow(), **values))
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, name="scrape-job-heartbeat", daemon=True)
+                self._heartbeat.start()
+
+    def _beat(self):
+        while True:
+            time.sleep(self.heartbeat_every.total_seconds())
+            try:
+                with self.app.app_context(), db.engine.begin() as connection:
+                    connection.execute(
+                        update(ScrapeJob)
+                        .where(ScrapeJob.runner == self.runner_id, ScrapeJob.status.in_(ScrapeJob.ACTIVE))
+                        .values(heartbeat_at=_utcnow())
+                    )
+            except Exception as e:
+                logging.warning(f"Scrape job heartbeat failed: {e}")
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            if not self._update(job_id, status="running", started_at=_utcnow()):
+                logging.warning(f"Scrape job {job_id} was given up before it started")
+                return
+
+            def progress(counts):
+                fields = {key: counts[key] for key in ("total", "fetched", "parsed", "inserted", "skipped") if key in counts}
+                if not self._update(job_id, **fields):
+                    raise JobLost(f"Scrape job {job_id} is no longer owned by this runner")
+
+            status, error = "done", None
+            try:
+                scrape = self.scrape
+                if scrape is None:
+                    from src.webapp.services import scrape_and_save_candidates as scrape
+                with metrics.timer("scrape"):
+                    result = scrape(progress)
+                if isinstance(result, dict) and result.get("error"):
+                    status, error = "failed", result["error"]
+            except JobLost as e:
+                logging.warning(f"{e}; stopping")
+                db.session.rollback()
+                return
+            except Exception as e:
+                logging.exception(f"Scrape job {job_id} failed")
+                db.session.rollback()
+                status, error = "failed", str(e)
+            if self._update(job_id, status=status, error=error, finished_at=_utcnow()):
+                metrics.count(f"scrape_jobs_{status}")
+            else:
+                logging.warning(f"Scrape job {job_id} finished after it was given up; status left as is")
@@ -1,4 +1,5 @@
 from src.webapp.db import db
+from sqlalchemy import DDL, event
 from datetime import datetime, timezone
 from cryptography.fernet import Fernet
 import os
@@ -7,11 +8,19 @@ from dotenv import load_dotenv
 load_dotenv()
 FERNET_KEY = os.environ.get("FERNET_KEY")
 fernet = Fernet(FERNET_KEY)
+# Database and attachments; INSTANCE_DIR moves both elsewhere (the tests use a throwaway one)
+INSTANCE_DIR = os.path.abspath(os.environ.get("INSTANCE_DIR") or os.path.join(os.path.dirname(__file__), '../../instance'))
 
 
 
 class Candidate(db.Model):
     __tablename__ = "candidates"
+    # Dashboard pages are keyset ranges on (applied_on, id), optionally filtered by internship or reviewed state
+    __table_args__ = (
+        db.Index("ix_candidates_applied_on_id", "applied_on", "id"),
+        db.Index("ix_candidates_internship_applied_on_id", "internship", "applied_on", "id"),
+        db.Index("ix_candidates_read_applied_on_id", "read", "applied_on", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -29,20 +38,55 @@ class Candidate(db.Model):
         return f"<Candidate {self.name} ({self.email})>"
 
 
+# Full-text index over candidate emails. External content: the FTS5 table only holds the index and
+# reads the text back from candidates; triggers keep it in sync with every insert, edit and delete
+CANDIDATE_SEARCH_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS candidates_fts USING fts5(
+        name, internship, notes, content='candidates', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS candidates_fts_insert AFTER INSERT ON candidates BEGIN
+        INSERT INTO candidates_fts(rowid, name, internship, notes) VALUES (new.id, new.name, new.internship, new.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS candidates_fts_delete AFTER DELETE ON candidates BEGIN
+        INSERT INTO candidates_fts(candidates_fts, rowid, name, internship, notes)
+        VALUES ('delete', old.id, old.name, old.internship, old.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS candidates_fts_update AFTER UPDATE OF name, internship, notes ON candidates BEGIN
+        INSERT INTO candidates_fts(candidates_fts, rowid, name, internship, notes)
+        VALUES ('delete', old.id, old.name, old.internship, old.notes);
+        INSERT INTO candidates_fts(rowid, name, internship, notes) VALUES (new.id, new.name, new.internship, new.notes);
+    END""",
+)
+
+for statement in CANDIDATE_SEARCH_DDL:
+    event.listen(Candidate.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
 class Attachment(db.Model):
     __tablename__ = "attachments"
 
     id = db.Column(db.Integer, primary_key=True)
-    candidate_id = db.Column(db.Integer, db.ForeignKey("candidates.id"), nullable=False)
+    candidate_id = db.Column(db.Integer, db.ForeignKey("candidates.id"), nullable=False, index=True)
     filename = db.Column(db.String(255), nullable=False)
-    file_type = db.Column(db.String(50), nullable=True)
-    path = db.Column(db.String(500), nullable=False)
+    file_type = db.Column(db.String(255), nullable=True)  # MIME type
+    path = db.Column(db.String(500), nullable=False)  # blob path relative to the attachment folder
+    sha256 = db.Column(db.String(64), nullable=True, index=True)  # content address; NULL for pre-store rows
+    size = db.Column(db.Integer, nullable=True)
     uploaded_on = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     candidate = db.relationship("Candidate", back_populates="attachments")
 
     def __repr__(self):
-        return f"<Attachment {self.filename} for {self.candidate.name}>"
+        # candidate_id rather than candidate.name: a repr must not trigger a lazy load
+        return f"<Attachment {self.filename} for candidate {self.candidate_id}>"
+
+
+# Attachments per candidate as a correlated COUNT; deferred, so only queries that undefer it pay for it
+Candidate.attachment_count = db.column_property(
+    db.select(db.func.count(Attachment.id)).where(Attachment.candidate_id == Candidate.id)
+    .correlate_except(Attachment).scalar_subquery(),
+    deferred=True
+)
 
 
 class Setting(db.Model):
@@ -56,10 +100,13 @@ class Setting(db.Model):
     _email_pass = db.Column(db.LargeBinary, nullable=False)
     folder = db.Column(db.String(50), default="INBOX")
     search_criteria = db.Column(db.String(50), default="UNSEEN")
+    incremental_sync = db.Column(db.Boolean, default=False)  # UID checkpoints instead of UNSEEN scans; opt-in
     timeout_seconds = db.Column(db.Integer, default=30)
+    imap_connections = db.Column(db.Integer, default=4)  # parallel sessions for large backlogs
 
-    # Storage / attachment folder
+    # Storage / attachment folder (relative paths are resolved against the instance folder)
     attachment_folder = db.Column(db.String(255), default="attachments")
+    max_attachment_mb = db.Column(db.Integer, default=25)  # larger attachments are skipped, not downloaded
 
     # Internship code mapping (JSON string)
     internship_code_map = db.Column(db.Text, default='{"PY": "Python Developer", "WD": "Web Developer", "GD": "Graphic Designer", "ML": "Machine Learning Intern"}')
@@ -70,6 +117,10 @@ class Setting(db.Model):
         db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc)
     )
 
+    # Bumped on every update; processes compare it with their cached settings (see settings_cache)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    __mapper_args__ = {"version_id_col": version}
+
     # Email password encryption handling
     @property
     def email_pass(self):
@@ -79,6 +130,93 @@ class Setting(db.Model):
     def email_pass(self, plaintext: str):
         self._email_pass = fernet.encrypt(plaintext.encode())
 
+    @property
+    def attachment_root(self):
+        return os.path.join(INSTANCE_DIR, self.attachment_folder or "attachments")
+
     def __repr__(self):
         return f"<Setting {self.email_user} @ {self.imap_server}>"
 
+
+class SyncState(db.Model):
+    """Incremental sync checkpoint (UIDVALIDITY + highest processed UID) per account/folder."""
+    __tablename__ = "sync_state"
+    __table_args__ = (db.UniqueConstraint("account", "folder", name="uq_sync_state_account_folder"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    account = db.Column(db.String(255), nullable=False)
+    folder = db.Column(db.String(50), nullable=False)
+    uidvalidity = db.Column(db.BigInteger, nullable=True)
+    last_uid = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(
+        db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc)
+    )
+
+    def __repr__(self):
+        return f"<SyncState {self.account}/{self.folder} UID {self.last_uid}>"
+
+
+class ScrapeJob(db.Model):
+    """Background scrape of one account, with progress counts the UI polls."""
+    __tablename__ = "scrape_jobs"
+    # At most one queued or running job per account, even across processes
+    __table_args__ = (
+        db.Index("uq_scrape_jobs_active_account", "account", unique=True,
+                 sqlite_where=db.text("status IN ('queued', 'running')")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    account = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="queued")  # queued, running, done, failed
+    total = db.Column(db.Integer, nullable=False, default=0)
+    fetched = db.Column(db.Integer, nullable=False, default=0)
+    parsed = db.Column(db.Integer, nullable=False, default=0)
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    # JobRunner that owns the job, and when it last showed it is alive (see jobs.JobRunner)
+    runner = db.Column(db.String(100), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(
+        db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc)
+    )
+
+    ACTIVE = ("queued", "running")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "account": self.account,
+            "status": self.status,
+            "total": self.total,
+            "fetched": self.fetched,
+            "parsed": self.parsed,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f"<ScrapeJob {self.id} {self.account} {self.status}>"
+
+
+# Columns added to tables that older databases already have. db.create_all() leaves existing tables
+# alone, so `flask upgrade-db` (services.upgrade_schema) adds the missing ones: (table, column, SQL definition)
+SCHEMA_UPGRADES = (
+    ("settings", "version", "INTEGER NOT NULL DEFAULT 1"),
+    # Off for existing installs: the first sync reads every UID of the folder, read or not
+    ("settings", "incremental_sync", "BOOLEAN DEFAULT 0"),
+    ("settings", "imap_connections", "INTEGER DEFAULT 4"),
+    ("settings", "max_attachment_mb", "INTEGER DEFAULT 25"),
+    # Rows saved before the content-addressed store keep NULL here and are served by their path
+    ("attachments", "sha256", "VARCHAR(64)"),
+    ("attachments", "size", "INTEGER"),
+    ("scrape_jobs", "runner", "VARCHAR(100)"),
+    ("scrape_jobs", "heartbeat_at", "DATETIME"),
+)
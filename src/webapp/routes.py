@@ -2,26 +2,21 @@ from flask import Flask
 
 def register_routes(app: Flask):
     # -------------------------
-    # Serve files from attachements folder
+    # Download Attachment
     # -------------------------
-    @app.route('/attachements/<filename>')
-    def download_attachment(filename):
-        from flask import send_from_directory
-        attachments_dir = '/home/amen/stage/career/attachements'
-        return send_from_directory(attachments_dir, filename, as_attachment=True)
+    @app.route('/attachment/<int:attachment_id>/download')
+    def download_attachment(attachment_id):
+        from src.webapp.models import Attachment
+        att = Attachment.query.get_or_404(attachment_id)
+        return services.send_attachment(att, as_attachment=True)
     # -------------------------
     # View Attachment
     # -------------------------
     @app.route("/attachment/<int:attachment_id>")
     def view_attachment(attachment_id):
         from src.webapp.models import Attachment
-        from flask import send_file, abort
-        import os
         att = Attachment.query.get_or_404(attachment_id)
-        abs_path = os.path.abspath(os.path.join('/home/amen/stage/career/attachements', att.filename))
-        if not os.path.exists(abs_path):
-            return abort(404)
-        return send_file(abs_path)
+        return services.send_attachment(att)
     # -------------------------
     # Mark Candidate as Reviewed
     # -------------------------
@@ -44,17 +39,85 @@ def register_routes(app: Flask):
     @app.route("/", methods=["GET", "POST"])
     def dashboard():
         if request.method == "POST":
-            # Scrape button clicked
-                result = services.scrape_and_save_candidates()
-                if isinstance(result, dict) and result.get("error"):
-                    flash(result["error"], "danger")
-                else:
-                    count = result.get("new_count", 0) if isinstance(result, dict) else 0
-                    flash(f"{count} new candidates added.", "success")
-                return redirect(url_for("dashboard"))
+            # Scrape button clicked: queue a background job, the page polls its progress
+            from src.webapp.app import jobs
+            job, created = jobs.submit(services.scrape_account())
+            if created:
+                flash("Scrape started.", "success")
+            else:
+                flash("A scrape of this mailbox is already running.", "info")
+            return redirect(url_for("dashboard", job=job.id))
+
+        from flask import abort
+        internship = request.args.get("internship") or None
+        reviewed = request.args.get("reviewed", "")
+        try:
+            candidates, next_cursor = services.fetch_candidates(
+                internship=internship,
+                reviewed={"1": True, "0": False}.get(reviewed),
+                cursor=request.args.get("cursor")
+            )
+        except ValueError:
+            return abort(400)
+        return render_template("dashboard.html", candidates=candidates, next_cursor=next_cursor,
+                               internships=services.internship_choices(), internship=internship, reviewed=reviewed,
+                               paged=bool(request.args.get("cursor")), job_id=request.args.get("job", type=int))
 
-        candidates = Candidate.query.order_by(Candidate.applied_on.desc()).all()
-        return render_template("dashboard.html", candidates=candidates)
+    # -------------------------
+    # Export (streamed)
+    # -------------------------
+    @app.route("/export.<any(csv, jsonl):fmt>")
+    def export(fmt):
+        from datetime import date
+        from flask import Response, stream_with_context
+        internship = request.args.get("internship") or None
+        reviewed = {"1": True, "0": False}.get(request.args.get("reviewed", ""))
+        if fmt == "csv":
+            chunks, mimetype = services.export_csv(internship, reviewed), "text/csv"
+        else:
+            chunks, mimetype = services.export_jsonl(internship, reviewed), "application/x-ndjson"
+        # The generator keeps reading from the database after the view returns
+        response = Response(stream_with_context(chunks), mimetype=mimetype)
+        response.headers["Content-Disposition"] = f"attachment; filename=candidates-{date.today().isoformat()}.{fmt}"
+        return response
+
+    # -------------------------
+    # Full-text Search
+    # -------------------------
+    @app.route("/search")
+    def search():
+        from flask import abort
+        from sqlalchemy.exc import OperationalError
+        q = request.args.get("q", "").strip()
+        page = request.args.get("page", 1, type=int)
+        if page < 1:
+            return abort(400)
+        try:
+            results, has_next = services.search_candidates(q, page=page)
+        except OperationalError:
+            flash("Search index is missing, run `flask --app src.webapp.app search-index` once.", "danger")
+            results, has_next = [], False
+        return render_template("search.html", q=q, results=results, page=page, has_next=has_next)
+
+    # -------------------------
+    # Scrape Job Progress
+    # -------------------------
+    @app.route("/jobs/<int:job_id>")
+    def job_status(job_id):
+        from flask import jsonify
+        from src.webapp.models import ScrapeJob
+        return jsonify(ScrapeJob.query.get_or_404(job_id).to_dict())
+
+    # -------------------------
+    # Pipeline Metrics (Prometheus text format)
+    # -------------------------
+    @app.route("/metrics")
+    def metrics_endpoint():
+        from flask import abort
+        from src.internship_scraper.metrics import metrics
+        if not metrics.enabled:
+            return abort(404)
+        return metrics.render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
 
 
     # -------------------------
@@ -79,7 +142,10 @@ def register_routes(app: Flask):
                 request.form.get("email_pass"),
                 request.form.get("folder"),
                 request.form.get("attachment_folder"),
-                request.form.get("internship_code_map")
+                request.form.get("internship_code_map"),
+                incremental_sync="incremental_sync" in request.form,
+                imap_connections=request.form.get("imap_connections", type=int),
+                max_attachment_mb=request.form.get("max_attachment_mb", type=int)
             )
             flash("Settings updated successfully.", "success")
             return redirect(url_for("settings"))
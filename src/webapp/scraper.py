@@ -1,173 +1,268 @@
-import imaplib
-import email
-from email.header import decode_header
-import re
-from src.webapp.models import db, Candidate, Attachment
-from src.webapp.app import app
+from src.internship_scraper.classify import DEFAULT_RULES, select_applications
+from src.internship_scraper.extraction import extract_candidate
+from src.internship_scraper.flags import FlagBuffer
+from src.internship_scraper.imap import attachments_complete
+from src.internship_scraper.metrics import metrics
+from src.internship_scraper.pool import IMAPConnectionPool
+from src.internship_scraper.sources import open_source, process_archive
+from src.internship_scraper.storage import AttachmentStore, store_attachments
+from src.internship_scraper.sync import SyncCheckpoint, plan_sync
+from src.webapp.models import db, Candidate, Attachment, SyncState
+from src.webapp.settings_cache import current_settings
 from datetime import datetime, timezone
+from sqlalchemy import insert, select, update
+import logging
 
 # ------------------ Helpers ------------------
 
-def safe_decode(header_value):
-    if not header_value:
-        return ""
-    decoded, encoding = decode_header(header_value)[0]
-    if isinstance(decoded, bytes):
-        return decoded.decode(encoding if encoding else "utf-8", errors="ignore")
-    return decoded
-
-def extract_email(sender):
-    import re
-    match = re.search(r'<(.+?)>', sender)
-    return match.group(1) if match else sender
-
-def extract_name(sender):
-    match = re.match(r'(.*?)<', sender)
-    return match.group(1).strip() if match else sender.split('@')[0]
-
-def parse_candidate(body: str, sender: str):
-    """Extract candidate info from email body and sender"""
-    name_match = re.search(r"Name[:\s]+(.+)", body, re.IGNORECASE)
-    phone_match = re.search(r"Phone[:\s]+([+\d\s\-()]+)", body, re.IGNORECASE)
-    linkedin_match = re.search(r"LinkedIn[:\s]+(https?://[\w\.-/]+|linkedin.com/in/[\w\-]+)", body, re.IGNORECASE)
-    github_match = re.search(r"GitHub[:\s]+(https?://[\w\.-/]+|github.com/[\w\-]+)", body, re.IGNORECASE)
-    internship_match = re.search(r"Internship[:\s]+([\w\s]+)", body, re.IGNORECASE)
-    code_match = re.search(r"Internship Code[:\s]+(\w+)", body, re.IGNORECASE)
-
-    email_addr = extract_email(sender)
-    name = name_match.group(1).strip() if name_match else extract_name(sender)
-    linkedin = linkedin_match.group(1).strip() if linkedin_match else None
-    github = github_match.group(1).strip() if github_match else None
-    phone = phone_match.group(1).strip() if phone_match else None
-    internship = internship_match.group(1).strip() if internship_match else (code_match.group(1).strip() if code_match else None)
-
-    return {
-        "name": name,
-        "email": email_addr,
-        "phone": phone,
-        "linkedin": linkedin,
-        "github": github,
-        "internship": internship,
-        "notes": body
-    }
-
-def save_candidate(candidate_data, attachments):
-    """Save candidate and attachments to DB, skip duplicates by email"""
-    import os
-    with app.app_context():
-        existing = Candidate.query.filter_by(email=candidate_data["email"]).first()
-        if existing:
-            return existing, []
-        candidate = Candidate(
-            name=candidate_data["name"],
-            email=candidate_data["email"],
-            phone=candidate_data.get("phone"),
-            linkedin=candidate_data.get("linkedin"),
-            internship=candidate_data.get("internship"),
-            notes=candidate_data.get("notes"),
-            applied_on=datetime.now(timezone.utc)
-        )
-        db.session.add(candidate)
-        db.session.commit()
+def new_candidates(batch):
+    """Drop (msg, candidate_data) pairs whose email is already stored or earlier in the batch.
+    Existing emails come from a single WHERE email IN (...) query."""
+    emails = {candidate_data["email"] for _, candidate_data in batch}
+    seen = set(db.session.scalars(select(Candidate.email).where(Candidate.email.in_(emails))))
+    fresh = []
+    for msg, candidate_data in batch:
+        if candidate_data["email"] not in seen:
+            seen.add(candidate_data["email"])
+            fresh.append((msg, candidate_data))
+    return fresh
 
-        saved_attachments = []
-        attachment_folder = '/home/amen/stage/career/attachements'
-        os.makedirs(attachment_folder, exist_ok=True)
-        for att_name, att_data in attachments:
-            if att_name and att_data:
-                file_path = os.path.join(attachment_folder, att_name)
-                with open(file_path, 'wb') as f:
-                    f.write(att_data)
-                rel_path = os.path.relpath(file_path, os.path.dirname(__file__))
-                att = Attachment(
-                    candidate_id=candidate.id,
-                    filename=att_name,
-                    file_type=None,
-                    path=rel_path,
-                    uploaded_on=datetime.now(timezone.utc)
-                )
-                db.session.add(att)
-                saved_attachments.append(att)
-        db.session.commit()
-        return candidate, saved_attachments
+def save_candidates(entries, store):
+    """Bulk insert (candidate_data, attachments) pairs and their attachment rows.
+    Attachment content goes to the content-addressed store; a blob already stored only adds a row.
+    Nothing is committed here, so the caller decides the transaction (one per batch).
+    Returns the new candidate ids."""
+    if not entries:
+        return []
+    now = datetime.now(timezone.utc)
+    rows = [{
+        "name": candidate_data["name"],
+        "email": candidate_data["email"],
+        "phone": candidate_data.get("phone"),
+        "linkedin": candidate_data.get("linkedin"),
+        "internship": candidate_data.get("internship"),
+        "notes": candidate_data.get("notes"),
+        "applied_on": now,
+    } for candidate_data, _ in entries]
+    ids = db.session.scalars(insert(Candidate).returning(Candidate.id, sort_by_parameter_order=True), rows).all()
+    attachment_rows = []
+    for candidate_id, (_, attachments) in zip(ids, entries):
+        for blob in store_attachments(attachments, store):
+            attachment_rows.append({
+                "candidate_id": candidate_id,
+                "filename": blob.filename,
+                "file_type": blob.content_type,
+                "path": blob.relpath,
+                "sha256": blob.sha256,
+                "size": blob.size,
+                "uploaded_on": now,
+            })
+    if attachment_rows:
+        db.session.execute(insert(Attachment), attachment_rows)
+    return ids
 
 # ------------------ Core Scraper ------------------
 
-def fetch_and_save_emails(imap_server, email_user, email_pass, folder="INBOX"):
+def fetch_and_save_emails(imap_server, email_user, email_pass, folder="INBOX", sync=False, connections=1, batch_size=200,
+                          progress=None, settings=None, spool=None, rules=DEFAULT_RULES):
     """
     Connect to IMAP, fetch unread emails, parse and save to DB.
-    Returns dict: {"new_count": int} or {"error": str}
+    Candidates are ingested batch_size at a time, each batch in a single transaction.
+    With sync=True, fetch every message after the stored SyncState checkpoint instead of UNSEEN ones.
+    connections > 1 fetches batches over that many parallel IMAP sessions (capped per server).
+    progress(counts) is called after every committed batch with total/fetched/parsed/inserted/skipped counts.
+    settings is the SettingsSnapshot supplying the code map and attachment limits (default: the cached one).
+    spool is an optional MessageSpool that keeps what is fetched for reprocess_spool.
+    Only messages the ApplicationRules accept are fetched: a server-side SEARCH prefilter and a
+    header-fields pass run first, and everything else is left on the server unread ("filtered" count).
+    Returns dict: {"new_count": int, **counts} or {"error": str}
     """
+    client = IMAPConnectionPool(imap_server, email_user, email_pass, folder, size=connections, spool=spool)
     try:
-        mail = imaplib.IMAP4_SSL(imap_server)
-        mail.login(email_user, email_pass)
-        mail.select(folder)
+        client.connect()
     except Exception as e:
         return {"error": str(e)}
 
-    status, messages = mail.search(None, "UNSEEN")
-    if status != "OK":
-        return {"error": "Failed to search mailbox."}
+    # Messages are queued to be marked read once their batch has committed
+    flags = FlagBuffer(client)
+    try:
+        if sync:
+            account = f"{email_user}@{imap_server}"
+            state = SyncState.query.filter_by(account=account, folder=folder).first()
+            if state is None:
+                state = SyncState(account=account, folder=folder, last_uid=0)
+                db.session.add(state)
+            checkpoint = SyncCheckpoint(state.uidvalidity, state.last_uid or 0)
+            msg_ids = plan_sync(client, checkpoint)
+            criteria = f"UID {checkpoint.last_uid + 1}:*"
+        else:
+            criteria = "UNSEEN"
+            msg_ids = client.search(criteria)
+
+        # Non-applications (newsletters, notifications, ...) are never downloaded past a few header fields
+        selection = select_applications(client, msg_ids, criteria, rules)
+        counts = {"total": len(selection.uids), "fetched": 0, "parsed": 0, "inserted": 0, "skipped": 0,
+                  "filtered": selection.skipped}
+        if progress:
+            progress(dict(counts))
+
+        # Code map already parsed, shared read-only with the extractor
+        settings = settings or current_settings()
+        code_map = settings.code_map
+        store = AttachmentStore(settings.attachment_root)
+        max_size = settings.max_attachment_bytes
 
-    new_count = 0
+        def ingest(batch):
+            # One IN query for duplicates, attachments only for new candidates, one transaction per batch
+            with metrics.timer("db_dedupe"):
+                fresh = new_candidates(batch)
+            failed = set()
+            for msg, _ in fresh:
+                # Streamed in chunks straight into the store; oversized parts are skipped
+                client.fetch_attachments(msg, store=store, max_size=max_size)
+                if not attachments_complete(msg):
+                    # Left unread and below the checkpoint, so the next run downloads it again
+                    failed.add(msg.uid)
+            fresh = [(msg, candidate_data) for msg, candidate_data in fresh if msg.uid not in failed]
+            settled = [(msg, candidate_data) for msg, candidate_data in batch if msg.uid not in failed]
+            with metrics.timer("db_insert"):
+                ids = save_candidates([(candidate_data, msg.attachments) for msg, candidate_data in fresh], store)
+            if sync:
+                for msg, _ in settled:
+                    checkpoint.advance(msg.uid)
+                state.uidvalidity = checkpoint.uidvalidity
+                state.last_uid = checkpoint.last_uid
+            with metrics.timer("db_commit"):
+                db.session.commit()
+            metrics.count("candidates_inserted", len(ids))
+            for msg, _ in settled:
+                flags.add(msg.uid)
+            counts["inserted"] += len(ids)
+            counts["skipped"] += len(batch) - len(ids)
+            if progress:
+                progress(dict(counts))
 
-    # Get internship code map from settings
-    from src.webapp.models import Setting
-    import json
-    setting = Setting.query.first()
-    code_map = {}
-    if setting and getattr(setting, 'internship_code_map', None):
+        # Headers, structure and text first; attachments only for candidates we keep
+        batch = []
+        for msg in client.fetch_headers_many(selection.uids, batch_size=batch_size):
+            counts["fetched"] += 1
+            if not selection.accept(msg):
+                # Kept for a possible "Internship Code:" line, which its text doesn't have
+                counts["filtered"] += 1
+                continue
+            try:
+                # Body fields, overridden by the "Internship Application – CODE – Name" subject
+                batch.append((msg, extract_candidate(msg.subject, msg.body, msg.sender, code_map)))
+                counts["parsed"] += 1
+            except Exception as e:
+                logging.error(f"Failed to parse email {msg.uid}: {e}")
+                counts["skipped"] += 1
+            if len(batch) >= batch_size:
+                ingest(batch)
+                batch = []
+        if batch:
+            ingest(batch)
+    finally:
+        # Also on errors (a failed SEARCH, a DB error, JobLost from progress): what is committed gets marked
+        # read, and every pooled session logs out instead of holding one of the server's few slots
         try:
-            code_map = json.loads(setting.internship_code_map)
-        except Exception:
-            code_map = {}
-
-    for msg_id in messages[0].split():
-        _, msg_data = mail.fetch(msg_id, "(RFC822)")
-        for response_part in msg_data:
-            if isinstance(response_part, tuple):
-                msg = email.message_from_bytes(response_part[1])
-                sender = safe_decode(msg.get("From"))
-                subject = safe_decode(msg.get("Subject"))
-                body = ""
-                attachments = []
-
-                if msg.is_multipart():
-                    for part in msg.walk():
-                        content_type = part.get_content_type()
-                        content_disp = part.get("Content-Disposition")
-                        if content_type == "text/plain" and (not content_disp or "attachment" not in content_disp.lower()):
-                            payload = part.get_payload(decode=True)
-                            if payload:
-                                body = payload.decode(errors="ignore")
-                        if content_disp and "attachment" in content_disp.lower():
-                            att_name = part.get_filename()
-                            att_data = part.get_payload(decode=True)
-                            attachments.append((att_name, att_data))
-                else:
-                    payload = msg.get_payload(decode=True)
-                    if payload:
-                        body = payload.decode(errors="ignore")
-
-                candidate_data = parse_candidate(body, sender)
-                # Try to extract internship code and name from subject
-                subject_match = re.match(r"Internship Application\s*[–-]\s*(\w+)\s*[–-]\s*(.+)", subject)
-                if subject_match:
-                    code = subject_match.group(1)
-                    name_from_subject = subject_match.group(2).strip()
-                    candidate_data["name"] = name_from_subject
-                    candidate_data["internship"] = code_map.get(code, code)
-                else:
-                    # Fallback: code only
-                    code_match = re.search(r"Internship Application\s*[–-]\s*(\w+)", subject)
-                    if code_match:
-                        code = code_match.group(1)
-                        candidate_data["internship"] = code_map.get(code, code)
-                candidate, saved_atts = save_candidate(candidate_data, attachments)
-                # Only count if not duplicate
-                if saved_atts or (candidate and getattr(candidate, 'id', None)):
-                    new_count += 1
-                mail.store(msg_id, '+FLAGS','\\Seen')
-
-    return {"new_count": new_count}
+            flags.flush()
+        except Exception as e:
+            logging.warning(f"Failed to mark processed emails read: {e}")
+        client.logout()
+
+    logging.info(f"Scrape of {folder}: {counts['inserted']} new candidates, {counts['skipped']} skipped, "
+                 f"{counts['filtered']} non-applications left unread")
+
+    if sync:
+        # Non-applications are settled too; also covers an empty run after a UIDVALIDITY reset
+        for uid in selection.rejected:
+            checkpoint.advance(uid)
+        state.uidvalidity = checkpoint.uidvalidity
+        state.last_uid = checkpoint.last_uid
+        db.session.commit()
+
+    return {"new_count": counts["inserted"], **counts}
+
+def import_archive(path, workers=None, batch_size=200, progress=None, settings=None):
+    """
+    Ingest an exported mailbox (mbox file, Maildir or .eml directory) without IMAP.
+    Messages are parsed, extracted and their attachments stored in a process pool;
+    this process only checks duplicates and inserts, one transaction per batch_size candidates.
+    progress(counts) is called after every committed batch, as in fetch_and_save_emails.
+    Returns dict: {"new_count": int, **counts}
+    """
+    settings = settings or current_settings()
+    store = AttachmentStore(settings.attachment_root)
+    counts = {"total": 0, "fetched": 0, "parsed": 0, "inserted": 0, "skipped": 0}
+
+    def ingest(batch):
+        with metrics.timer("db_dedupe"):
+            fresh = new_candidates(batch)
+        with metrics.timer("db_insert"):
+            ids = save_candidates([(candidate_data, msg.attachments) for msg, candidate_data in fresh], store)
+        with metrics.timer("db_commit"):
+            db.session.commit()
+        metrics.count("candidates_inserted", len(ids))
+        counts["inserted"] += len(ids)
+        counts["skipped"] += len(batch) - len(ids)
+        if progress:
+            progress(dict(counts))
+
+    batch = []
+    for msg, candidate_data in process_archive(open_source(path), workers=workers, code_map=settings.code_map,
+                                               store_root=store.root, max_size=settings.max_attachment_bytes):
+        counts["total"] += 1
+        counts["fetched"] += 1
+        counts["parsed"] += 1
+        batch.append((msg, candidate_data))
+        if len(batch) >= batch_size:
+            ingest(batch)
+            batch = []
+    if batch:
+        ingest(batch)
+    return {"new_count": counts["inserted"], **counts}
+
+def reprocess_spool(spool, workers=None, batch_size=500, settings=None):
+    """
+    Re-run extraction over every spooled message and update the matching Candidate rows in place
+    (matched by email; id, reviewed flag, dates and attachments are kept). Runs in a process pool
+    like import_archive; one bulk UPDATE and commit per batch_size candidates.
+    Returns dict: {"total": messages read, "updated": rows rewritten, "missing": candidates not in the DB}
+    """
+    settings = settings or current_settings()
+    counts = {"total": 0, "updated": 0, "missing": 0}
+    seen = set()
+
+    def apply(batch):
+        ids = dict(db.session.execute(
+            select(Candidate.email, Candidate.id).where(Candidate.email.in_([c["email"] for c in batch]))).all())
+        rows = [{
+            "id": ids[candidate_data["email"]],
+            "name": candidate_data["name"],
+            "phone": candidate_data.get("phone"),
+            "linkedin": candidate_data.get("linkedin"),
+            "internship": candidate_data.get("internship"),
+            "notes": candidate_data.get("notes"),
+        } for candidate_data in batch if candidate_data["email"] in ids]
+        if rows:
+            # Bulk UPDATE ... WHERE id = ? with one parameter set per row
+            db.session.execute(update(Candidate), rows)
+        db.session.commit()
+        counts["updated"] += len(rows)
+        counts["missing"] += len(batch) - len(rows)
 
+    batch = []
+    for _, candidate_data in process_archive(spool, workers=workers, code_map=settings.code_map, attachments=False):
+        counts["total"] += 1
+        # Like ingestion, the earliest message of an applicant is the one kept
+        if candidate_data["email"] in seen:
+            continue
+        seen.add(candidate_data["email"])
+        batch.append(candidate_data)
+        if len(batch) >= batch_size:
+            apply(batch)
+            batch = []
+    if batch:
+        apply(batch)
+    return counts
@@ -1,34 +1,326 @@
+import csv
+import io
+import json
+import os
+import re
+from datetime import datetime
+from markupsafe import Markup, escape
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import selectinload, undefer
 from src.webapp.app import db
-from src.webapp.models import Candidate , Setting
+from src.webapp.models import Candidate , Setting, CANDIDATE_SEARCH_DDL, SCHEMA_UPGRADES
+from src.internship_scraper.storage import AttachmentStore
+from src.webapp.settings_cache import current_settings, settings_cache
 import src.webapp.scraper as scraper
 
 # ------------------------
 # Candidates
 # ------------------------
-def fetch_candidates():
-    """Return all candidates ordered by applied date desc"""
-    return Candidate.query.order_by(Candidate.applied_on.desc()).all()
+PAGE_SIZE = 50
+
+def encode_cursor(candidate):
+    """Opaque dashboard cursor pointing just after ``candidate``; the date part is empty when it has none"""
+    applied_on = candidate.applied_on.isoformat() if candidate.applied_on else ""
+    return f"{applied_on}_{candidate.id}"
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor"""
+    applied_on, _, candidate_id = cursor.rpartition("_")
+    return datetime.fromisoformat(applied_on) if applied_on else None, int(candidate_id)
+
+def candidate_filters(internship=None, reviewed=None):
+    """WHERE clauses for the dashboard filters, shared by the dashboard and the exports"""
+    filters = []
+    if internship:
+        filters.append(Candidate.internship == internship)
+    if reviewed is not None:
+        filters.append(Candidate.read == reviewed)
+    return filters
+
+def fetch_candidates(internship=None, reviewed=None, cursor=None, limit=PAGE_SIZE):
+    """
+    Return one page of candidates ordered by applied date desc, and the cursor of the next page (None on the last one).
+    Keyset pagination on (applied_on, id): every page is one index range scan, however deep it is.
+    SQLite sorts rows without a date last. A row-value comparison never matches them, so they are read
+    by a second range scan (applied_on IS NULL, id desc), only once the dated rows run out.
+    """
+    # attachment_count comes from a correlated subquery in the same SELECT, not a query per row
+    query = Candidate.query.options(undefer(Candidate.attachment_count)).filter(*candidate_filters(internship, reviewed))
+    applied_on, candidate_id = decode_cursor(cursor) if cursor else (None, None)
+    candidates = []
+    if not cursor:
+        # Dated rows, then the undated ones
+        candidates = query.order_by(Candidate.applied_on.desc(), Candidate.id.desc()).limit(limit + 1).all()
+    elif applied_on is not None:
+        candidates = (query.filter(tuple_(Candidate.applied_on, Candidate.id) < (applied_on, candidate_id))
+                      .order_by(Candidate.applied_on.desc(), Candidate.id.desc()).limit(limit + 1).all())
+    if cursor and len(candidates) <= limit:
+        undated = query.filter(Candidate.applied_on.is_(None))
+        if applied_on is None:
+            undated = undated.filter(Candidate.id < candidate_id)
+        candidates += undated.order_by(Candidate.id.desc()).limit(limit + 1 - len(candidates)).all()
+    next_cursor = encode_cursor(candidates[limit - 1]) if len(candidates) > limit else None
+    return candidates[:limit], next_cursor
+
+def internship_choices():
+    """Distinct internships for the dashboard filter, read from the internship index"""
+    return db.session.scalars(
+        select(Candidate.internship).where(Candidate.internship.isnot(None)).distinct().order_by(Candidate.internship)
+    ).all()
+
+# ------------------------
+# Export
+# ------------------------
+EXPORT_FIELDS = ("id", "name", "email", "phone", "linkedin", "internship", "applied_on", "reviewed", "notes")
+EXPORT_COLUMNS = (Candidate.id, Candidate.name, Candidate.email, Candidate.phone, Candidate.linkedin,
+                  Candidate.internship, Candidate.applied_on, Candidate.read, Candidate.notes)
+EXPORT_BATCH_SIZE = 1000
+# Bytes buffered before a chunk goes out
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Spreadsheets run cells starting with these as formulas; the text comes from applicants' emails
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+_PHONE_RE = re.compile(r"[+\d\s\-()]+")
+
+def export_rows(internship=None, reviewed=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield (id, name, email, ..., notes) tuples for the dashboard filters, newest first.
+    Plain column select streamed from the cursor batch_size rows at a time (yield_per): no ORM objects,
+    and memory stays flat however many candidates there are. The read transaction stays open until
+    the generator is exhausted or closed.
+    """
+    stmt = (select(*EXPORT_COLUMNS)
+            .where(*candidate_filters(internship, reviewed))
+            .order_by(Candidate.applied_on.desc(), Candidate.id.desc())
+            .execution_options(yield_per=batch_size))
+    result = db.session.execute(stmt)
+    try:
+        yield from result
+    finally:
+        result.close()
+
+def _export_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    return value
+
+def _csv_cell(value):
+    value = _export_value(value)
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES) and not _PHONE_RE.fullmatch(value):
+        return "'" + value
+    return value
+
+def _chunked(write_rows):
+    """Run write_rows(buffer) and hand out the buffer every EXPORT_CHUNK_SIZE characters (the first row at once)"""
+    buffer = io.StringIO()
+    first = True
+    for _ in write_rows(buffer):
+        if first or buffer.tell() >= EXPORT_CHUNK_SIZE:
+            first = False
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_csv(internship=None, reviewed=None):
+    """Candidates as CSV text chunks; the header goes out before the first row is read"""
+    # The BOM makes Excel read the file as UTF-8
+    yield "\ufeff" + ",".join(EXPORT_FIELDS) + "\r\n"
+
+    def write_rows(buffer):
+        writer = csv.writer(buffer)
+        for row in export_rows(internship, reviewed):
+            writer.writerow([_csv_cell(value) for value in row])
+            yield
+    yield from _chunked(write_rows)
+
+def export_jsonl(internship=None, reviewed=None):
+    """Candidates as JSON Lines text chunks, one object per candidate"""
+    def write_rows(buffer):
+        for row in export_rows(internship, reviewed):
+            record = dict(zip(EXPORT_FIELDS, row))
+            record["applied_on"] = record["applied_on"].isoformat() if record["applied_on"] else None
+            buffer.write(json.dumps(record, ensure_ascii=False))
+            buffer.write("\n")
+            yield
+    yield from _chunked(write_rows)
+
+# ------------------------
+# Full-text search
+# ------------------------
+SEARCH_TERM_RE = re.compile(r'"([^"]*)"|(\S+)')
+# Control characters mark snippet highlights, so the snippet can be escaped before <mark> goes in
+_HIT_OPEN, _HIT_CLOSE = "\x02", "\x03"
+
+def search_match(q):
+    """
+    Turn user input into an FTS5 MATCH expression: every word (or "quoted phrase") must appear,
+    a trailing * makes a word a prefix. Operators and punctuation are taken literally. Empty if nothing to search.
+    """
+    terms = []
+    for phrase, word in SEARCH_TERM_RE.findall(q or ""):
+        prefix = not phrase and word.endswith("*")
+        text = (phrase or word).replace('"', "").strip("* ")
+        if text:
+            terms.append(f'"{text}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def search_candidates(q, page=1, limit=PAGE_SIZE):
+    """
+    Rank candidates matching ``q`` (name, internship or email body), best first.
+    Returns one page of (candidate, highlighted snippet) pairs and whether a next page exists.
+    """
+    match = search_match(q)
+    if not match:
+        return [], False
+    # Name hits weigh most, then the internship, then the body
+    rows = db.session.execute(db.text(
+        "SELECT rowid, snippet(candidates_fts, 2, :open, :close, '…', 24) FROM candidates_fts "
+        "WHERE candidates_fts MATCH :match ORDER BY bm25(candidates_fts, 10.0, 5.0, 1.0) LIMIT :limit OFFSET :offset"
+    ), {"open": _HIT_OPEN, "close": _HIT_CLOSE, "match": match, "limit": limit + 1, "offset": (page - 1) * limit}).all()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    candidates = {c.id: c for c in Candidate.query.filter(Candidate.id.in_([row[0] for row in rows]))}
+    results = []
+    for candidate_id, snippet in rows:
+        if candidate_id in candidates:
+            snippet = str(escape(snippet or "")).replace(_HIT_OPEN, "<mark>").replace(_HIT_CLOSE, "</mark>")
+            results.append((candidates[candidate_id], Markup(snippet)))
+    return results, has_next
+
+def rebuild_search_index():
+    """Create the search index if this database predates it and (re)fill it from candidates; returns rows indexed"""
+    with db.engine.begin() as connection:
+        for statement in CANDIDATE_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO candidates_fts(candidates_fts) VALUES ('rebuild')")
+        return connection.exec_driver_sql("SELECT count(*) FROM candidates").scalar()
+
+def upgrade_schema(engine=None):
+    """
+    Bring a database created by an older version up to the models; safe to run any number of times.
+    Creates missing tables, adds the SCHEMA_UPGRADES columns a table lacks, then creates missing indexes.
+    Returns the "table.column" names added.
+    """
+    engine = engine or db.engine
+    db.metadata.create_all(engine)
+    added = []
+    with engine.begin() as connection:
+        for table, column, definition in SCHEMA_UPGRADES:
+            columns = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                added.append(f"{table}.{column}")
+        # Indexes on existing tables, including those over the columns just added
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+    return added
 
 def get_candidate_details(candidate_id):
-    """Return candidate and their attachments"""
-    candidate = Candidate.query.get_or_404(candidate_id)
+    """Return candidate and their attachments, loaded together (two queries, no lazy loads)"""
+    candidate = Candidate.query.options(selectinload(Candidate.attachments)).filter_by(id=candidate_id).first_or_404()
     attachments = candidate.attachments
     return candidate, attachments
 
-def scrape_and_save_candidates():
+def attachment_path(attachment):
+    """Absolute path of an attachment's content, resolved through its hash; None if missing"""
+    root = current_settings().attachment_root
+    if attachment.sha256:
+        candidates = [AttachmentStore(root).blob_path(attachment.sha256)]
+    else:
+        # Rows saved before the content-addressed store hold a relative path: look in the
+        # configured folder first, then where the old scraper wrote them (next to this package)
+        candidates = [os.path.join(root, attachment.path), os.path.join(os.path.dirname(__file__), attachment.path)]
+    return next((path for path in candidates if os.path.exists(path)), None)
+
+# Content-addressed blobs never change, so browsers may keep them this long
+ATTACHMENT_MAX_AGE = 365 * 24 * 3600
+
+def send_attachment(attachment, as_attachment=False):
+    """
+    Response for an attachment: strong ETag (its SHA-256), Last-Modified, 304 on revalidation and
+    byte ranges, so PDF viewers can fetch pages on demand.
+    With USE_X_SENDFILE or ATTACHMENT_ACCEL_REDIRECT (nginx internal location mapped onto the
+    attachment folder) configured, the front proxy sends the body instead of a Flask worker.
+    """
+    from flask import abort, current_app, request
+    from werkzeug.utils import send_file
+    path = attachment_path(attachment)
+    if not path:
+        return abort(404)
+    accel = current_app.config.get("ATTACHMENT_ACCEL_REDIRECT")
+    relpath = os.path.relpath(path, current_settings().attachment_root)
+    if relpath.startswith(os.pardir):
+        # Legacy file outside the folder the proxy serves
+        accel = None
+    offload = bool(accel or current_app.config.get("USE_X_SENDFILE"))
+    size = os.path.getsize(path)
+    response = send_file(
+        path, request.environ, mimetype=attachment.file_type or None, as_attachment=as_attachment,
+        download_name=attachment.filename, conditional=False, etag=attachment.sha256 or True,
+        max_age=ATTACHMENT_MAX_AGE if attachment.sha256 else None, use_x_sendfile=offload,
+        response_class=current_app.response_class
+    )
+    if accel:
+        del response.headers["X-Sendfile"]
+        response.headers["X-Accel-Redirect"] = f"{accel.rstrip('/')}/{relpath.replace(os.sep, '/')}"
+    if attachment.sha256:
+        # CVs are personal data: cache in the reviewer's browser only
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+    # The proxy handles ranges itself when it sends the body
+    response = response.make_conditional(request, accept_ranges=not offload, complete_length=size)
+    if response.status_code == 304:
+        # Some X-Sendfile implementations ignore the 304 and send the file anyway
+        response.headers.pop("X-Sendfile", None)
+        response.headers.pop("X-Accel-Redirect", None)
+    return response
+
+_spools = {}
+
+def raw_spool():
+    """The MessageSpool configured by RAW_SPOOL_DIR (one per process), or None"""
+    from flask import current_app
+    root = current_app.config.get("RAW_SPOOL_DIR")
+    if not root:
+        return None
+    if root not in _spools:
+        from src.internship_scraper.spool import MessageSpool
+        max_mb = current_app.config.get("RAW_SPOOL_MAX_MB")
+        _spools[root] = MessageSpool(root, max_mb * 1024 * 1024 if max_mb else None)
+    return _spools[root]
+
+def scrape_account(setting=None):
+    """Key under which scrape jobs of the configured mailbox are serialized"""
+    setting = setting or current_settings()
+    return f"{setting.email_user}@{setting.imap_server}/{setting.folder or 'INBOX'}"
+
+def scrape_and_save_candidates(progress=None):
     """
     Run the scraper using settings from DB
     and save candidates + attachments
+    progress(counts) receives fetched/parsed/inserted/skipped counts after every batch
     Returns number of new candidates added
     """
-    setting = get_settings()
-    if not getattr(setting, 'email_user', None) or not getattr(setting, 'email_pass', None):
+    setting = current_settings()
+    if not setting.email_user or not setting.email_pass:
         return {"error": "Email and password are not configured."}
     result = scraper.fetch_and_save_emails(
         imap_server=setting.imap_server,
         email_user=setting.email_user,
         email_pass=setting.email_pass,
-        folder=setting.folder
+        folder=setting.folder,
+        sync=setting.incremental_sync,
+        connections=setting.imap_connections,
+        progress=progress,
+        settings=setting,
+        spool=raw_spool()
     )
     return result
 
@@ -36,7 +328,7 @@ def scrape_and_save_candidates():
 # Settings
 # ------------------------
 def get_settings():
-    """Return the single settings object or create default"""
+    """Return the single settings row or create default; reads outside the settings page use current_settings()"""
     setting = Setting.query.first()
     if not setting:
         # Create default settings
@@ -51,7 +343,7 @@ def get_settings():
         db.session.commit()
     return setting
 
-def update_settings(imap_server, email_user, email_pass, folder, attachment_folder=None, internship_code_map=None):
+def update_settings(imap_server, email_user, email_pass, folder, attachment_folder=None, internship_code_map=None, incremental_sync=None, imap_connections=None, max_attachment_mb=None):
     """Update settings in the DB"""
     setting = get_settings()
     setting.imap_server = imap_server
@@ -62,5 +354,13 @@ def update_settings(imap_server, email_user, email_pass, folder, attachment_fold
         setting.attachment_folder = attachment_folder
     if internship_code_map is not None:
         setting.internship_code_map = internship_code_map
+    if incremental_sync is not None:
+        setting.incremental_sync = incremental_sync
+    if imap_connections is not None:
+        setting.imap_connections = imap_connections
+    if max_attachment_mb is not None:
+        setting.max_attachment_mb = max_attachment_mb
     db.session.commit()
+    # Other processes pick the change up through the bumped Setting.version
+    settings_cache.invalidate()
 
@@ -0,0 +1,105 @@
+"""
+In-process cache of the settings row.
+
+Scrapes, attachment downloads and job submissions all need the settings, and
+reading them used to mean a query, a Fernet decrypt of the password and a
+json.loads of the internship code map every time. ``current_settings()``
+returns an immutable ``SettingsSnapshot`` with all of that done once.
+
+``update_settings`` invalidates the cache of its own process. Other processes
+notice the change through ``Setting.version`` (bumped by SQLAlchemy on every
+update), which is re-read at most every ``check_interval`` seconds.
+"""
+import json
+import logging
+import threading
+import time
+from types import MappingProxyType
+
+from cryptography.fernet import InvalidToken
+
+from src.webapp.models import db, Setting
+
+class SettingsSnapshot:
+    """Read-only view of the settings with the password decrypted and the code map parsed."""
+    __slots__ = ("version", "imap_server", "email_user", "email_pass", "folder", "incremental_sync",
+                 "imap_connections", "attachment_root", "max_attachment_mb", "code_map")
+
+    def __init__(self, setting=None):
+        if setting is None:
+            # No row yet: the defaults get_settings() would create, without writing them
+            setting = Setting(imap_server="imap.gmail.com", email_user="", folder="INBOX",
+                              attachment_folder="attachments", max_attachment_mb=25, incremental_sync=False,
+                              imap_connections=4)
+        self.version = setting.version or 0
+        self.imap_server = setting.imap_server
+        self.email_user = setting.email_user
+        self.email_pass = _decrypt(setting)
+        self.folder = setting.folder or "INBOX"
+        self.incremental_sync = bool(setting.incremental_sync)
+        self.imap_connections = setting.imap_connections or 1
+        self.attachment_root = setting.attachment_root
+        self.max_attachment_mb = setting.max_attachment_mb
+        self.code_map = MappingProxyType(_parse_code_map(setting.internship_code_map))
+
+    @property
+    def max_attachment_bytes(self):
+        return self.max_attachment_mb * 1024 * 1024 if self.max_attachment_mb else None
+
+    def __repr__(self):
+        return f"<SettingsSnapshot v{self.version} {self.email_user} @ {self.imap_server}>"
+
+def _decrypt(setting):
+    if not setting._email_pass:
+        return None
+    try:
+        return setting.email_pass
+    except InvalidToken:
+        logging.error("Stored email password can't be decrypted with the current FERNET_KEY")
+        return None
+
+def _parse_code_map(raw):
+    if not raw:
+        return {}
+    try:
+        code_map = json.loads(raw)
+    except ValueError:
+        logging.error("internship_code_map is not valid JSON, ignoring it")
+        return {}
+    return code_map if isinstance(code_map, dict) else {}
+
+class SettingsCache:
+    """Holds the current SettingsSnapshot; safe to share between request and job threads."""
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked < self.check_interval:
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None and self._snapshot is snapshot:
+                # Another process may have saved new settings
+                version = db.session.scalar(db.select(Setting.version).order_by(Setting.id).limit(1))
+                if (version or 0) == snapshot.version:
+                    self._checked = now
+                    return snapshot
+            elif self._snapshot is not None:
+                return self._snapshot
+            self._snapshot = SettingsSnapshot(Setting.query.order_by(Setting.id).first())
+            self._checked = now
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+settings_cache = SettingsCache()
+
+def current_settings():
+    """The cached settings snapshot of this process."""
+    return settings_cache.get()
@@ -10,7 +10,7 @@ document.addEventListener("DOMContentLoaded", function() {
             const filename = btn.getAttribute('data-filename');
             const folder = btn.getAttribute('data-folder') || 'attachments';
             filenameSpan.textContent = filename;
-            downloadLink.href = `/${folder}/${filename}`;
+            downloadLink.href = btn.getAttribute('data-url') || `/${folder}/${filename}`;
             downloadLink.setAttribute('download', filename);
             modal.style.display = 'block';
         });
@@ -37,6 +37,31 @@ document.addEventListener("DOMContentLoaded", function() {
     });
 });
 
+// Poll a background scrape job until it finishes
+document.addEventListener("DOMContentLoaded", function() {
+    const box = document.getElementById("job-progress");
+    if (!box) return;
+    function poll() {
+        fetch(box.getAttribute('data-url'))
+            .then(function(response) { return response.json(); })
+            .then(function(job) {
+                if (job.status === 'failed') {
+                    box.className = 'job-progress danger';
+                    box.textContent = `Scrape failed: ${job.error || 'unknown error'}`;
+                } else if (job.status === 'done') {
+                    box.className = 'job-progress success';
+                    box.innerHTML = `${job.inserted} new candidates added (${job.skipped} skipped). <a href="/">Refresh</a>`;
+                } else {
+                    box.textContent = `Scrape ${job.status}: ${job.fetched}/${job.total} fetched, ` +
+                        `${job.parsed} parsed, ${job.inserted} inserted, ${job.skipped} skipped`;
+                    setTimeout(poll, 1000);
+                }
+            })
+            .catch(function() { setTimeout(poll, 3000); });
+    }
+    poll();
+});
+
 // Confirm before scraping new candidates
 function confirmScrape() {
     return confirm("Are you sure you want to scrape new candidates?");
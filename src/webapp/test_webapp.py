@@ -33,3 +33,479 @@ def test_scrape_and_save_candidates():
         result = scrape_and_save_candidates()
         assert isinstance(result, dict)
         assert "new_count" in result or "error" in result
+
+def test_attachment_routes_resolve_through_hash(attachment_root):
+    import os
+    from src.webapp.models import db, Candidate, Attachment
+    from src.internship_scraper.storage import AttachmentStore
+    with app.app_context():
+        blob = AttachmentStore(attachment_root).put(b"%PDF route test", "cv.pdf")
+        candidate = Candidate(name="Route Test", email="route-test@example.com")
+        candidate.attachments.append(Attachment(filename="cv.pdf", file_type=blob.content_type, path=blob.relpath,
+                                                sha256=blob.sha256, size=blob.size))
+        db.session.add(candidate)
+        db.session.commit()
+        att_id = candidate.attachments[0].id
+        try:
+            with app.test_client() as client:
+                response = client.get(f"/attachment/{att_id}/download")
+                assert response.status_code == 200 and response.data == b"%PDF route test"
+                assert "cv.pdf" in response.headers["Content-Disposition"]
+                assert client.get(f"/attachment/{att_id}").mimetype == "application/pdf"
+        finally:
+            db.session.delete(candidate)
+            db.session.commit()
+            if blob.created:
+                os.unlink(blob.path)
+
+def test_attachment_responses_revalidate_and_serve_ranges(attachment_root):
+    import os
+    from src.webapp.models import db, Candidate, Attachment
+    from src.internship_scraper.storage import AttachmentStore
+    content = b"%PDF-1.4 " + bytes(range(256)) * 8
+    with app.app_context():
+        blob = AttachmentStore(attachment_root).put(content, "ranged.pdf")
+        candidate = Candidate(name="Range Test", email="range-test@example.com")
+        candidate.attachments.append(Attachment(filename="ranged.pdf", file_type=blob.content_type, path=blob.relpath,
+                                                sha256=blob.sha256, size=blob.size))
+        db.session.add(candidate)
+        db.session.commit()
+        url = f"/attachment/{candidate.attachments[0].id}"
+        try:
+            with app.test_client() as client:
+                response = client.get(url)
+                assert response.headers["ETag"] == f'"{blob.sha256}"' and response.headers["Accept-Ranges"] == "bytes"
+                assert "private" in response.headers["Cache-Control"] and "Last-Modified" in response.headers
+                assert client.get(url, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+                partial = client.get(url, headers={"Range": "bytes=9-18"})
+                assert partial.status_code == 206 and partial.data == content[9:19]
+                assert partial.headers["Content-Range"] == f"bytes 9-18/{len(content)}"
+
+                app.config["ATTACHMENT_ACCEL_REDIRECT"] = "/protected-attachments/"
+                offloaded = client.get(f"{url}/download")
+                assert offloaded.data == b"" and "X-Sendfile" not in offloaded.headers
+                assert offloaded.headers["X-Accel-Redirect"] == f"/protected-attachments/{blob.relpath.replace(os.sep, '/')}"
+                assert "ranged.pdf" in offloaded.headers["Content-Disposition"]
+        finally:
+            app.config["ATTACHMENT_ACCEL_REDIRECT"] = None
+            db.session.delete(candidate)
+            db.session.commit()
+            if blob.created:
+                os.unlink(blob.path)
+
+def test_bulk_ingestion_dedups_against_db_and_batch(tmp_path):
+    from src.webapp.models import db, Candidate
+    from src.webapp.scraper import new_candidates, save_candidates
+    from src.internship_scraper.imap import Attachment as MailAttachment
+    from src.internship_scraper.storage import AttachmentStore
+    emails = ["bulk-existing@example.com", "bulk-new@example.com"]
+    with app.app_context():
+        db.session.add(Candidate(name="Existing", email=emails[0]))
+        db.session.commit()
+        try:
+            batch = [(None, {"name": "A", "email": emails[0]}), (None, {"name": "B", "email": emails[1]}),
+                     (None, {"name": "B again", "email": emails[1]})]
+            fresh = new_candidates(batch)
+            assert [data["name"] for _, data in fresh] == ["B"]
+            [candidate_id] = save_candidates([(data, [MailAttachment("cv.pdf", b"%PDF bulk")]) for _, data in fresh],
+                                             AttachmentStore(str(tmp_path)))
+            db.session.commit()
+            candidate = db.session.get(Candidate, candidate_id)
+            assert candidate.email == emails[1] and [a.filename for a in candidate.attachments] == ["cv.pdf"]
+        finally:
+            for candidate in Candidate.query.filter(Candidate.email.in_(emails)):
+                db.session.delete(candidate)
+            db.session.commit()
+
+def test_dashboard_keyset_pagination_and_filters():
+    from datetime import datetime, timedelta
+    from src.webapp.models import db, Candidate
+    from src.webapp.services import fetch_candidates
+    from src.webapp.testing import count_queries, query_plan
+    internship = "Keyset Test Internship"
+    with app.app_context():
+        start = datetime(2001, 1, 1)
+        # Two candidates share a timestamp, so the id tie-breaker matters
+        for i in range(7):
+            db.session.add(Candidate(name=f"Keyset {i}", email=f"keyset{i}@example.com", internship=internship,
+                                     read=i % 2 == 0, applied_on=start + timedelta(days=min(i, 5))))
+        # Rows without a date (older databases have some) come last, and a page may end on one
+        for i in (7, 8):
+            db.session.add(Candidate(name=f"Keyset {i}", email=f"keyset{i}@example.com", internship=internship))
+        db.session.commit()
+        Candidate.query.filter(Candidate.name.in_(["Keyset 7", "Keyset 8"])).update({"applied_on": None})
+        db.session.commit()
+        try:
+            names, cursor = [], None
+            while True:
+                page, cursor = fetch_candidates(internship=internship, cursor=cursor, limit=2)
+                names.extend(c.name for c in page)
+                if cursor is None:
+                    break
+            assert names == ["Keyset 6", "Keyset 5", "Keyset 4", "Keyset 3", "Keyset 2", "Keyset 1", "Keyset 0",
+                             "Keyset 8", "Keyset 7"]
+            # A page deep in the history is an index range seek, not a scan
+            _, cursor = fetch_candidates(limit=2)
+            with count_queries(db.engine) as log:
+                fetch_candidates(cursor=cursor, limit=2)
+            plan = query_plan(db.engine, log[0], log.parameters[0])
+            assert any(line.startswith("SEARCH candidates USING") for line in plan), plan
+            assert not any(line.startswith("SCAN candidates") for line in plan), plan
+            reviewed, _ = fetch_candidates(internship=internship, reviewed=True)
+            assert [c.name for c in reviewed] == ["Keyset 6", "Keyset 4", "Keyset 2", "Keyset 0"]
+            with app.test_client() as client:
+                response = client.get("/", query_string={"internship": internship, "reviewed": "0"})
+                assert response.status_code == 200 and b"Keyset 5" in response.data and b"Keyset 4" not in response.data
+                assert client.get("/", query_string={"cursor": "not-a-cursor"}).status_code == 400
+        finally:
+            Candidate.query.filter(Candidate.internship == internship).delete()
+            db.session.commit()
+
+def test_pages_stay_within_query_budget():
+    from src.webapp.models import db, Candidate, Attachment
+    from src.webapp.testing import count_queries
+    internship = "Query Budget Internship"
+
+    def add_candidates(count, offset):
+        for i in range(offset, offset + count):
+            candidate = Candidate(name=f"Budget {i}", email=f"budget{i}@example.com", internship=internship)
+            candidate.attachments = [Attachment(filename=f"cv{i}-{n}.pdf", path=f"cv{i}-{n}.pdf") for n in range(2)]
+            db.session.add(candidate)
+        db.session.commit()
+
+    with app.app_context():
+        try:
+            counts = []
+            for count, offset in ((2, 0), (20, 2)):
+                add_candidates(count, offset)
+                candidate_id = Candidate.query.filter_by(internship=internship).first().id
+                db.session.remove()
+                with app.test_client() as client, count_queries(db.engine) as dashboard:
+                    response = client.get("/", query_string={"internship": internship})
+                assert response.status_code == 200 and b"Budget 1" in response.data
+                with app.test_client() as client, count_queries(db.engine) as detail:
+                    assert client.get(f"/candidate/{candidate_id}").status_code == 200
+                counts.append((dashboard.count, detail.count))
+            assert counts[0] == counts[1], counts
+            assert counts[0][0] <= 3 and counts[0][1] <= 2, counts
+        finally:
+            for candidate in Candidate.query.filter_by(internship=internship):
+                db.session.delete(candidate)
+            db.session.commit()
+
+def test_scrape_jobs_run_in_background_one_per_account():
+    import threading
+    from src.webapp.jobs import JobRunner
+    from src.webapp.models import db, ScrapeJob
+    account = "jobs-test@example.com"
+    started, release = threading.Event(), threading.Event()
+
+    def fake_scrape(progress):
+        progress({"total": 3, "fetched": 3, "parsed": 2, "inserted": 1, "skipped": 1})
+        started.set()
+        release.wait(5)
+        return {"new_count": 1}
+
+    runner = JobRunner(app, scrape=fake_scrape)
+    with app.app_context():
+        try:
+            job, created = runner.submit(account)
+            assert created and started.wait(5)
+            again, created = runner.submit(account)
+            assert again.id == job.id and not created
+            # The test client shares this app context's session; drop its cached copy of the job
+            db.session.expire_all()
+            with app.test_client() as client:
+                running = client.get(f"/jobs/{job.id}").get_json()
+                assert running["status"] == "running" and running["inserted"] == 1
+                release.set()
+                runner.executor.shutdown(wait=True)
+                db.session.expire_all()
+                done = client.get(f"/jobs/{job.id}").get_json()
+                assert done["status"] == "done" and done["skipped"] == 1 and done["finished_at"]
+                assert client.get("/jobs/999999999").status_code == 404
+        finally:
+            release.set()
+            ScrapeJob.query.filter_by(account=account).delete()
+            db.session.commit()
+
+def test_scrape_jobs_heartbeat_and_stale_jobs_stay_failed():
+    import threading, time
+    from datetime import timedelta
+    from src.webapp.jobs import JobRunner, _utcnow
+    from src.webapp.models import db, ScrapeJob
+    account = "stale-jobs-test@example.com"
+    started, release = threading.Event(), threading.Event()
+
+    def slow_scrape(progress):
+        progress({"fetched": 1})
+        started.set()
+        release.wait(5)
+        progress({"fetched": 2})
+        return {"new_count": 0}
+
+    def heartbeat(job_id):
+        db.session.expire_all()
+        return db.session.get(ScrapeJob, job_id).heartbeat_at
+
+    with app.app_context():
+        try:
+            # The heartbeat keeps a job alive while its scrape reports nothing
+            beating = JobRunner(app, scrape=slow_scrape, heartbeat_every=timedelta(milliseconds=50))
+            job, _ = beating.submit(account)
+            assert started.wait(5)
+            first = heartbeat(job.id)
+            time.sleep(0.3)
+            assert heartbeat(job.id) > first
+            release.set()
+            beating.executor.shutdown(wait=True)
+            started.clear()
+            release.clear()
+
+            # A job whose runner went quiet is given up, replaced, and its thread never finishes it
+            dead = JobRunner(app, scrape=slow_scrape, heartbeat_every=timedelta(hours=1))
+            old, _ = dead.submit(account)
+            assert started.wait(5)
+            ScrapeJob.query.filter_by(id=old.id).update({"heartbeat_at": _utcnow() - timedelta(hours=1)})
+            db.session.commit()
+            fresh = JobRunner(app, scrape=lambda progress: {"new_count": 0})
+            new, created = fresh.submit(account)
+            assert created and new.id != old.id
+            release.set()
+            dead.executor.shutdown(wait=True)
+            fresh.executor.shutdown(wait=True)
+            db.session.expire_all()
+            assert db.session.get(ScrapeJob, old.id).status == "failed"
+            assert db.session.get(ScrapeJob, old.id).fetched == 1
+            assert db.session.get(ScrapeJob, new.id).status == "done"
+        finally:
+            release.set()
+            ScrapeJob.query.filter_by(account=account).delete()
+            db.session.commit()
+
+def test_full_text_search_ranks_highlights_and_stays_in_sync():
+    from src.webapp.models import db, Candidate
+    from src.webapp.services import search_candidates, search_match
+    internship = "Search Test Internship"
+    assert search_match('django "machine learning" reac* c++ OR') == '"django" "machine learning" "reac"* "c++" "OR"'
+    with app.app_context():
+        db.session.add_all([
+            Candidate(name="Zephyrine Alpha", email="fts1@example.com", internship=internship,
+                      notes="I know <b>Kubernetes</b> and zephyrine tooling."),
+            Candidate(name="Search Beta", email="fts2@example.com", internship=internship,
+                      notes="Experience with kubernetes clusters and Terraform."),
+            Candidate(name="Search Gamma", email="fts3@example.com", internship=internship, notes="Only React here."),
+        ])
+        db.session.commit()
+        try:
+            results, has_next = search_candidates("kubernetes")
+            assert {c.email for c, _ in results} >= {"fts1@example.com", "fts2@example.com"} and not has_next
+            snippet = dict((c.email, s) for c, s in results)["fts1@example.com"]
+            assert "<mark>Kubernetes</mark>" in snippet and "&lt;b&gt;" in snippet
+            # Name hits outrank body hits
+            assert search_candidates("zephyrine")[0][0][0].email == "fts1@example.com"
+            page, has_next = search_candidates("kubern*", limit=1)
+            assert len(page) == 1 and has_next
+            assert [c.email for c, _ in search_candidates("kubernetes", page=2, limit=1)[0]] != [page[0][0].email]
+
+            gamma = Candidate.query.filter_by(email="fts3@example.com").one()
+            gamma.notes = "Now also Kubernetes"
+            db.session.commit()
+            assert "fts3@example.com" in {c.email for c, _ in search_candidates("kubernetes")[0]}
+            with app.test_client() as client:
+                response = client.get("/search", query_string={"q": "terraform"})
+                assert response.status_code == 200 and b"Search Beta" in response.data and b"<mark>Terraform</mark>" in response.data
+        finally:
+            Candidate.query.filter(Candidate.internship == internship).delete()
+            db.session.commit()
+        assert search_candidates("zephyrine") == ([], False)
+
+def test_settings_cache_serves_hot_paths_and_invalidates():
+    from src.webapp.models import db, Setting
+    from src.webapp.services import get_settings, update_settings
+    from src.webapp.settings_cache import SettingsCache, current_settings
+    from src.webapp.testing import count_queries
+    with app.app_context():
+        setting = get_settings()
+        saved = (setting.imap_server, setting.email_user, setting.email_pass, setting.folder, None,
+                 setting.internship_code_map)
+        try:
+            update_settings("imap.example.com", "cache@example.com", "s3cret", "INBOX", None, '{"PY": "Python Developer"}')
+            snapshot = current_settings()
+            assert snapshot.email_pass == "s3cret" and snapshot.code_map["PY"] == "Python Developer"
+            with count_queries(db.engine) as queries:
+                assert current_settings() is snapshot
+            assert queries.count == 0
+
+            # A second process only learns about the change through the version column
+            other = SettingsCache(check_interval=0)
+            assert other.get().version == snapshot.version
+            update_settings("imap.example.com", "cache@example.com", "rotated", "INBOX", None, "not json")
+            assert current_settings().email_pass == "rotated" and current_settings().code_map == {}
+            assert other.get().email_pass == "rotated"
+            assert Setting.query.first().version > snapshot.version
+        finally:
+            update_settings(*saved)
+
+def test_metrics_endpoint_serves_prometheus_text():
+    from src.internship_scraper.metrics import metrics
+    assert metrics.enabled
+    metrics.observe("db_commit", 0.25)
+    metrics.count("candidates_inserted", 3)
+    with app.test_client() as client:
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'internship_scraper_stage_seconds_total{stage="db_commit"}' in response.text
+    assert "# TYPE internship_scraper_candidates_inserted_total counter" in response.text
+
+def test_import_archive_ingests_mbox_once(tmp_path):
+    import mailbox
+    from email.message import EmailMessage
+    from src.webapp.models import db, Candidate
+    from src.webapp.scraper import import_archive
+    box = mailbox.mbox(str(tmp_path / "season.mbox"))
+    for i in range(3):
+        msg = EmailMessage()
+        msg["Subject"] = f"Internship Application – ARCHIVETEST – Archived Applicant {i}"
+        msg["From"] = f"Archived Applicant {i} <archived{i}@example.com>"
+        msg.set_content(f"Phone: +216 5{i}")
+        box.add(msg)
+    box.add(box[0])  # the same application exported twice
+    box.close()
+    with app.app_context():
+        try:
+            result = import_archive(str(tmp_path / "season.mbox"), workers=1, batch_size=2)
+            assert result["total"] == 4 and result["new_count"] == 3 and result["skipped"] == 1
+            assert sorted(c.phone for c in Candidate.query.filter_by(internship="ARCHIVETEST")) == ["+216 50", "+216 51", "+216 52"]
+            assert import_archive(str(tmp_path / "season.mbox"), workers=1)["new_count"] == 0
+        finally:
+            Candidate.query.filter_by(internship="ARCHIVETEST").delete()
+            db.session.commit()
+
+def test_reprocess_spool_updates_candidates_in_place(tmp_path):
+    from email.message import EmailMessage
+    from src.internship_scraper.spool import MessageSpool
+    from src.webapp.models import db, Candidate
+    from src.webapp.scraper import reprocess_spool
+    spool = MessageSpool(str(tmp_path / "spool"))
+    for uid, (name, phone) in enumerate([("Spooled One", "+216 71"), ("Spooled Two", "+216 72")], start=1):
+        msg = EmailMessage()
+        msg["Subject"] = f"Internship Application – SPOOLTEST – {name}"
+        msg["From"] = f"{name} <spooled{uid}@example.com>"
+        msg.set_content(f"Phone: {phone}")
+        spool.put("hr@imap.example.com", "INBOX", 1, uid, msg.as_bytes())
+    with app.app_context():
+        first = Candidate(name="Old Name", email="spooled1@example.com", internship="SPOOLTEST", read=True)
+        db.session.add(first)
+        db.session.commit()
+        try:
+            result = reprocess_spool(spool, workers=1)
+            assert result == {"total": 2, "updated": 1, "missing": 1}
+            db.session.expire_all()
+            updated = db.session.get(Candidate, first.id)
+            assert (updated.name, updated.phone, updated.read) == ("Spooled One", "+216 71", True)
+            assert Candidate.query.filter_by(email="spooled2@example.com").first() is None
+        finally:
+            Candidate.query.filter_by(internship="SPOOLTEST").delete()
+            db.session.commit()
+
+def test_exports_stream_filtered_rows():
+    import csv, io, json
+    from src.webapp.models import db, Candidate
+    from src.webapp import services
+    with app.app_context():
+        db.session.add_all([Candidate(name=f"Export {i}", email=f"export{i}@example.com", internship="EXPORTTEST",
+                                      phone="+216 99" if i == 0 else None, read=i % 2 == 0,
+                                      notes="=HYPERLINK(\"http://evil\")" if i == 1 else f"Notes {i}, with comma")
+                            for i in range(5)])
+        db.session.commit()
+        try:
+            with app.test_client() as client:
+                response = client.get("/export.csv", query_string={"internship": "EXPORTTEST"})
+                assert response.status_code == 200 and response.is_streamed
+                assert response.mimetype == "text/csv" and "attachment" in response.headers["Content-Disposition"]
+                rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True).lstrip("﻿"))))
+                assert [r["email"] for r in rows] == [f"export{i}@example.com" for i in range(4, -1, -1)]
+                by_email = {r["email"]: r for r in rows}
+                assert by_email["export0@example.com"]["phone"] == "+216 99"
+                assert by_email["export1@example.com"]["notes"].startswith("'=HYPERLINK")
+                assert by_email["export2@example.com"]["reviewed"] == "yes"
+
+                response = client.get("/export.jsonl", query_string={"internship": "EXPORTTEST", "reviewed": "0"})
+                records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+                assert [r["email"] for r in records] == ["export3@example.com", "export1@example.com"]
+                assert records[0]["reviewed"] is False and records[0]["notes"] == "Notes 3, with comma"
+
+            # One chunk for the header, one for the first row, then EXPORT_CHUNK_SIZE-sized ones
+            saved = services.EXPORT_CHUNK_SIZE
+            services.EXPORT_CHUNK_SIZE = 1
+            try:
+                assert len(list(services.export_csv("EXPORTTEST"))) == 1 + 5
+            finally:
+                services.EXPORT_CHUNK_SIZE = saved
+        finally:
+            Candidate.query.filter_by(internship="EXPORTTEST").delete()
+            db.session.commit()
+
+def test_upgrade_schema_adds_missing_columns_once(tmp_path):
+    from sqlalchemy import create_engine, inspect
+    from src.webapp.models import SCHEMA_UPGRADES
+    from src.webapp.services import upgrade_schema
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    # Settings and attachments tables as the first release created them
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE settings (id INTEGER PRIMARY KEY, email_user VARCHAR(255) NOT NULL)")
+        connection.exec_driver_sql("INSERT INTO settings (id, email_user) VALUES (1, 'hr@example.com')")
+        connection.exec_driver_sql("CREATE TABLE attachments (id INTEGER PRIMARY KEY, candidate_id INTEGER NOT NULL, "
+                                   "filename VARCHAR(255) NOT NULL, file_type VARCHAR(50), path VARCHAR(500) NOT NULL)")
+    with app.app_context():
+        added = upgrade_schema(engine)
+        assert added == [f"{table}.{column}" for table, column, _ in SCHEMA_UPGRADES
+                         if table in ("settings", "attachments")]
+        assert upgrade_schema(engine) == []
+    with engine.connect() as connection:
+        assert tuple(connection.exec_driver_sql("SELECT version, incremental_sync FROM settings").one()) == (1, 0)
+    assert "ix_candidates_applied_on_id" in {index["name"] for index in inspect(engine).get_indexes("candidates")}
+    assert "ix_attachments_sha256" in {index["name"] for index in inspect(engine).get_indexes("attachments")}
+
+def test_failed_scrape_marks_committed_mail_and_logs_out_every_session(monkeypatch):
+    import time
+    from email.message import EmailMessage
+    from functools import partial
+    import src.webapp.scraper as scraper
+    from src.internship_scraper.imap_server import IMAPStandIn
+    from src.webapp.models import db, Candidate
+    messages = []
+    for i in range(3):
+        msg = EmailMessage()
+        msg["Subject"] = f"Internship Application – PY – Logout {i}"
+        msg["From"] = f"logout{i}@example.com"
+        msg.set_content("Internship Code: PY")
+        messages.append(msg.as_bytes())
+    calls = []
+
+    def progress(counts):
+        calls.append(counts)
+        if len(calls) == 2:
+            raise RuntimeError("job lost")
+
+    with IMAPStandIn(messages) as server, app.app_context():
+        monkeypatch.setattr(scraper, "IMAPConnectionPool", partial(
+            scraper.IMAPConnectionPool, client_factory=partial(type(server.client()), **server.client_options())))
+        try:
+            with pytest.raises(RuntimeError):
+                scraper.fetch_and_save_emails("127.0.0.1", server.user, server.password, connections=2,
+                                              batch_size=1, progress=progress)
+            # The first batch was committed before the failure, so only its message is marked read
+            client = server.client()
+            client.connect()
+            assert client.search("UNSEEN") == [b"2", b"3"]
+            client.logout()
+            deadline = time.time() + 5
+            while server.stats["LOGOUT"] < server.stats["connections"] and time.time() < deadline:
+                time.sleep(0.01)
+            assert server.stats["LOGOUT"] == server.stats["connections"]
+        finally:
+            Candidate.query.filter(Candidate.email.like("logout%@example.com")).delete(synchronize_session=False)
+            db.session.commit()
@@ -0,0 +1,39 @@
+"""
+Test helpers for the webapp.
+
+``count_queries`` records every SQL statement sent to the database, so tests
+can hold a page to a fixed query budget whatever the number of rows.
+``query_plan`` shows how SQLite runs one of them.
+"""
+from contextlib import contextmanager
+from sqlalchemy import event
+
+class QueryLog(list):
+    """SQL statements executed inside a ``count_queries`` block; their parameters in ``parameters``."""
+    def __init__(self):
+        super().__init__()
+        self.parameters = []
+
+    @property
+    def count(self):
+        return len(self)
+
+@contextmanager
+def count_queries(engine):
+    """Collect the statements executed on ``engine`` within the block."""
+    log = QueryLog()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        log.append(statement)
+        log.parameters.append(parameters)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield log
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def query_plan(engine, statement, parameters=()):
+    """The detail lines of ``EXPLAIN QUERY PLAN`` for a statement, e.g. ``SEARCH candidates USING INDEX ...``."""
+    with engine.connect() as connection:
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", tuple(parameters))]